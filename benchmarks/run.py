@@ -0,0 +1,346 @@
+"""
+Benchmarks Folder Archaeologist's categorizers and file operations against a
+synthetic dig site and saves the results as JSON.
+
+Usage:
+    python benchmarks/run.py --files 100000 --output results.json
+    python benchmarks/run.py --files 100000 --compare results.json
+    python benchmarks/run.py --startup-only --startup-budget 50
+
+Every operation runs in a fresh child process, once cold and once warm, so
+peak RSS is per operation. Cold runs drop the page cache first when the
+process is allowed to (Linux, root); the JSON records whether it did.
+
+Startup is timed separately: `excavate --version` and a batch query over an
+empty dig site are each run many times, and the median time they take beyond
+a bare interpreter start must stay within the startup budget.
+"""
+import os
+import sys
+import json
+import time
+import statistics
+import shutil
+import builtins
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime as dt
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "src"))
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic import generate_dig_site, add_site_arguments, site_parameters  # noqa: E402
+
+# Files used by the move and archive benchmarks; both copy or read real data.
+FILE_OPERATION_SAMPLE = 5000
+
+# Commands whose startup time is held to the budget; {site} is an empty directory.
+STARTUP_COMMANDS = {
+    "version": ["--version"],
+    "batch_query": ["query", "{site}", "ext:iso size>1G top:1"],
+}
+
+
+def _no_preparation(site, scratch):
+    return None
+
+
+def _count_files(site):
+    from FolderArchaeologist.scanner import walk_files
+    return sum(1 for _ in walk_files(site))
+
+
+def _sample_paths(site, limit):
+    from FolderArchaeologist.scanner import walk_files
+    paths = []
+    for record in walk_files(site):
+        paths.append(record.path)
+        if len(paths) == limit:
+            break
+    return paths
+
+
+def _prepare_move(site, scratch):
+    # Every sampled file is copied in under one of a few names, so most moves collide.
+    sources = []
+    for index, path in enumerate(_sample_paths(site, FILE_OPERATION_SAMPLE)):
+        directory = os.path.join(scratch, "move_from", str(index % 50))
+        os.makedirs(directory, exist_ok=True)
+        source = os.path.join(directory, f"artifact_{index % 20}.dat")
+        if not os.path.exists(source):
+            shutil.copyfile(path, source)
+            sources.append(source)
+    return sources
+
+
+def _run_scan(function):
+    """
+    Wraps a categorizer. It returns None so the files are counted after the
+    timer stops; walking the site beforehand would warm a cold run's caches.
+    """
+    def run(site, scratch, state):
+        function(site)
+        return None
+    return run
+
+
+def _operations():
+    from FolderArchaeologist import categories, features, archiver
+    from FolderArchaeologist.tokens import NAME_DELIMITERS
+
+    return {
+        "categorize_by_extension": (_no_preparation, _run_scan(categories.categorize_by_extension)),
+        "categorize_by_size": (_no_preparation, _run_scan(lambda site: categories.categorize_by_size(site, 0, 10))),
+        "categorize_by_age": (_no_preparation, _run_scan(lambda site: categories.categorize_by_age(site, 0, 10))),
+        "categorize_by_similar_names": (_no_preparation, _run_scan(
+            lambda site: categories.categorize_by_similar_names(site, NAME_DELIMITERS, rescan=True))),
+        "search_by_specific_token": (_no_preparation, _run_scan(
+            lambda site: categories.search_by_specific_token(site, NAME_DELIMITERS, "report", rescan=True))),
+        "move_files": (
+            _prepare_move,
+            lambda site, scratch, sources: len(features.move_files(sources, os.path.join(scratch, "move_to"))),
+        ),
+        "archive_files": (
+            lambda site, scratch: _sample_paths(site, FILE_OPERATION_SAMPLE),
+            lambda site, scratch, paths: archiver.write_archive(paths, os.path.join(scratch, "bench.zip")) or len(paths),
+        ),
+    }
+
+
+def _proc_io():
+    """Returns the read/write syscall counters of this process (Linux only)."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return {"read_calls": int(fields["syscr"]), "write_calls": int(fields["syscw"])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_child(operation, site, scratch, output_path):
+    """Runs one operation in this process and writes its measurements to output_path."""
+    from FolderArchaeologist.scanner import configure_scan
+
+    builtins.input = lambda *args: ""
+    configure_scan(progress=False)
+    prepare, run = _operations()[operation]
+    state = prepare(site, scratch)
+
+    io_before = _proc_io()
+    start = time.perf_counter()
+    processed = run(site, scratch, state)
+    seconds = time.perf_counter() - start
+    io_after = _proc_io()
+
+    if processed is None:
+        processed = _count_files(site)
+    items = processed if isinstance(processed, int) else len(processed)
+    result = {
+        "seconds": seconds,
+        "items": items,
+        "files_per_sec": items / seconds if seconds else None,
+        "peak_rss_kb": _peak_rss_kb(),
+        "syscalls": {key: io_after[key] - io_before[key] for key in io_after} if io_before and io_after else None,
+    }
+    with open(output_path, "w") as f:
+        json.dump(result, f)
+
+
+def _drop_page_cache():
+    """Drops the Linux page cache. Returns False when not permitted."""
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+def _strace_total(path):
+    """Parses the total call count from an `strace -c` summary."""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.strip().endswith("total"):
+                    return int(line.split()[2])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def measure(operation, site, mode, use_strace):
+    """Runs one operation in a fresh child process and returns its measurements."""
+    with tempfile.TemporaryDirectory(prefix="excavate-bench-") as scratch:
+        output_path = os.path.join(scratch, "result.json")
+        command = [sys.executable, os.path.abspath(__file__), "--child", operation, site, scratch, output_path]
+        strace_path = os.path.join(scratch, "strace.txt")
+        if use_strace:
+            command = ["strace", "-f", "-c", "-o", strace_path] + command
+        dropped = _drop_page_cache() if mode == "cold" else None
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        with open(output_path) as f:
+            result = json.load(f)
+        if use_strace:
+            result["syscalls"] = dict(result["syscalls"] or {}, total=_strace_total(strace_path))
+    result.update(operation=operation, mode=mode, page_cache_dropped=dropped)
+    return result
+
+
+def _median_ms(command, runs, env=None):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, env=env)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def measure_startup(runs, budget_ms):
+    """
+    Times every STARTUP_COMMAND in fresh processes and returns the medians
+    in milliseconds, with their overhead beyond a bare interpreter start.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [os.path.join(os.path.dirname(BENCH_DIR), "src"), os.environ.get("PYTHONPATH")])))
+    interpreter_ms = _median_ms([sys.executable, "-c", "pass"], runs)
+    commands = {}
+    with tempfile.TemporaryDirectory(prefix="excavate-empty-") as site:
+        for name, arguments in STARTUP_COMMANDS.items():
+            # The same call the installed `excavate` script makes, without runpy's own imports.
+            command = [sys.executable, "-c", "import sys; from FolderArchaeologist.main import main; sys.exit(main())"]
+            command += [arg.format(site=site) for arg in arguments]
+            total_ms = _median_ms(command, runs, env)
+            commands[name] = {
+                "median_ms": total_ms,
+                "overhead_ms": total_ms - interpreter_ms,
+                "within_budget": total_ms - interpreter_ms <= budget_ms,
+            }
+    return {"runs": runs, "budget_ms": budget_ms, "interpreter_ms": interpreter_ms, "commands": commands}
+
+
+def report_startup(startup):
+    """Prints the startup timings. Returns True if any command went over budget."""
+    over_budget = False
+    print(f"{'startup':32} {'median ms':>10} {'overhead ms':>12}  (interpreter {startup['interpreter_ms']:.1f} ms, "
+          f"budget {startup['budget_ms']:.0f} ms)", file=sys.stderr)
+    for name, timing in startup["commands"].items():
+        flag = "" if timing["within_budget"] else " OVER BUDGET"
+        over_budget = over_budget or bool(flag)
+        print(f"{name:32} {timing['median_ms']:10.1f} {timing['overhead_ms']:12.1f}{flag}", file=sys.stderr)
+    return over_budget
+
+
+def compare(results, baseline_path, tolerance):
+    """Prints per-operation changes against a baseline file. Returns True if any run regressed."""
+    with open(baseline_path) as f:
+        baseline = {(entry["operation"], entry["mode"]): entry for entry in json.load(f)["results"]}
+
+    regressed = False
+    print(f"{'operation':32} {'mode':5} {'baseline s':>11} {'now s':>9} {'change':>8}")
+    for entry in results:
+        before = baseline.get((entry["operation"], entry["mode"]))
+        if before is None:
+            continue
+        change = entry["seconds"] / before["seconds"] - 1 if before["seconds"] else 0.0
+        flag = " REGRESSION" if change > tolerance else ""
+        regressed = regressed or bool(flag)
+        print(f"{entry['operation']:32} {entry['mode']:5} {before['seconds']:11.3f} {entry['seconds']:9.3f} {change:+8.1%}{flag}")
+    return regressed
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    if len(sys.argv) == 6 and sys.argv[1] == "--child":
+        run_child(*sys.argv[2:])
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark Folder Archaeologist on a synthetic dig site.")
+    add_site_arguments(parser)
+    parser.add_argument("--site", default=None, help="Reuse (or create) the dig site at this path instead of a temp dir.")
+    parser.add_argument("--operations", nargs="+", default=None, help="Only run these operations.")
+    parser.add_argument("--output", default=None, help="Write the results JSON here.")
+    parser.add_argument("--compare", default=None, help="Compare against an earlier results JSON.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Slowdown fraction counted as a regression.")
+    parser.add_argument("--strace", action="store_true", help="Count every syscall with strace -c (Linux).")
+    parser.add_argument("--startup-budget", type=float, default=50.0,
+                        help="Milliseconds --version and a batch query may take beyond a bare interpreter start.")
+    parser.add_argument("--startup-runs", type=int, default=15, help="Runs per startup command; the median counts.")
+    parser.add_argument("--startup-only", action="store_true", help="Only check the startup budget.")
+    args = parser.parse_args()
+
+    startup = measure_startup(args.startup_runs, args.startup_budget)
+    over_budget = report_startup(startup)
+    if args.startup_only:
+        json.dump({"startup": startup}, sys.stdout, indent=2)
+        print()
+        return 1 if over_budget else 0
+
+    operations = args.operations or list(_operations())
+    site_root = args.site or tempfile.mkdtemp(prefix="excavate-site-")
+    try:
+        if not os.path.isdir(site_root) or not os.listdir(site_root):
+            print(f"Generating dig site in {site_root}...", file=sys.stderr)
+            site = generate_dig_site(site_root, **site_parameters(args))
+        else:
+            site = dict(site_parameters(args), root=site_root, reused=True)
+
+        results = []
+        for operation in operations:
+            for mode in ("cold", "warm"):
+                result = measure(operation, site_root, mode, args.strace)
+                results.append(result)
+                print(f"{operation:32} {mode:5} {result['seconds']:9.3f}s "
+                      f"{(result['files_per_sec'] or 0):12,.0f} files/s {result['peak_rss_kb'] or 0:10,} KB",
+                      file=sys.stderr)
+    finally:
+        if args.site is None:
+            shutil.rmtree(site_root, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": dt.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git_revision": _git_revision(),
+            "site": site,
+        },
+        "startup": startup,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        return 1
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
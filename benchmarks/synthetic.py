@@ -0,0 +1,123 @@
+"""
+Generates reproducible synthetic dig sites for benchmarking.
+
+Usage:
+    python benchmarks/synthetic.py /tmp/dig-site --files 100000 --depth 4 --fanout 8
+"""
+import os
+import json
+import random
+import argparse
+import time
+
+SECONDS_PER_YEAR = 31557600
+
+WORDS = ["report", "final", "draft", "invoice", "photo", "backup", "notes", "scan", "export",
+         "holiday", "budget", "meeting", "archive", "summary", "project", "data", "log", "copy"]
+
+# Name templates with the extension they are written with.
+NAME_PATTERNS = {
+    "documents": [("{w1}_{w2}_v{n}", "pdf"), ("{w1}-{w2}-{n}", "docx"), ("{w1} {w2} ({n})", "txt")],
+    "photos": [("IMG_{n:05d}", "jpg"), ("DSC{n:05d}", "jpg"), ("{w1}_{n}", "png")],
+    "code": [("{w1}_{w2}", "py"), ("{w1}.{w2}", "js"), ("{w1}-{n}", "json")],
+    "mixed": None,
+}
+
+SIZE_DISTRIBUTIONS = ("lognormal", "uniform", "fixed")
+CONTENT_MODES = ("sparse", "text", "random")
+
+
+def _directories(root, depth, fanout):
+    """Returns every directory of a tree with the given depth and fan-out, root first."""
+    directories = [root]
+    level = [root]
+    for _ in range(depth):
+        level = [os.path.join(parent, f"chamber_{index:03d}") for parent in level for index in range(fanout)]
+        directories.extend(level)
+    return directories
+
+
+def _size(rng, distribution, median):
+    if distribution == "fixed":
+        return median
+    if distribution == "uniform":
+        return rng.randint(0, 2 * median)
+    return int(rng.lognormvariate(0, 1.5) * median)
+
+
+def _name(rng, patterns, index):
+    template, ext = rng.choice(patterns)
+    stem = template.format(w1=rng.choice(WORDS), w2=rng.choice(WORDS), n=index)
+    return f"{stem}.{ext}"
+
+
+def _write(path, size, content, rng, text_block):
+    with open(path, "wb") as f:
+        if content == "sparse" or size == 0:
+            f.truncate(size)
+        elif content == "text":
+            repeats, remainder = divmod(size, len(text_block))
+            f.write(text_block * repeats + text_block[:remainder])
+        else:
+            f.write(rng.randbytes(size) if hasattr(rng, "randbytes") else os.urandom(size))
+
+
+def generate_dig_site(root, files=10000, depth=3, fanout=6, size_distribution="lognormal",
+                      median_size=16384, names="mixed", max_age_years=5.0, content="sparse", seed=0):
+    """
+    Creates a synthetic dig site below root and returns its parameters.
+
+    The same parameters and seed always produce the same names, sizes and
+    mtimes. Files are spread evenly over every directory of the tree.
+    """
+    rng = random.Random(seed)
+    directories = _directories(os.fspath(root), depth, fanout)
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    patterns = NAME_PATTERNS[names] or [pattern for group in NAME_PATTERNS.values() if group for pattern in group]
+    text_block = " ".join(rng.choice(WORDS) for _ in range(2048)).encode()
+    now = time.time()
+    total_bytes = 0
+    for index in range(files):
+        directory = directories[index % len(directories)]
+        size = _size(rng, size_distribution, median_size)
+        path = os.path.join(directory, _name(rng, patterns, index))
+        _write(path, size, content, rng, text_block)
+        mtime = now - rng.random() * max_age_years * SECONDS_PER_YEAR
+        os.utime(path, (mtime, mtime))
+        total_bytes += size
+
+    return {
+        "root": os.fspath(root), "files": files, "directories": len(directories), "depth": depth,
+        "fanout": fanout, "size_distribution": size_distribution, "median_size": median_size,
+        "names": names, "max_age_years": max_age_years, "content": content, "seed": seed,
+        "total_bytes": total_bytes,
+    }
+
+
+def add_site_arguments(parser):
+    parser.add_argument("--files", type=int, default=10000, help="Number of files to create.")
+    parser.add_argument("--depth", type=int, default=3, help="Directory levels below the root.")
+    parser.add_argument("--fanout", type=int, default=6, help="Subdirectories per directory.")
+    parser.add_argument("--size-distribution", choices=SIZE_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--median-size", type=int, default=16384, help="Median file size in bytes.")
+    parser.add_argument("--names", choices=list(NAME_PATTERNS), default="mixed", help="Filename pattern family.")
+    parser.add_argument("--max-age-years", type=float, default=5.0, help="mtimes are spread over this many years.")
+    parser.add_argument("--content", choices=CONTENT_MODES, default="sparse",
+                        help="sparse files are fastest to create; archive benchmarks want text or random.")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def site_parameters(args):
+    return dict(files=args.files, depth=args.depth, fanout=args.fanout,
+                size_distribution=args.size_distribution, median_size=args.median_size,
+                names=args.names, max_age_years=args.max_age_years, content=args.content, seed=args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic dig site.")
+    parser.add_argument("root", help="Directory to create the dig site in.")
+    add_site_arguments(parser)
+    args = parser.parse_args()
+    print(json.dumps(generate_dig_site(args.root, **site_parameters(args)), indent=2))
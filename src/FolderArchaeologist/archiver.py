@@ -0,0 +1,251 @@
+import os
+import sys
+import time
+import zlib
+import struct
+import zipfile
+import mimetypes
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from rich.console import Console
+from rich.progress import Progress, TextColumn, BarColumn, DownloadColumn, TransferSpeedColumn, TimeRemainingColumn
+from .metrics import count, operation
+
+console = Console()
+
+DEFAULT_COMPRESSION_LEVEL = 6
+# zlib releases the GIL while deflating, so members compress in parallel threads.
+ARCHIVE_WORKERS = os.cpu_count() or 1
+# Members above this size are streamed by the writer instead of being
+# deflated whole in a worker, which bounds memory.
+PARALLEL_MEMBER_LIMIT = 64 * 1024 * 1024
+# Bytes of members read or deflated ahead of the writer at any time.
+ARCHIVE_WINDOW_BYTES = 256 * 1024 * 1024
+
+# Formats that are already compressed; deflating them again only burns CPU.
+COMPRESSED_EXTENSIONS = {
+    "7z", "aac", "apk", "avi", "br", "bz2", "docx", "epub", "flac", "flv", "gif", "gz", "heic",
+    "jar", "jpeg", "jpg", "lz", "lz4", "lzma", "m4a", "m4v", "mkv", "mov", "mp3", "mp4", "odp",
+    "ods", "odt", "ogg", "opus", "png", "pptx", "rar", "tgz", "webm", "webp", "whl", "wmv", "xlsx",
+    "xz", "zip", "zst",
+}
+UNCOMPRESSED_MEDIA = {"image/bmp", "image/svg+xml", "image/tiff", "image/x-ms-bmp", "audio/wav", "audio/x-wav"}
+
+# zip32 fields max out at these; larger values move into zip64 records.
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_ENTRY_LIMIT = 0xFFFF
+# Bytes read at a time from members too large to deflate whole.
+STREAM_CHUNK = 1024 * 1024
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_ZIP64_END_RECORD = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+# Made by MS-DOS on Windows and by Unix elsewhere, as zipfile does.
+_CREATE_SYSTEM = 0 if sys.platform == "win32" else 3
+
+
+def is_precompressed(file_path):
+    """Guesses from the extension and MIME type whether a file is already compressed."""
+    ext = os.path.splitext(file_path)[1][1:].lower()
+    if ext in COMPRESSED_EXTENSIONS:
+        return True
+    mime_type, encoding = mimetypes.guess_type(file_path)
+    if encoding is not None:
+        return True
+    if mime_type is None or mime_type in UNCOMPRESSED_MEDIA:
+        return False
+    return mime_type.split('/')[0] in ("image", "audio", "video")
+
+
+def _dos_time(mtime):
+    year, month, day, hour, minute, second = time.localtime(mtime)[:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+class _ZipWriter:
+    """
+    Writes a zip file one member at a time. Members may arrive already
+    deflated by a worker thread, which zipfile offers no public way to accept,
+    so the local headers, central directory and any zip64 records needed for
+    large members or many members are written here.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self._entries = []
+
+    def _begin(self, file_path, arcname, method, crc, compressed, size, zip64):
+        """Writes a member's local header and remembers its central directory entry."""
+        stat_info = os.stat(file_path)
+        try:
+            name, flags = arcname.encode("ascii"), 0
+        except UnicodeEncodeError:
+            name, flags = arcname.encode("utf-8", "surrogateescape"), 0x800
+        entry = {
+            "name": name, "flags": flags, "method": method, "crc": crc, "compressed": compressed,
+            "size": size, "offset": self._file.tell(), "zip64": zip64,
+            "dos_time": _dos_time(stat_info.st_mtime), "attributes": (stat_info.st_mode & 0xFFFF) << 16,
+        }
+        extra = struct.pack("<2H2Q", 1, 16, size, compressed) if zip64 else b""
+        self._file.write(_LOCAL_HEADER.pack(
+            b"PK\x03\x04", 45 if zip64 else 20, flags, method, *entry["dos_time"], crc,
+            ZIP64_LIMIT if zip64 else compressed, ZIP64_LIMIT if zip64 else size, len(name), len(extra),
+        ))
+        self._file.write(name)
+        self._file.write(extra)
+        self._entries.append(entry)
+        return entry
+
+    def add(self, file_path, arcname, method, crc, size, data):
+        """Adds a member whose (possibly deflated) data is already in memory."""
+        zip64 = size >= ZIP64_LIMIT or len(data) >= ZIP64_LIMIT
+        self._begin(file_path, arcname, method, crc, len(data), size, zip64)
+        self._file.write(data)
+
+    def add_streamed(self, file_path, arcname, method, level):
+        """
+        Adds a member by reading it in chunks, so large members never sit in
+        memory whole. The header is patched with the CRC and sizes afterwards.
+        Like _deflate, a member is stored instead if deflating its first chunk
+        does not shrink it.
+        """
+        with open(file_path, "rb") as f:
+            first = f.read(STREAM_CHUNK)
+            if method == zipfile.ZIP_DEFLATED:
+                probe = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+                if len(probe.compress(first) + probe.flush()) >= len(first):
+                    method = zipfile.ZIP_STORED
+            entry = self._begin(file_path, arcname, method, 0, 0, 0, zip64=True)
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS) if method == zipfile.ZIP_DEFLATED else None
+            chunk = first
+            while chunk:
+                entry["crc"] = zlib.crc32(chunk, entry["crc"])
+                entry["size"] += len(chunk)
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                entry["compressed"] += len(chunk)
+                self._file.write(chunk)
+                chunk = f.read(STREAM_CHUNK)
+        if compressor is not None:
+            tail = compressor.flush()
+            entry["compressed"] += len(tail)
+            self._file.write(tail)
+
+        end = self._file.tell()
+        self._file.seek(entry["offset"] + 14)
+        self._file.write(struct.pack("<L", entry["crc"]))
+        self._file.seek(entry["offset"] + _LOCAL_HEADER.size + len(entry["name"]) + 4)
+        self._file.write(struct.pack("<2Q", entry["size"], entry["compressed"]))
+        self._file.seek(end)
+
+    def close(self):
+        """Writes the central directory and closes the file."""
+        start = self._file.tell()
+        for entry in self._entries:
+            overflow = [value for value in (entry["size"], entry["compressed"], entry["offset"]) if value >= ZIP64_LIMIT]
+            zip64 = entry["zip64"] or bool(overflow)
+            extra = struct.pack(f"<2H{len(overflow)}Q", 1, 8 * len(overflow), *overflow) if overflow else b""
+            self._file.write(_CENTRAL_HEADER.pack(
+                b"PK\x01\x02", (_CREATE_SYSTEM << 8) | 45, 45 if zip64 else 20, entry["flags"], entry["method"],
+                *entry["dos_time"], entry["crc"],
+                min(entry["compressed"], ZIP64_LIMIT), min(entry["size"], ZIP64_LIMIT),
+                len(entry["name"]), len(extra), 0, 0, 0, entry["attributes"], min(entry["offset"], ZIP64_LIMIT),
+            ))
+            self._file.write(entry["name"])
+            self._file.write(extra)
+
+        end = self._file.tell()
+        entries, size = len(self._entries), end - start
+        if entries >= ZIP64_ENTRY_LIMIT or size >= ZIP64_LIMIT or start >= ZIP64_LIMIT:
+            self._file.write(_ZIP64_END_RECORD.pack(
+                b"PK\x06\x06", _ZIP64_END_RECORD.size - 12, 45, 45, 0, 0, entries, entries, size, start))
+            self._file.write(_ZIP64_LOCATOR.pack(b"PK\x06\x07", 0, end, 1))
+        self._file.write(_END_RECORD.pack(
+            b"PK\x05\x06", 0, 0, min(entries, ZIP64_ENTRY_LIMIT), min(entries, ZIP64_ENTRY_LIMIT),
+            min(size, ZIP64_LIMIT), min(start, ZIP64_LIMIT), 0))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def _deflate(file_path, level):
+    """
+    Reads and raw-deflates a whole file on a worker thread. Returns the
+    method, CRC, size and member data; data that would not shrink is stored.
+    """
+    with open(file_path, "rb") as f:
+        raw = f.read()
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(raw) + compressor.flush()
+    if len(deflated) >= len(raw):
+        return zipfile.ZIP_STORED, zlib.crc32(raw), len(raw), raw
+    return zipfile.ZIP_DEFLATED, zlib.crc32(raw), len(raw), deflated
+
+
+def write_archive(file_list, archive_path, level=DEFAULT_COMPRESSION_LEVEL, workers=None):
+    """
+    Writes file_list into a zip at archive_path, members in list order.
+
+    Compressible members are deflated in parallel on a thread pool and then
+    written sequentially; already-compressed formats are stored as they are.
+    The progress bar tracks bytes, so it shows the throughput in MB/s.
+    """
+    workers = workers or ARCHIVE_WORKERS
+    members = []
+    for file_path in file_list:
+        file_path = os.fspath(file_path)
+        members.append((file_path, os.path.getsize(file_path), is_precompressed(file_path)))
+
+    columns = (
+        TextColumn("{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+    )
+    with operation("write_archive") as record, \
+            Progress(*columns, console=console) as progress, \
+            ThreadPoolExecutor(max_workers=workers) as executor, \
+            _ZipWriter(archive_path) as writer:
+        task = progress.add_task("[red]Compressing files...", total=sum(size for _, size, _ in members))
+
+        def submit(position):
+            file_path, size, stored = members[position]
+            if stored or size > PARALLEL_MEMBER_LIMIT:
+                return None
+            return executor.submit(_deflate, file_path, level)
+
+        futures = {}
+        ahead = 0
+        in_flight = 0
+        for position, (file_path, size, stored) in enumerate(members):
+            # Deflate ahead of the writer, bounded by both queued members and bytes held in memory.
+            while ahead < len(members) and (ahead == position or (
+                    len(futures) < workers * 2 and in_flight + members[ahead][1] <= ARCHIVE_WINDOW_BYTES)):
+                futures[ahead] = submit(ahead)
+                if futures[ahead] is not None:
+                    in_flight += members[ahead][1]
+                ahead += 1
+            future = futures.pop(position)
+            arcname = Path(file_path).name
+            progress.update(task, description=f"[cyan]Adding {arcname}")
+            if future is not None:
+                writer.add(file_path, arcname, *future.result())
+                in_flight -= size
+            else:
+                writer.add_streamed(file_path, arcname, zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED, level)
+            count("bytes_stored" if stored else "bytes_compressed", size)
+            progress.advance(task, size)
+        record.items = len(members)
+        progress.update(task, description="[green]Archive created successfully!")
@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+import heapq
+import argparse
+from operator import attrgetter
+from . import __version__
+from .scanner import configure_scan, dig_site, scan_files
+from .tokens import NAME_DELIMITERS, name_tokens
+from .query import QUERY_HELP, Query, stream_query
+from .utilities import parse_size, add_metrics_arguments, add_rule_arguments, apply_rule_arguments
+from .metrics import enable_metrics, finish_metrics, operation
+from .terminal import LazyConsole
+
+SECONDS_PER_YEAR = 31557600
+
+COMMANDS = ("extensions", "large", "old", "search", "duplicates", "query", "snapshot", "diff")
+
+
+class _Output:
+    """Writes result rows to stdout as NDJSON or CSV, one line per row."""
+
+    def __init__(self, output_format, fields):
+        self.fields = fields
+        self.rows = 0
+        self._csv = None
+        self._dumps = None
+        if output_format == "csv":
+            import csv
+            self._csv = csv.writer(sys.stdout)
+            self._csv.writerow(fields)
+
+    def write(self, *values):
+        self.rows += 1
+        if self._csv is not None:
+            self._csv.writerow(values)
+            return
+        if self._dumps is None:
+            # Loaded with the first row, so runs that find nothing skip json entirely.
+            import json
+            self._dumps = json.dumps
+        sys.stdout.write(self._dumps(dict(zip(self.fields, values))) + "\n")
+
+
+def _record_fields(record, now):
+    return (record.path, record.size, record.mtime, round((now - record.mtime) / 86400, 2), record.allocated)
+
+
+RECORD_FIELDS = ["path", "size", "mtime", "age_days", "allocated"]
+
+
+def _extensions(args, output):
+    now = time.time()
+    for record in scan_files(args.path):
+        ext = os.path.splitext(record.name)[1][1:] or "no_extension"
+        if args.ext is None or ext.lower() == args.ext.lower().lstrip('.'):
+            output.write(ext, *_record_fields(record, now))
+
+
+def _large(args, output):
+    now = time.time()
+    matches = (record for record in scan_files(args.path) if record.size > args.min)
+    if args.top is not None:
+        matches = heapq.nlargest(args.top, matches, key=attrgetter("size"))
+    for record in matches:
+        output.write(*_record_fields(record, now))
+
+
+def _old(args, output):
+    now = time.time()
+    cutoff = now - args.years * SECONDS_PER_YEAR
+    matches = (record for record in scan_files(args.path) if record.mtime < cutoff)
+    if args.top is not None:
+        matches = heapq.nsmallest(args.top, matches, key=attrgetter("mtime"))
+    for record in matches:
+        output.write(*_record_fields(record, now))
+
+
+def _search(args, output):
+    now = time.time()
+    token = args.token.lower()
+    for record in scan_files(args.path):
+        if token in name_tokens(record.name, NAME_DELIMITERS):
+            output.write(*_record_fields(record, now))
+
+
+def _duplicates(args, output):
+    # Hashing is the only batch command that needs hashlib and a thread pool.
+    from .duplicates import find_duplicates
+
+    for group_id, group in enumerate(find_duplicates(args.path), 1):
+        for position, file_path in enumerate(group):
+            output.write(group_id, file_path, group.size(position))
+
+
+def _query(args, output):
+    now = time.time()
+    for record in stream_query(args.path, args.query):
+        output.write(*_record_fields(record, now))
+
+
+def _snapshot(args, output):
+    # Snapshots need zlib, mmap and tempfile, which no other batch command loads.
+    from .snapshots import Snapshot, save_snapshot
+
+    with Snapshot(save_snapshot(args.path, args.output)) as snapshot:
+        output.write(str(snapshot.path), snapshot.files, snapshot.total_size)
+
+
+def _diff(args, output):
+    from .snapshots import Snapshot, diff_snapshots, list_snapshots, save_snapshot, size_delta
+
+    since = args.since
+    if since is None:
+        saved = list_snapshots(args.path)
+        if not saved:
+            raise SystemExit(f"Error: No saved snapshots of '{args.path}'; run `excavate snapshot` first or pass --since.")
+        since = saved[-1]
+    until = args.until or save_snapshot(args.path)
+    with Snapshot(since) as old, Snapshot(until) as new:
+        for section, kind in (("files", "file"), ("dirs", "dir")):
+            for change in diff_snapshots(old, new, section):
+                snapshot = old if change.kind == "removed" else new
+                output.write(change.kind, kind, snapshot.absolute(change.path),
+                             change.old_size, change.new_size, size_delta(change))
+
+
+def _positive_int(text):
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"'{text}' is not a positive whole number")
+    return value
+
+
+def _parse_query(text):
+    try:
+        return Query(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="excavate",
+        description="Non-interactive excavation. Results stream to stdout as NDJSON or CSV.",
+    )
+    parser.add_argument("--version", action="version", version=f"Folder Archaeologist {__version__}")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("path", help="The target dig site to excavate.")
+    common.add_argument("--root", metavar="PATH", action="append", default=[], dest="roots",
+                        help="Another root scanned together with the dig site; repeatable.")
+    common.add_argument("--format", choices=["ndjson", "csv"], default="ndjson", help="Output format.")
+    common.add_argument("--workers", type=int, default=1, help="Number of threads listing directories concurrently.")
+    add_rule_arguments(common)
+    add_metrics_arguments(common)
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extensions = subparsers.add_parser("extensions", parents=[common], help="Every artifact with its material type.")
+    extensions.add_argument("--ext", default=None, help="Only artifacts of this material type (e.g. jpg).")
+    extensions.set_defaults(handler=_extensions, fields=["extension"] + RECORD_FIELDS)
+
+    large = subparsers.add_parser("large", parents=[common], help="Large fossils above a minimum size.")
+    large.add_argument("--min", type=parse_size, default=parse_size("500M"), help="Minimum size, e.g. 100M or 2G.")
+    large.add_argument("--top", type=_positive_int, default=None, help="Only the N largest, emitted once the scan ends.")
+    large.set_defaults(handler=_large, fields=RECORD_FIELDS)
+
+    old = subparsers.add_parser("old", parents=[common], help="Ancient artifacts not modified for a number of years.")
+    old.add_argument("--years", type=float, default=1.0, help="Minimum age in years.")
+    old.add_argument("--top", type=_positive_int, default=None, help="Only the N oldest, emitted once the scan ends.")
+    old.set_defaults(handler=_old, fields=RECORD_FIELDS)
+
+    search = subparsers.add_parser("search", parents=[common], help="Artifacts whose name contains an inscription.")
+    search.add_argument("token", help="The inscription to search for.")
+    search.set_defaults(handler=_search, fields=RECORD_FIELDS)
+
+    duplicates = subparsers.add_parser("duplicates", parents=[common], help="Groups of identical artifacts.")
+    duplicates.set_defaults(handler=_duplicates, fields=["group", "path", "size"])
+
+    query = subparsers.add_parser("query", parents=[common], help="Artifacts matching a multi-criteria query.",
+                                  epilog=QUERY_HELP, formatter_class=argparse.RawDescriptionHelpFormatter)
+    query.add_argument("query", type=_parse_query, help="e.g. 'ext:mp4,mkv size>1G age>3y sort:size top:50'")
+    query.set_defaults(handler=_query, fields=RECORD_FIELDS)
+
+    snapshot = subparsers.add_parser("snapshot", parents=[common], help="Save a compact snapshot of the dig site.")
+    snapshot.add_argument("--output", default=None, help="Snapshot file to write; by default one is added to the saved snapshots.")
+    snapshot.set_defaults(handler=_snapshot, fields=["snapshot", "files", "size"])
+
+    diff = subparsers.add_parser("diff", parents=[common], help="Files and directories changed between two snapshots.")
+    diff.add_argument("--since", default=None, help="Older snapshot file; by default the latest saved one.")
+    diff.add_argument("--until", default=None, help="Newer snapshot file; by default a fresh snapshot is saved.")
+    diff.set_defaults(handler=_diff, fields=["change", "type", "path", "old_size", "new_size", "delta"])
+
+    return parser
+
+
+def run_batch(argv):
+    """
+    Runs a non-interactive excavation subcommand and streams its results to
+    stdout. Returns the process exit code.
+    """
+    args = build_parser().parse_args(argv)
+    paths = [args.path] + args.roots
+    for path in paths:
+        if not os.path.isdir(path):
+            print(f"Error: The path '{path}' is not a valid dig site.", file=sys.stderr)
+            return 1
+    args.path = dig_site(paths)
+
+    configure_scan(workers=args.workers, progress=False)
+    apply_rule_arguments(args)
+    if args.metrics or args.profile:
+        enable_metrics(args.metrics, args.profile)
+    try:
+        with operation(f"batch {args.command}") as record:
+            output = _Output(args.format, args.fields)
+            args.handler(args, output)
+            record.items = output.rows
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader (e.g. `head`) went away; silence the flush at interpreter exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        # stdout carries the results, so the summary goes to stderr.
+        finish_metrics(LazyConsole(stderr=True))
+    return 0
@@ -1,148 +1,199 @@
-import re
-from pathlib import Path
+import os
+import sys
+import heapq
+from array import array
+from operator import attrgetter
 from rich.text import Text
+from rich.markup import escape
 from rich.console import Console
-from rich.progress import Progress
 from datetime import datetime as dt
 from collections import defaultdict
-from .utilities import format_size, clear_screen, show_data
+from .scanner import scan_files
+from .metrics import measured, phase
+from .filetable import FileTable, FileView
+from .leaderboard import LargestLeaderboard, MaterialLeaderboard, OldestLeaderboard
+from .chambers import weigh_chambers
+from .similarity import DEFAULT_SIMILARITY, fuzzy_clusters
+from .query import QUERY_HELP, Query, run_query
+from .tokens import NAME_DELIMITERS, get_token_index, has_token_index
+from .utilities import format_size, clear_screen, show_data, LazyRows
 
 
 console = Console()
 
+# Hashing, snapshots, magic bytes, SQLite and inotify are imported by the menu
+# entries that use them. main only loads the index and watch modules when
+# --index or --watch asks for them, so an unloaded module has nothing active.
+
+def _live_excavation(target_path):
+    """Returns the live watch of target_path, or None when no watch is running."""
+    watch = sys.modules.get(f"{__package__}.watch")
+    return watch.get_live_excavation(target_path) if watch is not None else None
+
+def _indexing_enabled():
+    index = sys.modules.get(f"{__package__}.index")
+    return index is not None and index.indexing_enabled()
+
+def _catalogue(target_path, delimiters=NAME_DELIMITERS):
+    """
+    Returns the live watch catalogue or the persistent index of target_path,
+    whichever is active, so a query can skip the scan. Both only tokenize
+    names with the default delimiters.
+    """
+    if list(delimiters) != NAME_DELIMITERS:
+        return None
+    live = _live_excavation(target_path)
+    if live is not None:
+        return live
+    if not _indexing_enabled():
+        return None
+    from .index import get_index
+    return get_index(target_path)
+
+@measured("categorize_by_extension")
 def categorize_by_extension(target_path):
-    extensions = defaultdict(list)
-    try:
-        total_files = sum(1 for _ in Path(target_path).rglob("*") if _.is_file())
-    except Exception:
-        total_files = 0
-
-    with Progress() as progress:
-        task = progress.add_task("[red]Scanning files...", total=total_files)
-        for file_path in Path(target_path).rglob("*"):
-            if file_path.is_file():
-                ext = file_path.suffix[1:] if file_path.suffix else "no_extension"
-                extensions[ext].append(str(file_path))
-            progress.update(task, advance=1)
-    return extensions
-
-
-def categorize_by_size(target_path, size_threshold=524288000):
-    """Finds files larger than given size threshold."""
-    large_files = []
-    try:
-        total_files = sum(1 for _ in Path(target_path).rglob("*") if _.is_file())
-    except Exception:
-        total_files = 0
-
-    with Progress() as progress:
-        task = progress.add_task("[red]Scanning files...", total=total_files)
-        for file_path in Path(target_path).rglob("*"):
-            if file_path.is_file():
-                try:
-                    size = file_path.stat().st_size
-                    if size > size_threshold:
-                        large_files.append((str(file_path), size))
-                except (FileNotFoundError, PermissionError):
-                    pass
-            progress.update(task, advance=1)
-    large_files.sort(key=lambda x: x[1], reverse=True)
-    return large_files
-
-def categorize_by_age(target_path, year_threshold):
-    old_files = []
-    current_time = dt.now().timestamp()
+    """Groups files by extension, returning a FileView per extension."""
+    catalogue = _catalogue(target_path)
+    if catalogue is not None:
+        return catalogue.extension_groups()
 
-    try:
-        total_files = sum(1 for _ in Path(target_path).rglob("*") if _.is_file())
-    except Exception:
-        total_files = 0
-
-    with Progress() as progress:
-        task = progress.add_task("[red]Scanning files...", total=total_files)
-        for file_path in Path(target_path).rglob("*"):
-            if file_path.is_file():
-                try:
-                    age = current_time - file_path.stat().st_mtime
-                    if age > year_threshold:
-                        old_files.append((str(file_path), age))
-                except (FileNotFoundError, PermissionError):
-                    pass
-            progress.update(task, advance=1)
-    old_files.sort(key=lambda x: x[1], reverse=True)
-    return old_files
-
-
-def categorize_by_similar_names(target_path, delimiters):
+    table = FileTable()
+    extensions = defaultdict(lambda: array('I'))
+    for record in scan_files(target_path, leaderboard=MaterialLeaderboard(extensions)):
+        ext = os.path.splitext(record.name)[1][1:]
+        extensions[ext or "no_extension"].append(table.add_record(record))
+    return {ext: FileView(table, rows) for ext, rows in extensions.items()}
+
+
+@measured("categorize_by_material")
+def categorize_by_material(target_path):
     """
-    Groups files by the first significant token in their names.
-    This version now includes a progress bar.
+    Groups files by the material their first bytes reveal instead of their
+    extension, returning a FileView per material. Files that cannot be read
+    are grouped as 'unreadable'.
     """
-    pattern = '|'.join(map(re.escape, delimiters))
-    groups = defaultdict(list)
-    try:
-        total_files = sum(1 for _ in Path(target_path).rglob("*") if _.is_file())
-    except Exception:
-        total_files = 0
-
-    with Progress() as progress:
-        task = progress.add_task("[red]Scanning files...", total=total_files)
-        for file_path in Path(target_path).rglob("*"):
-            if file_path.is_file():
-                tokens = re.split(pattern, file_path.stem)
-                group_key = next((token.lower() for token in tokens if token), None)
-                if group_key:
-                    groups[group_key].append(str(file_path))
-            progress.update(task, advance=1)
-
-    similar_groups = [(token, files) for token, files in groups.items() if len(files) > 1]
-    similar_groups.sort(key=lambda x: len(x[1]), reverse=True)
-    return similar_groups
-'''
-def categorize_by_similar_names(target_path, delimiters):
+    from .materials import identify_materials
+
+    catalogue = _catalogue(target_path)
+    if catalogue is not None:
+        files = catalogue.all_files()
+    else:
+        table = FileTable()
+        for record in scan_files(target_path):
+            table.add_record(record)
+        files = table.view()
+
+    materials = defaultdict(lambda: array('I'))
+    for position, material in enumerate(identify_materials(files)):
+        materials[material or "unreadable"].append(files.rows[position])
+    return {material: FileView(files.table, rows) for material, rows in materials.items()}
+
+
+@measured("categorize_by_size")
+def categorize_by_size(target_path, size_threshold=524288000, limit=None):
+    """
+    Finds files larger than given size threshold, largest first.
+    With a limit, only the top `limit` files are kept in a bounded heap.
+    """
+    catalogue = _catalogue(target_path)
+    if catalogue is not None:
+        return catalogue.large_files(size_threshold, limit)
+
+    is_large = lambda record: record.size > size_threshold
+    matches = filter(is_large, scan_files(target_path, leaderboard=LargestLeaderboard(is_large)))
+    if limit is not None:
+        matches = heapq.nlargest(limit, matches, key=attrgetter("size"))
+
+    table = FileTable()
+    for record in matches:
+        table.add_record(record)
+    if limit is not None:
+        return table.view()
+    with phase("sort"):
+        return table.view(sorted(range(len(table)), key=table.sizes.__getitem__, reverse=True))
+
+@measured("categorize_by_age")
+def categorize_by_age(target_path, year_threshold, limit=None):
+    """
+    Finds files not modified for longer than year_threshold seconds, oldest first.
+    With a limit, only the top `limit` files are kept in a bounded heap.
+    """
+    catalogue = _catalogue(target_path)
+    if catalogue is not None:
+        return catalogue.old_files(year_threshold, limit)
+
+    cutoff = dt.now().timestamp() - year_threshold
+    is_old = lambda record: record.mtime < cutoff
+    matches = filter(is_old, scan_files(target_path, leaderboard=OldestLeaderboard(is_old)))
+    if limit is not None:
+        matches = heapq.nsmallest(limit, matches, key=attrgetter("mtime"))
+
+    table = FileTable()
+    for record in matches:
+        table.add_record(record)
+    if limit is not None:
+        return table.view()
+    with phase("sort"):
+        return table.view(sorted(range(len(table)), key=table.mtimes.__getitem__))
+
+
+@measured("categorize_by_similar_names")
+def categorize_by_similar_names(target_path, delimiters, rescan=False):
     """
     Groups files by the first significant token in their names.
-    This version is improved to handle various naming conventions more reliably.
+    Clusters come from the session's inverted token index, which is only
+    built by a scan the first time or when rescan is requested.
     """
-    # Create a regex pattern to split by any of the delimiters
-    pattern = '|'.join(map(re.escape, delimiters))
-    groups = defaultdict(list)
-
-    for file_path in Path(target_path).rglob("*"):
-        if file_path.is_file():
-            # Split the filename (without extension) into parts
-            tokens = re.split(pattern, file_path.stem)
-            # Find the first non-empty token as the key
-            group_key = next((token.lower() for token in tokens if token), None)
-            
-            if group_key:
-                groups[group_key].append(str(file_path))
+    catalogue = _catalogue(target_path, delimiters)
+    if catalogue is not None:
+        groups = catalogue.lead_token_groups()
+        similar_groups = [(token, files) for token, files in groups.items() if len(files) > 1]
+        similar_groups.sort(key=lambda x: len(x[1]), reverse=True)
+        return similar_groups
+
+    return get_token_index(target_path, delimiters, rescan).clusters()
+
+
+@measured("categorize_by_fuzzy_names")
+def categorize_by_fuzzy_names(target_path, delimiters, threshold=DEFAULT_SIMILARITY, rescan=False):
+    """
+    Groups files whose names are near-duplicates (e.g. report_final_v2 and
+    Report-final-v3), by character n-gram similarity of at least threshold.
+    Names come from the active catalogue or the session's token index, so
+    only the first run scans the dig site.
+    """
+    catalogue = _catalogue(target_path, delimiters)
+    if catalogue is not None:
+        table = catalogue.all_files().table
+    else:
+        table = get_token_index(target_path, delimiters, rescan).table
+    with phase("fuzzy.cluster"):
+        return fuzzy_clusters(table, threshold, delimiters)
 
-    # Filter out groups with only one file, as they are not "similar"
-    similar_groups = [(token, files) for token, files in groups.items() if len(files) > 1]
-    
-    # Sort by the number of files in each group (most common first)
-    similar_groups.sort(key=lambda x: len(x[1]), reverse=True)
-    return similar_groups
-'''
 
 def show_similarity_selection(target_path, delimiters):
     """
     Interactive menu for finding files with similar names.
     """
     clear_screen()
+    rescan = False
+    catalogue_active = _indexing_enabled() or _live_excavation(target_path) is not None
+    if not catalogue_active and has_token_index(target_path, delimiters):
+        reuse = input("\nReuse the inscriptions catalogued earlier this session? [y/n]: ").strip().lower()
+        rescan = reuse == 'n'
+
     is_specific = input("\nAre you looking for a specific inscription/token? [y/n]: ").strip().lower()
     
     if is_specific == 'y':
-        search_token = input("Enter the specific inscription to search for: ").strip().lower()
+        search_token = input("Enter the specific inscription to search for (use 'word*' for prefix, '*word*' for substring): ").strip().lower()
         if not search_token:
             console.print("[yellow]No inscription entered.[/yellow]")
             return []
 
-        matched_files = search_by_specific_token(target_path, delimiters, search_token)
+        matched_files = search_by_specific_token(target_path, delimiters, search_token, rescan)
 
         if matched_files:
-            file_rows = [[str(idx), Path(fp).name] for idx, fp in enumerate(matched_files, 1)]
+            file_rows = LazyRows(len(matched_files), lambda pos: [str(pos + 1), matched_files.name(pos)])
             show_data(f"Artifacts with inscription '{search_token}'", ["#", "Artifact Name"], file_rows)
             # Automatically return all matched files for operations
             return matched_files
@@ -151,15 +202,29 @@ def show_similarity_selection(target_path, delimiters):
             input("\nPress Enter to return to the menu.")
             return []
     else:
-        # CORRECTED: Ensures the improved categorization logic is called correctly.
-        similar_groups = categorize_by_similar_names(target_path, delimiters)[:10]
+        mode = input("\nCluster by leading inscription or by fuzzy name similarity? [l/f]: ").strip().lower()
+        if mode == 'f':
+            threshold_input = input(f"Enter similarity threshold 0.1-1.0 (leave empty for {DEFAULT_SIMILARITY}): ").strip()
+            try:
+                threshold = float(threshold_input) if threshold_input else DEFAULT_SIMILARITY
+                if not 0.1 <= threshold <= 1.0:
+                    raise ValueError
+            except ValueError:
+                console.print(f"[yellow]Invalid threshold, using {DEFAULT_SIMILARITY}.[/yellow]")
+                threshold = DEFAULT_SIMILARITY
+            similar_groups = categorize_by_fuzzy_names(target_path, delimiters, threshold, rescan)[:10]
+            title, label = f"Top 10 Fuzzy Shard Clusters (similarity >= {threshold})", "Example Name"
+        else:
+            # CORRECTED: Ensures the improved categorization logic is called correctly.
+            similar_groups = categorize_by_similar_names(target_path, delimiters, rescan)[:10]
+            title, label = "Top 10 Pottery Shard Clusters", "Inscription"
         if not similar_groups:
             console.print("[yellow]No pottery shard clusters found.[/yellow]")
             input("\nPress Enter to return to the menu.")
             return []
             
         group_rows = [[str(idx), token, str(len(files))] for idx, (token, files) in enumerate(similar_groups, 1)]
-        show_data("Top 10 Pottery Shard Clusters", ["#", "Inscription", "Artifact Count"], group_rows)
+        show_data(title, ["#", label, "Artifact Count"], group_rows)
         
         try:
             select = int(input("\nSelect cluster number to examine artifacts, or 0 to cancel: "))
@@ -172,35 +237,231 @@ def show_similarity_selection(target_path, delimiters):
         return []
     
 
-def search_by_specific_token(target_path, delimiters, search_token):
+def show_duplicate_selection(target_path):
     """
-    Returns all files where the search token appears in the filename stem.
-    This version includes a progress bar.
+    Interactive menu for finding groups of identical artifacts.
     """
-    pattern = '|'.join(map(re.escape, delimiters))
-    matched_files = []
+    from .duplicates import find_duplicates
+
+    duplicate_groups = find_duplicates(target_path)
+    if not duplicate_groups:
+        console.print("[yellow]No twin relics found.[/yellow]")
+        input("\nPress Enter to return to the menu.")
+        return []
+
+    shown_groups = duplicate_groups[:10]
+    group_rows = [
+        [str(idx), group.name(0), str(len(group)), format_size(group.size(0)), format_size(group.size(0) * (len(group) - 1))]
+        for idx, group in enumerate(shown_groups, 1)
+    ]
+    show_data(f"Top {len(shown_groups)} Twin Relic Groups", ["#", "Artifact Name", "Copies", "Size", "Wasted"], group_rows)
+
+    total_wasted = sum(group.size(0) * (len(group) - 1) for group in duplicate_groups)
+    console.print(f"[cyan]{len(duplicate_groups)} groups found, {format_size(total_wasted)} reclaimable.[/cyan]")
+
+    select = input("\nSelect group number to examine, 'r' for every redundant copy (keeps one per group), or 0 to cancel: ").strip().lower()
+    if select == 'r':
+        table = duplicate_groups[0].table
+        return FileView(table, [row for group in duplicate_groups for row in group.rows[1:]])
     try:
-        total_files = sum(1 for _ in Path(target_path).rglob("*") if _.is_file())
-    except Exception:
-        total_files = 0
+        select = int(select)
+        if 1 <= select <= len(shown_groups):
+            return shown_groups[select - 1]
+    except ValueError:
+        pass
+
+    console.print("[red]Invalid selection or cancelled.[/red]")
+    return []
 
-    with Progress() as progress:
-        task = progress.add_task("[red]Scanning files...", total=total_files)
-        for file_path in Path(target_path).rglob("*"):
-            if file_path.is_file():
-                tokens = [token.lower() for token in re.split(pattern, file_path.stem) if token]
-                if search_token in tokens:
-                    matched_files.append(str(file_path))
-            progress.update(task, advance=1)
 
-    return matched_files
+def show_chamber_selection(target_path, limit=10):
+    """
+    Interactive drill-down through the heaviest chambers (directories) of the dig site.
+    Totals come from one scan, so moving up and down never rescans.
+    """
+    tree = weigh_chambers(target_path, _catalogue(target_path))
+    if not tree.total_files[0]:
+        console.print("[yellow]No artifacts found.[/yellow]")
+        input("\nPress Enter to return to the menu.")
+        return []
+
+    current = 0
+    anywhere = False
+    while True:
+        clear_screen()
+        if anywhere:
+            shown = tree.heaviest(limit)
+            title = f"Top {len(shown)} Heaviest Chambers Anywhere"
+        else:
+            shown = tree.heaviest_children(current, limit)
+            title = f"Heaviest Chambers in {tree.name(current)}"
+        total = tree.total_sizes[current]
+        share_of = tree.total_sizes[0] if anywhere else total
+        rows = [
+            [str(idx), tree.name(node), format_size(tree.total_sizes[node]), format_size(tree.total_allocated[node]),
+             str(tree.total_files[node]), f"{tree.total_sizes[node] / share_of:.1%}" if share_of else "-"]
+            for idx, node in enumerate(shown, 1)
+        ]
+        show_data(title, ["#", "Chamber", "Size", "On Disk", "Artifacts", "Share"], rows)
+        console.print(f"[cyan]{tree.paths[current]}: {format_size(total)} ({format_size(tree.total_allocated[current])} "
+                      f"on disk) in {tree.total_files[current]} artifacts "
+                      f"({format_size(tree.own_sizes[current])} directly inside).[/cyan]")
+
+        select = input("\nSelect chamber number to descend, 'u' to go up, 'h' to toggle heaviest anywhere, "
+                       "'f' for every artifact in this chamber, or 0 to cancel: ").strip().lower()
+        if select == 'u':
+            anywhere = False
+            current = max(tree.parents[current], 0)
+        elif select == 'h':
+            anywhere = not anywhere
+        elif select == 'f':
+            return tree.files(current)
+        elif select == '0':
+            return []
+        else:
+            try:
+                select = int(select)
+                if 1 <= select <= len(shown):
+                    current = shown[select - 1]
+                    anywhere = False
+            except ValueError:
+                pass
+
+
+def show_query_selection(target_path):
+    """
+    Asks for an expedition query and returns its matches, found in a single scan.
+    """
+    console.print(f"[bold cyan]Expedition Query[/bold cyan]\n[dim]{escape(QUERY_HELP)}[/dim]")
+    while True:
+        text = input("\nEnter your query (leave empty to go back): ").strip()
+        if not text:
+            return []
+        try:
+            query = Query(text)
+            break
+        except ValueError as e:
+            console.print(f"[red]{e}[/red]")
+
+    matches = run_query(target_path, query, _catalogue(target_path))
+    if not matches:
+        console.print(f"[yellow]No artifacts match '{escape(query.text)}'.[/yellow]")
+        input("\nPress Enter to return to the menu.")
+        return []
+
+    now = dt.now().timestamp()
+    rows = LazyRows(len(matches), lambda pos: [
+        str(pos + 1), matches.name(pos), format_size(matches.size(pos)),
+        f"{((now - matches.mtime(pos)) / 31557600):.1f} years",
+    ])
+    show_data(f"{len(matches)} Artifacts Matching '{query.text}'", ["#", "Artifact Name", "Size", "Age"], rows)
+    return matches
+
+
+def _signed_size(delta):
+    return ("+" if delta >= 0 else "-") + format_size(abs(delta))
+
+
+def _save_site_snapshot(target_path):
+    """Saves a snapshot from the active catalogue, or a fresh scan when there is none."""
+    from .snapshots import save_snapshot
+
+    catalogue = _catalogue(target_path)
+    if catalogue is None:
+        return save_snapshot(target_path)
+    files = catalogue.all_files()
+    return save_snapshot(target_path, records=map(files.record, range(len(files))))
+
+
+def show_snapshot_selection(target_path):
+    """
+    Saves excavation snapshots of the dig site and compares two of them, or an
+    earlier one with a fresh excavation, showing what appeared, vanished,
+    grew or shrank. Returns the largest added and grown artifacts on request.
+    """
+    from .snapshots import Snapshot, compare_snapshots, list_snapshots, size_delta
+
+    saved = list_snapshots(target_path)
+    rows = []
+    for idx, snapshot_path in enumerate(saved, 1):
+        try:
+            with Snapshot(snapshot_path) as snapshot:
+                rows.append([str(idx), dt.fromtimestamp(snapshot.created).strftime('%Y-%m-%d %H:%M:%S'),
+                             str(snapshot.files), format_size(snapshot.total_size)])
+        except (OSError, ValueError):
+            rows.append([str(idx), snapshot_path.name, "[red]unreadable[/red]", "-"])
+    if rows:
+        show_data("Saved Excavation Snapshots", ["#", "Taken", "Artifacts", "Total Size"], rows)
+    else:
+        console.print("[yellow]No snapshots of this dig site yet.[/yellow]")
+
+    select = input("\nEnter a snapshot number to compare with a fresh excavation, two numbers to compare them, "
+                   "'s' to only save a snapshot, or 0 to go back: ").strip().lower()
+    if select == 's':
+        saved_path = _save_site_snapshot(target_path)
+        if saved_path is None:
+            console.print("[yellow]Excavation stopped early; no snapshot was saved.[/yellow]")
+        else:
+            console.print(f"[green]Snapshot saved to {saved_path}[/green]")
+        input("\nPress Enter to return to the menu.")
+        return []
+    try:
+        numbers = [int(number) for number in select.split()]
+        if not 1 <= len(numbers) <= 2 or not all(1 <= number <= len(saved) for number in numbers):
+            raise ValueError
+    except ValueError:
+        if select != '0':
+            console.print("[red]Invalid selection or cancelled.[/red]")
+        return []
+
+    old_path = saved[numbers[0] - 1]
+    new_path = saved[numbers[1] - 1] if len(numbers) == 2 else _save_site_snapshot(target_path)
+    if new_path is None:
+        console.print("[yellow]Excavation stopped early; nothing was compared.[/yellow]")
+        input("\nPress Enter to return to the menu.")
+        return []
+
+    diff = compare_snapshots(old_path, new_path)
+    summary = [[kind.capitalize(), str(diff.count("files", kind)), _signed_size(diff.bytes("files", kind)),
+                str(diff.count("dirs", kind))]
+               for kind in ("added", "removed", "grown", "shrunk")]
+    show_data("Excavation Diff", ["Change", "Artifacts", "Size Change", "Chambers"], summary)
+    for section, title, label in (("dirs", "Largest Chamber Changes", "Chamber"),
+                                  ("files", "Largest Artifact Changes", "Artifact")):
+        if diff.largest[section]:
+            show_data(title, ["#", "Change", label, "Before", "After", "Difference"], [
+                [str(idx), change.kind, change.path or ".", format_size(change.old_size),
+                 format_size(change.new_size), _signed_size(size_delta(change))]
+                for idx, change in enumerate(diff.largest[section], 1)
+            ])
+
+    appeared = [diff.absolute(change) for change in diff.largest["files"] if change.kind in ("added", "grown")]
+    if not appeared:
+        input("\nPress Enter to return to the menu.")
+        return []
+    select = input("\nEnter 'a' to examine the added and grown artifacts listed above, or 0 to go back: ").strip().lower()
+    return FileView.from_paths(appeared) if select == 'a' else []
+
+
+@measured("search_by_specific_token")
+def search_by_specific_token(target_path, delimiters, search_token, rescan=False):
+    """
+    Returns all files where the search token appears in the filename stem.
+    `token*` matches by prefix and `*token*` by substring. Lookups are
+    answered from the session's inverted token index.
+    """
+    catalogue = _catalogue(target_path, delimiters)
+    if catalogue is not None:
+        return catalogue.token_matches(search_token)
+
+    return get_token_index(target_path, delimiters, rescan).search(search_token)
 
 def show_categories_menu(target_path):
     """
     Shows the main categories menu and handles user selection.
     """
     clear_screen()
-    delimiters = [' ', '-', '_', '.']
+    delimiters = NAME_DELIMITERS
     
     # 1. ASCII Art and Path
     title_art = Text(
@@ -217,37 +478,53 @@ def show_categories_menu(target_path):
     )
     console.print(title_art)
     console.print(f"[bold purple]Made By Koffandaff | Bond0707 [/]")
-    console.print(f"[bold cyan]Excavation Site:[/] [green]{target_path} [/green]\n")
+    console.print(f"[bold cyan]Excavation Site:[/] [green]{target_path} [/green]")
+    if _live_excavation(target_path) is not None:
+        console.print("[bold green]Live watch:[/] [green]results follow changes on disk as they happen.[/green]")
+    console.print()
 
     # 2. Category Table
     menu_rows = [
-        ["1", "By Material Type", "Group artifacts by composition (e.g., .txt, .jpg)."],
+        ["1", "By Material Type", "Group artifacts by extension or by their true contents (e.g., .txt, .jpg)."],
         ["2", "Large Fossils", "Find artifacts larger than 500MB."],
         ["3", "Ancient Artifacts", "Find artifacts older than 1 year."],
-        ["4", "Pottery Shard Clusters", "Group artifacts with similar naming patterns."]
+        ["4", "Pottery Shard Clusters", "Group artifacts with similar naming patterns."],
+        ["5", "Twin Relics", "Find identical artifacts (duplicate files)."],
+        ["6", "Heaviest Chambers", "Find the folders that take up the most space."],
+        ["7", "Expedition Query", "Combine type, size, age, inscription and path filters in one scan."],
+        ["8", "Excavation Diff", "Save snapshots and see what appeared, vanished, grew or shrank since."]
     ]
     show_data("Dig Site Map", ["#", "Find", "Description"], menu_rows)
     
     try:
-        choice = int(input("\nSelect a dig site to explore (1-4), or 0 to leave the excavation: "))
+        choice = int(input(f"\nSelect a dig site to explore (1-{len(menu_rows)}), or 0 to leave the excavation: "))
     except ValueError:
         console.print("[red]Invalid input, please enter a number.[/red]")
         return []
 
     # Clear screen after user makes a valid choice before showing results
-    if 1 <= choice <= 4:
+    if 1 <= choice <= len(menu_rows):
         clear_screen()
     
     if choice == 1:
-        extensions = categorize_by_extension(target_path)
+        mode = input("Group by extension or by true material (read from file contents)? [e/t]: ").strip().lower()
+        by_contents = mode == 't'
+        extensions = categorize_by_material(target_path) if by_contents else categorize_by_extension(target_path)
         sorted_extensions = sorted(extensions.items(), key=lambda x: len(x[1]), reverse=True)[:10]
         if not sorted_extensions: 
             console.print("[yellow]No artifacts found.[/yellow]")
             input("Press Enter to return to the dig map.")
             return []
 
-        rows = [[str(idx), ext, str(len(files))] for idx, (ext, files) in enumerate(sorted_extensions, 1)]
-        show_data("Top 10 Material Types by Count", ["#", "Material", "Artifact Count"], rows)
+        if by_contents:
+            from .materials import is_misnamed
+            rows = [[str(idx), material, str(len(files)),
+                     str(sum(is_misnamed(material, files.name(position)) for position in range(len(files))))]
+                    for idx, (material, files) in enumerate(sorted_extensions, 1)]
+            show_data("Top 10 True Materials by Count", ["#", "Material", "Artifact Count", "Misnamed"], rows)
+        else:
+            rows = [[str(idx), ext, str(len(files))] for idx, (ext, files) in enumerate(sorted_extensions, 1)]
+            show_data("Top 10 Material Types by Count", ["#", "Material", "Artifact Count"], rows)
         
         try:
             select = int(input("\nSelect material number for artifacts, or 0 to go back: "))
@@ -288,20 +565,17 @@ def show_categories_menu(target_path):
                 console.print("[yellow]Invalid input, using default 10.[/yellow]")
                 result_count = 10
 
-        files_found = categorize_by_size(target_path, size_thresh)
+        files_found = categorize_by_size(target_path, size_thresh, result_count)
         if not files_found:
             console.print(f"[yellow]No files found larger than {size_thresh // (1024*1024)} MB.[/yellow]")
             input("Press Enter to return to the menu.")
             return []
 
-        if result_count:
-            files_found = files_found[:result_count]
-
-        rows = [[str(idx), Path(fp).name, format_size(size)] for idx, (fp, size) in enumerate(files_found, 1)]
+        rows = LazyRows(len(files_found), lambda pos: [str(pos + 1), files_found.name(pos), format_size(files_found.size(pos))])
         header = f"Top {result_count if result_count else 'All'} Files Larger Than {size_thresh // (1024 * 1024)} MB"
-        (header, ["#", "Filename", "Size"], rows)
+        show_data(header, ["#", "Filename", "Size"], rows)
 
-        return [fp for fp, size in files_found]
+        return files_found
 
     elif choice == 3:
         use_custom = input("Check for a particular minimum age in years? (y/n): ").strip().lower()
@@ -335,23 +609,33 @@ def show_categories_menu(target_path):
                 console.print("[yellow]Invalid input, using default 10.[/yellow]")
                 result_count = 10
 
-        old_files = categorize_by_age(target_path, age_secs)
+        old_files = categorize_by_age(target_path, age_secs, result_count)
         if not old_files:
             console.print(f"[yellow]No ancient artifacts found older than {age_secs // 31557600} years.[/yellow]")
             input("Press Enter to return to the dig map.")
             return []
 
-        if result_count:
-            old_files = old_files[:result_count]
-
-        rows = [[str(idx), Path(fp).name, f"{(age / 31557600):.1f} years"] for idx, (fp, age) in enumerate(old_files, 1)]
+        now = dt.now().timestamp()
+        rows = LazyRows(len(old_files), lambda pos: [str(pos + 1), old_files.name(pos), f"{((now - old_files.mtime(pos)) / 31557600):.1f} years"])
         header = f"Top {result_count if result_count else 'All'} Ancient Artifacts (>{age_secs // 31557600} years)"
         show_data(header, ["#", "Artifact Name", "Age"], rows)
 
-        return [fp for fp, age in old_files]
+        return old_files
 
     elif choice == 4:
         return show_similarity_selection(target_path, delimiters)
+
+    elif choice == 5:
+        return show_duplicate_selection(target_path)
+
+    elif choice == 6:
+        return show_chamber_selection(target_path)
+
+    elif choice == 7:
+        return show_query_selection(target_path)
+
+    elif choice == 8:
+        return show_snapshot_selection(target_path)
     
     elif choice == 0:
         return "exit" 
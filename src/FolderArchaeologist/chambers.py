@@ -0,0 +1,135 @@
+import os
+import heapq
+from array import array
+from collections import defaultdict
+from .scanner import scan_files
+from .filetable import FileTable, FileView
+from .metrics import measured
+
+
+class ChamberTree:
+    """
+    Cumulative size, size on disk and file count of every directory
+    (chamber) of a dig site.
+
+    Built from a single FileTable: each file's size is added to its own
+    directory, then totals are rolled up from the deepest chambers to the
+    root. Drilling down afterwards only follows the in-memory children lists,
+    so no subtree is ever walked twice.
+    """
+
+    def __init__(self, root, table):
+        self.root = os.path.normpath(os.fspath(root))
+        self.table = table
+        self.paths = []
+        self.parents = array('i')
+        self.own_sizes = array('q')
+        self.own_files = array('q')
+        self.own_allocated = array('q')
+        self.children = []
+        self._lookup = {}
+        self._dir_nodes = array('i')
+        self._node_rows = None
+
+        self._add_node(self.root, -1)
+        for directory in table.dirs:
+            self._dir_nodes.append(self._node(os.path.normpath(directory)))
+
+        sizes = table.sizes
+        allocated = table.allocated
+        dir_nodes = self._dir_nodes
+        for row, dir_id in enumerate(table.dir_ids):
+            node = dir_nodes[dir_id]
+            size = max(sizes[row], 0)
+            self.own_sizes[node] += size
+            self.own_files[node] += 1
+            # Files indexed before allocated sizes were kept count at their apparent size.
+            self.own_allocated[node] += allocated[row] if allocated[row] >= 0 else size
+
+        # Ancestors are always created before their chambers, so walking the
+        # nodes backwards visits every child before its parent.
+        self.total_sizes = array('q', self.own_sizes)
+        self.total_files = array('q', self.own_files)
+        self.total_allocated = array('q', self.own_allocated)
+        for node in range(len(self.paths) - 1, 0, -1):
+            parent = self.parents[node]
+            self.total_sizes[parent] += self.total_sizes[node]
+            self.total_files[parent] += self.total_files[node]
+            self.total_allocated[parent] += self.total_allocated[node]
+
+    def _add_node(self, path, parent):
+        node = self._lookup[path] = len(self.paths)
+        self.paths.append(path)
+        self.parents.append(parent)
+        self.own_sizes.append(0)
+        self.own_files.append(0)
+        self.own_allocated.append(0)
+        self.children.append([])
+        if parent >= 0:
+            self.children[parent].append(node)
+        return node
+
+    def _node(self, path):
+        """Returns the node of a chamber, creating it and any missing ancestors."""
+        node = self._lookup.get(path)
+        missing = []
+        while node is None:
+            missing.append(path)
+            parent_path = os.path.dirname(path)
+            if parent_path == path or len(parent_path) < len(self.root):
+                parent_path = self.root
+            path = parent_path
+            node = self._lookup.get(path)
+        for path in reversed(missing):
+            node = self._add_node(path, node)
+        return node
+
+    def __len__(self):
+        return len(self.paths)
+
+    def heaviest_children(self, node=0, limit=None):
+        """Returns the child chambers of node, heaviest first, keeping only `limit` of them."""
+        key = self.total_sizes.__getitem__
+        if limit is None:
+            return sorted(self.children[node], key=key, reverse=True)
+        return heapq.nlargest(limit, self.children[node], key=key)
+
+    def heaviest(self, limit):
+        """Returns the `limit` heaviest chambers anywhere below the root."""
+        return heapq.nlargest(limit, range(1, len(self.paths)), key=self.total_sizes.__getitem__)
+
+    def files(self, node):
+        """Returns a FileView of every file below a chamber, largest first."""
+        if self._node_rows is None:
+            self._node_rows = defaultdict(lambda: array('I'))
+            for row, dir_id in enumerate(self.table.dir_ids):
+                self._node_rows[self._dir_nodes[dir_id]].append(row)
+
+        rows = array('I')
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            rows.extend(self._node_rows.get(current, ()))
+            pending.extend(self.children[current])
+        return FileView(self.table, sorted(rows, key=self.table.sizes.__getitem__, reverse=True))
+
+    def name(self, node):
+        """The chamber path relative to the dig site root."""
+        if node == 0:
+            return "."
+        return os.path.relpath(self.paths[node], self.root)
+
+
+@measured("weigh_chambers")
+def weigh_chambers(target_path, catalogue=None):
+    """
+    Returns the ChamberTree of target_path from one scan, or from an
+    already-loaded catalogue (persistent index or live watch) if given.
+    """
+    if catalogue is not None:
+        return ChamberTree(catalogue.root, catalogue.all_files().table)
+
+    table = FileTable()
+    for record in scan_files(target_path, "[red]Weighing chambers..."):
+        table.add_record(record)
+    return ChamberTree(target_path, table)
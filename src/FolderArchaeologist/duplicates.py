@@ -0,0 +1,125 @@
+import os
+import mmap
+import hashlib
+from array import array
+from collections import defaultdict
+from .scanner import scan_files, progress_enabled
+from .filetable import FileTable, FileView
+from .metrics import count, measured, metrics_enabled, phase
+from .terminal import LazyConsole
+
+console = LazyConsole()
+
+# Bytes hashed from each end of a file in the partial-hash stage.
+EDGE_BYTES = 8192
+# Read size for buffered full hashing of files too small to be worth an mmap.
+HASH_BUFFER = 1024 * 1024
+MMAP_THRESHOLD = 4 * HASH_BUFFER
+# hashlib releases the GIL on large updates, so threads hash in parallel.
+HASH_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+# Hash jobs submitted to the pool at a time, to bound queued futures.
+HASH_BATCH = 4096
+
+
+def partial_hash(path, size):
+    """Hashes the first and last EDGE_BYTES of a file. Returns None if unreadable."""
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as f:
+            digest.update(f.read(EDGE_BYTES))
+            if size > EDGE_BYTES:
+                f.seek(max(EDGE_BYTES, size - EDGE_BYTES))
+                digest.update(f.read(EDGE_BYTES))
+    except OSError:
+        return None
+    return digest.digest()
+
+
+def full_hash(path):
+    """Hashes a whole file, through mmap for large files. Returns None if unreadable."""
+    digest = hashlib.blake2b()
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+            else:
+                for chunk in iter(lambda: f.read(HASH_BUFFER), b""):
+                    digest.update(chunk)
+    except (OSError, ValueError):
+        return None
+    return digest.digest()
+
+
+def _regroup(table, groups, hasher, description, workers):
+    """
+    Splits every candidate group by the hash of its members and returns the
+    sub-groups that still hold more than one file.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from rich.progress import Progress
+
+    jobs = [(key, row) for key, rows in groups.items() for row in rows]
+    regrouped = defaultdict(lambda: array('I'))
+    with Progress(console=console.load(), disable=not progress_enabled()) as progress, ThreadPoolExecutor(max_workers=workers) as executor:
+        task = progress.add_task(description, total=len(jobs))
+        for start in range(0, len(jobs), HASH_BATCH):
+            batch = jobs[start:start + HASH_BATCH]
+            digests = executor.map(lambda job: hasher(table.path(job[1]), table.sizes[job[1]]), batch)
+            for (key, row), digest in zip(batch, digests):
+                if digest is not None:
+                    regrouped[(key, digest)].append(row)
+                progress.advance(task)
+    return {key: rows for key, rows in regrouped.items() if len(rows) > 1}
+
+
+def _bytes_to_hash(table, groups, limit=None):
+    """Sums the bytes a hashing stage reads from the files in groups."""
+    sizes = table.sizes
+    if limit is None:
+        return sum(sizes[row] for rows in groups.values() for row in rows)
+    return sum(min(sizes[row], limit) for rows in groups.values() for row in rows)
+
+
+@measured("find_duplicates")
+def find_duplicates(target_path, workers=None):
+    """
+    Finds files with identical contents below target_path.
+
+    Candidates are narrowed in stages so most files are never read: files are
+    first grouped by the size seen during the scan, then by a hash of their
+    first and last few KB, and only files that still collide are fully hashed.
+    Empty files are ignored.
+
+    Returns
+    -------
+    list[FileView]
+        One view per duplicate group, most wasted space first.
+    """
+    workers = workers or HASH_WORKERS
+    table = FileTable()
+    by_size = defaultdict(lambda: array('I'))
+    for record in scan_files(target_path):
+        if record.size > 0:
+            by_size[record.size].append(table.add_record(record))
+    candidates = {size: rows for size, rows in by_size.items() if len(rows) > 1}
+    del by_size
+
+    if metrics_enabled():
+        count("bytes_hashed", _bytes_to_hash(table, candidates, 2 * EDGE_BYTES))
+    with phase("hash.partial"):
+        candidates = _regroup(table, candidates, partial_hash, "[red]Brushing off artifact edges...", workers)
+
+    # Files no larger than both edges were hashed completely in the partial stage.
+    confirmed = {key: rows for key, rows in candidates.items() if key[0] <= 2 * EDGE_BYTES}
+    unconfirmed = {key: rows for key, rows in candidates.items() if key[0] > 2 * EDGE_BYTES}
+    if metrics_enabled():
+        count("bytes_hashed", _bytes_to_hash(table, unconfirmed))
+    with phase("hash.full"):
+        confirmed.update(_regroup(table, unconfirmed, lambda path, size: full_hash(path),
+                                  "[red]Comparing full inscriptions...", workers))
+
+    groups = [FileView(table, rows) for rows in confirmed.values()]
+    groups.sort(key=lambda group: group.size(0) * (len(group) - 1), reverse=True)
+    return groups
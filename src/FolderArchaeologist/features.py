@@ -1,34 +1,57 @@
 import os
-import shutil
+import errno
 import datetime
-import platform
-import mimetypes
-import subprocess
+import functools
 from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from rich.console import Console
 from rich.progress import Progress
-from .utilities import format_size, clear_screen, show_data
+from .filetable import as_file_view
+from .metrics import operation
+from .scanner import allocated_size
+from .utilities import PAGE_SIZE, format_size, clear_screen, show_data, show_paged_data, LazyRows
 
 console = Console()
 
-try:
-    import send2trash
-except ImportError:
-    send2trash = None
+# Cross-device moves are copies, so several run at once.
+MOVE_WORKERS = 8
+DELETE_WORKERS = 8
+STAT_WORKERS = 16
+
+@functools.lru_cache(maxsize=None)
+def _send2trash():
+    """Imports send2trash the first time files are deleted. Returns None if it is not installed."""
+    try:
+        import send2trash
+    except ImportError:
+        return None
+    return send2trash
+
+def _name_rows(file_paths):
+    """Lazily built '#' and 'Filename' rows for a FileView."""
+    return LazyRows(len(file_paths), lambda pos: [str(pos + 1), file_paths.name(pos)])
 
 def select_files(file_paths):
-    """Allows user to select specific files from a list by index."""
+    """
+    Allows user to select specific files from a FileView by index.
+    The list can be paged and filtered; numbers always refer to the whole list.
+    Returns a view over the chosen rows, so no paths are copied.
+    """
     clear_screen() # 3. Clear screen on select
     if not file_paths:
         console.print("[yellow]No files to select from.[/yellow]")
         return []
         
-    selected_files = []
+    selected_positions = []
     
-    rows = [[str(idx), Path(fp).name] for idx, fp in enumerate(file_paths, 1)]
-    show_data("Available Files for Selection", ["#", "Filename"], rows)
-    
-    selection_input = input("\nEnter file numbers separated by spaces (e.g., 1 3 5), or 'all': ").strip()
+    selection_input = show_paged_data(
+        "Available Files for Selection", ["#", "Filename"], _name_rows(file_paths),
+        filter_text=file_paths.name,
+        prompt="Enter file numbers or ranges separated by spaces (e.g., 1 3 5-9), or 'all'",
+    )
+    if selection_input is None:
+        return []
     
     if selection_input.lower() == 'all':
         return file_paths
@@ -37,46 +60,133 @@ def select_files(file_paths):
     
     for index_str in selected_indices:
         try:
-            index = int(index_str) - 1
-            if 0 <= index < len(file_paths):
-                selected_files.append(file_paths[index])
+            first, _, last = index_str.partition('-')
+            first = int(first) - 1
+            last = int(last) - 1 if last else first
+            if 0 <= first <= last < len(file_paths):
+                selected_positions.extend(range(first, last + 1))
             else:
                 console.print(f"[red]Invalid index: {index_str}[/red]")
         except ValueError:
             console.print(f"[red]Invalid input: {index_str} is not a number[/red]")
     
-    return selected_files
+    return file_paths.subset(selected_positions)
+
+def _delete_batch(batch):
+    """
+    Deletes one directory's worth of files, trying a single trash call first and
+    falling back to one call per file to find out which files failed.
+    Returns a list of (file_path, error or None).
+    """
+    outcomes = [(file_path, FileNotFoundError("File not found")) for file_path in batch
+                if not os.path.lexists(file_path)]
+    batch = [file_path for file_path in batch if os.path.lexists(file_path)]
+    send2trash = _send2trash()
+    if send2trash and batch:
+        try:
+            send2trash.send2trash(batch)
+            return outcomes + [(file_path, None) for file_path in batch]
+        except Exception:
+            pass
+
+    for file_path in batch:
+        try:
+            # A failed batch call may already have trashed some of its files.
+            if os.path.lexists(file_path):
+                if send2trash:
+                    send2trash.send2trash(file_path)
+                else:
+                    os.remove(file_path)
+            outcomes.append((file_path, None))
+        except Exception as e:
+            outcomes.append((file_path, e))
+    return outcomes
 
 def delete_files(file_paths):
-    """Deletes all files in the provided list after user confirmation."""
+    """
+    Deletes all files in the provided list after user confirmation.
+    Files are grouped by directory and trashed one batch per directory. Permanent
+    deletes (without send2trash) also run batches concurrently. Returns the list
+    of files that were actually deleted.
+    """
     clear_screen() # 3. Clear screen on delete
     if not file_paths:
         console.print("[yellow]No files to delete.[/yellow]")
-        return
-    
-    rows = [[str(idx), Path(fp).name] for idx, fp in enumerate(file_paths, 1)]
-    show_data(f"Files to be Deleted ({len(file_paths)} total)", ["#", "Filename"], rows)
+        return []
     
-    confirm = input(f"\nAre you sure you want to delete these {len(file_paths)} files? [y/n]: ").strip().lower()
+    file_paths = as_file_view(file_paths)
+    # Every page can be reviewed before confirming, not just the first.
+    confirm = show_paged_data(
+        f"Files to be Deleted ({len(file_paths)} total)", ["#", "Filename"], _name_rows(file_paths),
+        filter_text=file_paths.name,
+        prompt=f"Type 'yes' to delete all {len(file_paths)} files, or q to cancel",
+    )
     
-    if confirm != 'y':
+    if (confirm or "").strip().lower() != 'yes':
         console.print("[yellow]Deletion cancelled.[/yellow]")
-        return
-    
+        return []
+
+    batches = defaultdict(list)
     for file_path in file_paths:
-        file_path = Path(file_path)
-        try:
-            if send2trash:
-                send2trash.send2trash(str(file_path))
-                console.print(f"Moved '{file_path.name}' to trash.")
-            else:
-                os.remove(file_path)
-                console.print(f"[yellow]Permanently deleted '{file_path.name}' (send2trash not installed).[/yellow]")
-        except Exception as e:
-            console.print(f"[red]Failed to delete '{file_path.name}': {e}[/red]")
+        batches[os.path.dirname(file_path)].append(str(file_path))
+
+    # The freedesktop trash picks entry names with an exists-then-write check,
+    # so concurrent trashing could overwrite entries; only unlinking is parallel.
+    send2trash = _send2trash()
+    workers = 1 if send2trash else DELETE_WORKERS
+    deleted, failed = [], []
+    with operation("delete_files") as record, Progress(console=console) as progress, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        task = progress.add_task("[red]Deleting files...", total=len(file_paths))
+        for future in as_completed([executor.submit(_delete_batch, batch) for batch in batches.values()]):
+            for file_path, error in future.result():
+                if error is None:
+                    deleted.append(file_path)
+                else:
+                    failed.append((file_path, error))
+            progress.advance(task, len(future.result()))
+        record.items = len(deleted)
+
+    if failed:
+        rows = [[str(idx), Path(fp).name, str(error)] for idx, (fp, error) in enumerate(failed, 1)]
+        if len(rows) > PAGE_SIZE:
+            show_paged_data("Files That Could Not Be Deleted", ["#", "Filename", "Reason"], rows)
+        else:
+            show_data("Files That Could Not Be Deleted", ["#", "Filename", "Reason"], rows)
+    action = "Moved to trash" if send2trash else "Permanently deleted (send2trash not installed)"
+    console.print(f"[green]{action}: {len(deleted)} files.[/green]"
+                  + (f" [red]{len(failed)} failed.[/red]" if failed else ""))
+    input("\nPress Enter to return to the selection menu...")
+    return deleted
+
+def _free_name(name, taken, next_suffix):
+    """
+    Returns name, or the first free 'name(N).ext' variant, and marks it taken.
+    next_suffix remembers the last N tried per name so repeated collisions
+    resolve in amortised constant time.
+    """
+    key = os.path.normcase(name)
+    if key not in taken:
+        taken.add(key)
+        return name
+
+    stem, suffix = os.path.splitext(name)
+    count = next_suffix.get(key, 1)
+    candidate = f"{stem}({count}){suffix}"
+    while os.path.normcase(candidate) in taken:
+        count += 1
+        candidate = f"{stem}({count}){suffix}"
+    next_suffix[key] = count + 1
+    taken.add(os.path.normcase(candidate))
+    return candidate
 
 def move_files(file_paths, target_folder):
-    """Move given files to the target folder, creating it if missing."""
+    """
+    Move given files to the target folder, creating it if missing.
+    The destination is listed once and name collisions are resolved in memory.
+    Same-device moves are a single rename; cross-device copies run in parallel.
+    Returns the list of files that were moved.
+    """
     clear_screen()
     target_folder = Path(target_folder)
     
@@ -84,30 +194,57 @@ def move_files(file_paths, target_folder):
         if not target_folder.exists():
             console.print(f"Target folder '{target_folder}' doesn't exist. Creating it...")
             target_folder.mkdir(parents=True, exist_ok=True)
+        taken = {os.path.normcase(name) for name in os.listdir(target_folder)}
     except Exception as e:
         console.print(f"[red]Could not create target folder: {e}[/red]")
-        return
+        return []
 
-    for file_path in file_paths:
-        file_path = Path(file_path)
-        dest_path = target_folder / file_path.name
-        
-        count = 1
-        original_stem = file_path.stem
-        original_suffix = file_path.suffix
-        
-        while dest_path.exists():
-            dest_path = target_folder / f"{original_stem}({count}){original_suffix}"
-            count += 1
-        
-        try:
-            shutil.move(str(file_path), str(dest_path))
-            console.print(f"Moved '{file_path.name}' to '{dest_path}'")
-        except Exception as e:
-            console.print(f"[red]Failed to move '{file_path}': {e}[/red]")
+    next_suffix = {}
+    plan = [(str(file_path), str(target_folder / _free_name(os.path.basename(file_path), taken, next_suffix)))
+            for file_path in file_paths]
+
+    moved, failed, cross_device = [], [], []
+    with operation("move_files") as record, Progress(console=console) as progress:
+        task = progress.add_task("[red]Moving files...", total=len(plan))
+        for source, destination in plan:
+            try:
+                os.rename(source, destination)
+                moved.append(source)
+            except OSError as e:
+                if e.errno == errno.EXDEV:
+                    cross_device.append((source, destination))
+                    continue
+                failed.append((source, e))
+            progress.advance(task)
+
+        if cross_device:
+            import shutil
+
+            progress.update(task, description="[red]Copying files across devices...")
+            with ThreadPoolExecutor(max_workers=MOVE_WORKERS) as executor:
+                futures = {executor.submit(shutil.move, source, destination): source
+                           for source, destination in cross_device}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                        moved.append(futures[future])
+                    except Exception as e:
+                        failed.append((futures[future], e))
+                    progress.advance(task)
+        record.items = len(moved)
+
+    for source, error in failed:
+        console.print(f"[red]Failed to move '{source}': {error}[/red]")
+    console.print(f"[green]Moved {len(moved)} files to '{target_folder}'.[/green]"
+                  + (f" [red]{len(failed)} failed.[/red]" if failed else ""))
+    input("\nPress Enter to return to the selection menu...")
+    return moved
 
 def open_files(file_paths):
     """Opens multiple files with the default application."""
+    import platform
+    import subprocess
+
     clear_screen()
     for file_path in file_paths:
         try:
@@ -122,55 +259,106 @@ def open_files(file_paths):
         except Exception as e:
             console.print(f"[red]Error opening file {Path(file_path).name}: {e}[/red]")
 
+def _restat(file_paths, position):
+    """
+    Re-stats one file of a FileView and stores the result in its table.
+    Returns None on success or the error message for the file.
+    """
+    try:
+        stat_info = os.stat(file_paths[position])
+    except OSError as e:
+        return "File not found" if isinstance(e, FileNotFoundError) else f"Error: {e}"
+    row = file_paths.rows[position]
+    table = file_paths.table
+    table.sizes[row] = stat_info.st_size
+    table.mtimes[row] = stat_info.st_mtime
+    table.ctimes[row] = stat_info.st_ctime
+    table.allocated[row] = allocated_size(stat_info)
+    table.devices[row] = stat_info.st_dev
+    table.inodes[row] = stat_info.st_ino
+    return None
+
+def refresh_file_stats(file_paths):
+    """
+    Re-stats every file of a FileView in parallel, updating its table in place.
+    Returns a mapping of position to error message for files that failed.
+    """
+    errors = {}
+    with operation("refresh_file_stats") as record, Progress(console=console) as progress, \
+            ThreadPoolExecutor(max_workers=STAT_WORKERS) as executor:
+        task = progress.add_task("[red]Re-examining artifacts...", total=len(file_paths))
+        for position, error in enumerate(executor.map(lambda position: _restat(file_paths, position), range(len(file_paths)))):
+            if error is not None:
+                errors[position] = error
+            progress.advance(task)
+        record.items = len(file_paths)
+    return errors
+
 def get_files_details(file_paths):
-    """Displays detailed information about the given files in a single table."""
+    """
+    Displays detailed information about the given files, page by page.
+    Sizes, timestamps and materials come from the scan that found the files;
+    only files without scan data are stat-ed, and only when their page is
+    shown. The whole selection can be re-stat-ed from disk on request, which
+    also identifies materials through the material cache.
+    """
     clear_screen()
     if not file_paths:
         console.print("[yellow]No files to get details for.[/yellow]")
         return
 
-    columns = ["#", "Filename", "Size", "Created", "Modified", "MIME Type", "Full Path"]
-    rows = []
-    for idx, file_path in enumerate(file_paths, 1):
-        file_path = Path(file_path)
-        try:
-            if not file_path.exists():
-                rows.append([str(idx), file_path.name, "[red]File not found[/red]", "-", "-", "-", str(file_path)])
-                continue
-            
-            stat_info = file_path.stat()
-            size = stat_info.st_size
-            ctime = stat_info.st_ctime
-            mtime = stat_info.st_mtime
-            mime_type, _ = mimetypes.guess_type(str(file_path))
-            
-            row_data = [
-                str(idx),
-                file_path.name,
-                format_size(size),
-                datetime.datetime.fromtimestamp(ctime).strftime('%Y-%m-%d %H:%M:%S'),
-                datetime.datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S'),
-                mime_type if mime_type else "unknown",
-                str(file_path.resolve())  # full absolute path
-            ]
-            rows.append(row_data)
-        except (FileNotFoundError, PermissionError) as e:
-            rows.append([str(idx), file_path.name, f"[red]Error: {e}[/red]", "-", "-", "-", str(file_path)])
-
-    show_data("File Details", columns, rows)
-    input("\nPress Enter to return to the selection menu...")
+    import mimetypes
+    from .materials import identify_materials, material_mime_type
+
+    file_paths = as_file_view(file_paths)
+    errors = {}
+
+    def render_row(position):
+        file_path = file_paths[position]
+        if file_paths.size(position) < 0 and position not in errors:
+            error = _restat(file_paths, position)
+            if error is not None:
+                errors[position] = error
+        if position in errors:
+            return [str(position + 1), file_paths.name(position), f"[red]{errors[position]}[/red]", "-", "-", "-", "-", os.path.abspath(file_path)]
+
+        # A material read from the first bytes beats the name for binary files;
+        # text files are named more precisely.
+        mime_type = material_mime_type(file_paths.material(position)) \
+            or mimetypes.guess_type(file_paths.name(position))[0]
+        return [
+            str(position + 1),
+            file_paths.name(position),
+            format_size(file_paths.size(position)),
+            format_size(file_paths.allocated(position)) if file_paths.allocated(position) >= 0 else "N/A",
+            datetime.datetime.fromtimestamp(file_paths.ctime(position)).strftime('%Y-%m-%d %H:%M:%S'),
+            datetime.datetime.fromtimestamp(file_paths.mtime(position)).strftime('%Y-%m-%d %H:%M:%S'),
+            mime_type if mime_type else "unknown",
+            os.path.abspath(file_path)  # full absolute path
+        ]
+
+    def refresh():
+        errors.clear()
+        errors.update(refresh_file_stats(file_paths))
+        identify_materials(file_paths)
+
+    columns = ["#", "Filename", "Size", "On Disk", "Created", "Modified", "MIME Type", "Full Path"]
+    show_paged_data("File Details", columns, LazyRows(len(file_paths), render_row),
+                    actions={"r": ("refresh from disk", refresh)}, filter_text=file_paths.name)
 
 
 
-def archive_files(file_list, archive_name=None):
+def archive_files(file_list, archive_name=None, compression_level=None):
     """
-    Archives all specified files into a single zip file using Python's zipfile module.
+    Archives all specified files into a single zip file.
     Prompts user for a destination directory (creates it if missing),
     uses home directory as default if no input given,
-    then asks for archive name and shows final zip full path.
+    then asks for archive name and compression level and shows final zip full path.
+    Members are deflated in parallel; already-compressed formats are stored as is.
     """
+    from .archiver import write_archive, DEFAULT_COMPRESSION_LEVEL
+
     from os.path import expanduser
-    import zipfile
 
     clear_screen()
 
@@ -199,22 +387,25 @@ def archive_files(file_list, archive_name=None):
     if not archive_name.endswith(".zip"):
         archive_name += ".zip"
 
+    # Ask user for compression level if not provided
+    if compression_level is None:
+        level_input = input(f"Enter compression level 1-9 (leave empty for {DEFAULT_COMPRESSION_LEVEL}): ").strip()
+        try:
+            compression_level = int(level_input) if level_input else DEFAULT_COMPRESSION_LEVEL
+            if not 1 <= compression_level <= 9:
+                raise ValueError
+        except ValueError:
+            console.print(f"[yellow]Invalid level. Using default {DEFAULT_COMPRESSION_LEVEL}.[/yellow]")
+            compression_level = DEFAULT_COMPRESSION_LEVEL
+
     # Full archive path
     archive_full_path = dest_path / archive_name
 
-    with Progress() as progress:
-        task = progress.add_task("[red]Compressing files...", total=len(file_list))
-        try:
-            with zipfile.ZipFile(archive_full_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file_path in file_list:
-                    path_obj = Path(file_path)
-                    zipf.write(path_obj, path_obj.name)
-                    progress.update(task, advance=1, description=f"[cyan]Adding {path_obj.name}")
-            progress.update(task, completed=True, description="[green]Archive created successfully!")
-            console.print(f"Files archived to: [bold]{archive_full_path.resolve()}[/bold]")
-        except Exception as e:
-            progress.update(task, completed=True, description="[bold red]Error creating archive.[/bold red]")
-            console.print(f"[red]Error creating archive: {e}[/red]")
+    try:
+        write_archive(file_list, archive_full_path, compression_level)
+        console.print(f"Files archived to: [bold]{archive_full_path.resolve()}[/bold]")
+    except Exception as e:
+        console.print(f"[red]Error creating archive: {e}[/red]")
 
 
 def file_operations_menu(file_paths):
@@ -222,6 +413,7 @@ def file_operations_menu(file_paths):
     Interactive menu for performing operations on a list of files.
     Returns True to go back to categories, False to exit the program.
     """
+    file_paths = as_file_view(file_paths)
     original_files = file_paths.copy()
     current_files = file_paths.copy()
     
@@ -234,8 +426,9 @@ def file_operations_menu(file_paths):
         clear_screen()
         console.print(f"\n[bold]{'='*26} FILE OPERATIONS MENU ({len(current_files)} files) {'='*26}[/bold]")
         
-        file_rows = [[str(idx), Path(fp).name] for idx, fp in enumerate(current_files, 1)]
-        show_data("Current Files for Operation", ["#", "Filename"], file_rows)
+        show_data("Current Files for Operation", ["#", "Filename"], _name_rows(current_files))
+        if len(current_files) > PAGE_SIZE:
+            console.print(f"[dim]...and {len(current_files) - PAGE_SIZE} more. Use \\[J] to browse them all.[/dim]")
         
         console.print(f"\n[bold cyan]{'='*38} OPTIONS {'='*38}[/bold cyan]")
         print("[A] Select Specific Files")
@@ -248,8 +441,9 @@ def file_operations_menu(file_paths):
         # BUG FIX: Renamed menu option for clarity.
         print("[H] Back to Main Menu")
         print("[I] Exit Program")
+        print("[J] Browse / Filter Current Files")
         
-        choice = input(f"\nSelect an option [A-I]: ").strip().upper()
+        choice = input(f"\nSelect an option [A-J]: ").strip().upper()
         
         if choice == 'A':
             selected = select_files(current_files)
@@ -258,8 +452,9 @@ def file_operations_menu(file_paths):
                 console.print(f"[green]Selected {len(current_files)} files.[/green]")
         
         elif choice == 'B':
-            delete_files(current_files)
-            current_files = [] # Assume deletion was successful to clear list
+            deleted = delete_files(current_files)
+            current_files = current_files.without(deleted)
+            original_files = original_files.without(deleted)
         
         elif choice == 'C':
             open_files(current_files)
@@ -271,8 +466,9 @@ def file_operations_menu(file_paths):
                 target_folder = input("Enter destination folder path: ").strip()
                 if not target_folder:
                     console.print("[red]Path cannot be empty. Please enter a destination folder.[/red]")
-            move_files(current_files, target_folder)
-            current_files = [] # Files have been moved, so the selection is now empty.
+            moved = move_files(current_files, target_folder)
+            current_files = current_files.without(moved)
+            original_files = original_files.without(moved)
         
         elif choice == 'E':
             # BUG FIX: Keep asking for an archive name if the input is empty.
@@ -299,5 +495,9 @@ def file_operations_menu(file_paths):
         elif choice == 'I':
             return False # Signal to main loop to break
         
+        elif choice == 'J':
+            show_paged_data("Current Files for Operation", ["#", "Filename"], _name_rows(current_files),
+                            filter_text=current_files.name)
+        
         else:
-            console.print("[red]Invalid choice. Please select from A-I.[/red]")
+            console.print("[red]Invalid choice. Please select from A-J.[/red]")
@@ -0,0 +1,157 @@
+import os
+from array import array
+from collections.abc import Sequence
+from .scanner import FileRecord
+
+
+class FileTable:
+    """
+    A compact, column-oriented table of excavated files.
+
+    Directory paths are interned once and every file only keeps a directory
+    id and its basename. Sizes and timestamps live in typed `array` columns
+    instead of per-file tuples, which keeps millions of rows in a fraction of
+    the memory of lists of path strings.
+    """
+
+    def __init__(self):
+        self.dirs = []
+        self._dir_lookup = {}
+        self.dir_ids = array('I')
+        self.names = []
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.ctimes = array('d')
+        self.allocated = array('q')
+        # (st_dev, st_ino) identities, 0 where unknown, e.g. to key the material cache.
+        self.devices = array('Q')
+        self.inodes = array('Q')
+        # Materials identified from file contents, by row; most rows never get one.
+        self.materials = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, directory, name, size=-1, mtime=float("nan"), ctime=float("nan"), allocated=-1, dev=0, inode=0):
+        """Appends a file and returns its row number. Unknown stats default to -1 / NaN / 0."""
+        dir_id = self._dir_lookup.get(directory)
+        if dir_id is None:
+            dir_id = self._dir_lookup[directory] = len(self.dirs)
+            self.dirs.append(directory)
+        self.dir_ids.append(dir_id)
+        self.names.append(name)
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.ctimes.append(ctime)
+        self.allocated.append(allocated)
+        self.devices.append(dev)
+        self.inodes.append(inode)
+        return len(self.names) - 1
+
+    def add_record(self, record):
+        """Appends a FileRecord from the scan engine and returns its row number."""
+        directory = record.path[:-len(record.name) - 1] or os.sep
+        return self.add(directory, record.name, record.size, record.mtime, record.ctime, record.allocated,
+                        record.dev, record.inode)
+
+    def path(self, row):
+        return os.path.join(self.dirs[self.dir_ids[row]], self.names[row])
+
+    def record(self, row):
+        return FileRecord(self.path(row), self.names[row], self.sizes[row], self.mtimes[row], self.ctimes[row],
+                          self.devices[row], self.inodes[row], self.allocated[row])
+
+    def view(self, rows=None):
+        """Returns a FileView over the given rows, or over the whole table."""
+        if rows is None:
+            rows = range(len(self))
+        return FileView(self, rows)
+
+
+class FileView(Sequence):
+    """
+    A read-only sequence of file paths backed by a FileTable and an array of
+    row numbers. Slicing, copying and sub-selection only copy row numbers,
+    never paths.
+    """
+
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = rows if isinstance(rows, array) else array('I', rows)
+
+    @classmethod
+    def from_paths(cls, file_paths):
+        """Wraps a plain list of paths. Their stats are unknown until refreshed."""
+        table = FileTable()
+        for file_path in file_paths:
+            directory, name = os.path.split(os.fspath(file_path))
+            table.add(directory, name)
+        return table.view()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return FileView(self.table, self.rows[position])
+        return self.table.path(self.rows[position])
+
+    def __iter__(self):
+        path = self.table.path
+        for row in self.rows:
+            yield path(row)
+
+    def __repr__(self):
+        return f"<FileView of {len(self)} files>"
+
+    def copy(self):
+        return FileView(self.table, array('I', self.rows))
+
+    def subset(self, positions):
+        """Returns a view over the given positions of this view."""
+        rows = self.rows
+        return FileView(self.table, array('I', (rows[position] for position in positions)))
+
+    def without(self, file_paths):
+        """Returns a view with every file in file_paths removed."""
+        removed = set(map(os.fspath, file_paths))
+        if not removed:
+            return self
+        return self.subset(position for position, file_path in enumerate(self) if file_path not in removed)
+
+    def name(self, position):
+        return self.table.names[self.rows[position]]
+
+    def size(self, position):
+        return self.table.sizes[self.rows[position]]
+
+    def mtime(self, position):
+        return self.table.mtimes[self.rows[position]]
+
+    def ctime(self, position):
+        return self.table.ctimes[self.rows[position]]
+
+    def allocated(self, position):
+        """Bytes taken on disk, or -1 where unknown."""
+        return self.table.allocated[self.rows[position]]
+
+    def dev(self, position):
+        return self.table.devices[self.rows[position]]
+
+    def inode(self, position):
+        """The file's inode number, or 0 where unknown."""
+        return self.table.inodes[self.rows[position]]
+
+    def material(self, position):
+        """The material identify_materials found in the file's contents, or None if it was never read."""
+        return self.table.materials.get(self.rows[position])
+
+    def record(self, position):
+        return self.table.record(self.rows[position])
+
+
+def as_file_view(file_paths):
+    """Returns file_paths unchanged if it already is a FileView, otherwise wraps it."""
+    if isinstance(file_paths, FileView):
+        return file_paths
+    return FileView.from_paths(file_paths)
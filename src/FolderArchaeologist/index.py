@@ -0,0 +1,330 @@
+import os
+import time
+import sqlite3
+import hashlib
+from array import array
+from pathlib import Path
+from collections import defaultdict
+from .metrics import phase
+from .rules import rules_for
+from .scanner import DigSite, allocated_size, progress_enabled
+from .filetable import FileTable, FileView
+from .tokens import name_tokens
+
+DEFAULT_INDEX_DIR = Path.home() / ".folder_archaeologist" / "index"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    parent_id INTEGER,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    dir_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    lead_token TEXT,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    ctime REAL NOT NULL,
+    allocated INTEGER NOT NULL DEFAULT -1,
+    dev INTEGER NOT NULL DEFAULT 0,
+    inode INTEGER NOT NULL DEFAULT 0,
+    linked INTEGER NOT NULL DEFAULT 0,
+    shadowed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT NOT NULL,
+    file_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir_id);
+CREATE INDEX IF NOT EXISTS files_size ON files(size);
+CREATE INDEX IF NOT EXISTS files_mtime ON files(mtime);
+CREATE INDEX IF NOT EXISTS files_ext ON files(ext);
+CREATE INDEX IF NOT EXISTS tokens_token ON tokens(token);
+CREATE INDEX IF NOT EXISTS tokens_file ON tokens(file_id);
+"""
+
+# Columns added to the files table after its first release, with their definitions.
+_ADDED_COLUMNS = [
+    ("allocated", "allocated INTEGER NOT NULL DEFAULT -1"),
+    ("dev", "dev INTEGER NOT NULL DEFAULT 0"),
+    ("inode", "inode INTEGER NOT NULL DEFAULT 0"),
+    ("linked", "linked INTEGER NOT NULL DEFAULT 0"),
+    ("shadowed", "shadowed INTEGER NOT NULL DEFAULT 0"),
+]
+
+# Values of files.linked: other paths may lead to the same file through a
+# hard link, or this path itself leads there through a symlink.
+_UNIQUE, _HARD_LINKED, _VIA_SYMLINK = 0, 1, 2
+
+# Marks every copy of a linked file but the one the walk would keep: the
+# smallest direct path, as in scanner._Identities.
+_SHADOW_COPIES = """
+UPDATE files SET shadowed = 1 WHERE id IN (
+    SELECT id FROM (
+        SELECT f.id, ROW_NUMBER() OVER (
+            PARTITION BY f.dev, f.inode ORDER BY f.linked = 2, d.path || ? || f.name) AS copy
+        FROM (SELECT DISTINCT dev, inode FROM files WHERE linked) i
+        JOIN files f ON f.dev = i.dev AND f.inode = i.inode
+        JOIN dirs d ON d.id = f.dir_id
+    ) WHERE copy > 1
+)
+"""
+
+_index_dir = None
+_open_indexes = {}
+
+
+class DigSiteIndex:
+    """
+    A persistent SQLite index of the files below one dig site.
+
+    Each refresh only re-lists directories whose mtime changed since the last
+    one, so repeat excavations of a mostly static tree touch one stat per
+    directory instead of one per file. Every path of a hard-linked (or, when
+    following symlinks, symlinked) file is stored, but like a walk the
+    queries only return one of them. Note that editing a file in place does
+    not change its directory's mtime, so such a file keeps its indexed size and
+    mtime until an entry in the same directory is added, removed or renamed.
+    """
+
+    def __init__(self, root, db_path):
+        self.root = os.path.abspath(os.fspath(root))
+        self.db_path = db_path
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.executescript(_SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(files)")]
+        missing = [definition for name, definition in _ADDED_COLUMNS if name not in columns]
+        if missing:
+            # Indexes from before these columns were kept: re-list every directory once.
+            with self.conn:
+                for definition in missing:
+                    self.conn.execute(f"ALTER TABLE files ADD COLUMN {definition}")
+                self.conn.execute("UPDATE dirs SET mtime = NULL")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_identity ON files(dev, inode)")
+
+    def close(self):
+        self.conn.close()
+
+    def _check_rules(self, rules):
+        """Marks every directory stale when the walk rules changed since the last refresh."""
+        fingerprint = rules.fingerprint()
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'rules'").fetchone()
+        if row is None or row[0] != fingerprint:
+            with self.conn:
+                self.conn.execute("UPDATE dirs SET mtime = NULL")
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rules', ?)", (fingerprint,))
+
+    def refresh(self):
+        """
+        Brings the index up to date with the filesystem. Directories excluded
+        by the dig site's walk rules are neither listed nor kept.
+        """
+        from .leaderboard import scan_progress
+
+        conn = self.conn
+        rules = rules_for(self.root)
+        self._check_rules(rules)
+        known = {}
+        children = defaultdict(list)
+        for dir_id, path, parent_id, mtime in conn.execute("SELECT id, path, parent_id, mtime FROM dirs"):
+            known[path] = (dir_id, mtime)
+            children[parent_id].append(path)
+
+        seen = set()
+        visited = set()
+        relisted = False
+        pending = [(self.root, None, 0)]
+        with scan_progress("chambers", disable=not progress_enabled()) as progress:
+            task = progress.add_task("[red]Refreshing excavation index...", total=None)
+            with conn:
+                while pending:
+                    directory, parent_id, depth = pending.pop()
+                    try:
+                        dir_stat = os.stat(directory)
+                    except OSError:
+                        continue
+                    if rules.follow_symlinks:
+                        # Followed symlinks can lead back into a chamber already indexed.
+                        identity = (dir_stat.st_dev, dir_stat.st_ino)
+                        if identity in visited:
+                            continue
+                        visited.add(identity)
+                    dir_mtime = dir_stat.st_mtime
+                    dir_id, indexed_mtime = known.get(directory, (None, None))
+                    if dir_id is not None and indexed_mtime == dir_mtime:
+                        seen.add(dir_id)
+                        pending.extend((child, dir_id, depth + 1) for child in children[dir_id])
+                    else:
+                        dir_id = self._relist(directory, parent_id, dir_id, dir_mtime, pending, rules, depth)
+                        seen.add(dir_id)
+                        relisted = True
+                    progress.advance(task)
+
+                vanished = [dir_id for dir_id, _ in known.values() if dir_id not in seen]
+                for dir_id in vanished:
+                    self._forget_files(dir_id)
+                conn.executemany("DELETE FROM dirs WHERE id = ?", ((dir_id,) for dir_id in vanished))
+                if relisted or vanished:
+                    with phase("index.links"):
+                        conn.execute("UPDATE files SET shadowed = 0 WHERE shadowed")
+                        conn.execute(_SHADOW_COPIES, (os.sep,))
+            progress.update(task, total=progress.tasks[0].completed)
+
+    def _relist(self, directory, parent_id, dir_id, dir_mtime, pending, rules, depth):
+        """Re-reads a single changed directory and replaces its indexed files."""
+        conn = self.conn
+        if dir_id is None:
+            dir_id = conn.execute(
+                "INSERT INTO dirs (path, parent_id, mtime) VALUES (?, ?, ?)",
+                (directory, parent_id, dir_mtime),
+            ).lastrowid
+        else:
+            self._forget_files(dir_id)
+            conn.execute("UPDATE dirs SET parent_id = ?, mtime = ? WHERE id = ?", (parent_id, dir_mtime, dir_id))
+
+        descend = rules.descends(depth)
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=rules.follow_symlinks):
+                            if descend and not rules.skips_dir(entry):
+                                pending.append((entry.path, dir_id, depth + 1))
+                        elif entry.is_file(follow_symlinks=rules.follow_symlinks) and not rules.skips_file(entry):
+                            self._add_file(dir_id, entry, rules.follow_symlinks)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return dir_id
+
+    def _add_file(self, dir_id, entry, follow=False):
+        stat_info = entry.stat()
+        tokens = name_tokens(entry.name)
+        ext = os.path.splitext(entry.name)[1][1:] or "no_extension"
+        if follow and entry.is_symlink():
+            linked = _VIA_SYMLINK
+        else:
+            linked = _HARD_LINKED if stat_info.st_nlink > 1 else _UNIQUE
+        if not stat_info.st_ino:
+            linked = _UNIQUE
+        file_id = self.conn.execute(
+            "INSERT INTO files (dir_id, name, ext, lead_token, size, mtime, ctime, allocated, dev, inode, linked) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (dir_id, entry.name, ext, tokens[0] if tokens else None,
+             stat_info.st_size, stat_info.st_mtime, stat_info.st_ctime, allocated_size(stat_info),
+             stat_info.st_dev, stat_info.st_ino, linked),
+        ).lastrowid
+        self.conn.executemany(
+            "INSERT INTO tokens (token, file_id) VALUES (?, ?)",
+            ((token, file_id) for token in set(tokens)),
+        )
+
+    def _forget_files(self, dir_id):
+        self.conn.execute("DELETE FROM tokens WHERE file_id IN (SELECT id FROM files WHERE dir_id = ?)", (dir_id,))
+        self.conn.execute("DELETE FROM files WHERE dir_id = ?", (dir_id,))
+
+    def _view(self, conditions="", params=(), join=""):
+        """
+        Loads the matching files into a FileTable and returns a view in query
+        order. conditions continues the WHERE clause that leaves out shadowed
+        copies of linked files.
+        """
+        table = FileTable()
+        query = ("SELECT d.path, f.name, f.size, f.mtime, f.ctime, f.allocated, f.dev, f.inode FROM files f "
+                 f"JOIN dirs d ON d.id = f.dir_id {join} WHERE NOT f.shadowed " + conditions)
+        for directory, name, size, mtime, ctime, allocated, dev, inode in self.conn.execute(query, params):
+            table.add(directory, name, size, mtime, ctime, allocated, dev, inode)
+        return table.view()
+
+    def _grouped_views(self, column, conditions=""):
+        """Loads all matching files into one FileTable, grouped by a files column."""
+        table = FileTable()
+        groups = defaultdict(lambda: array('I'))
+        query = (f"SELECT f.{column}, d.path, f.name, f.size, f.mtime, f.ctime, f.allocated, f.dev, f.inode FROM files f "
+                 "JOIN dirs d ON d.id = f.dir_id WHERE NOT f.shadowed " + conditions)
+        for key, directory, name, size, mtime, ctime, allocated, dev, inode in self.conn.execute(query):
+            groups[key].append(table.add(directory, name, size, mtime, ctime, allocated, dev, inode))
+        return {key: FileView(table, rows) for key, rows in groups.items()}
+
+    def all_files(self):
+        """Returns a FileView of every indexed file."""
+        return self._view()
+
+    def extension_groups(self):
+        """Returns a mapping of extension to a FileView of the files with it."""
+        return self._grouped_views("ext")
+
+    def large_files(self, size_threshold, limit=None):
+        """Returns a FileView of files larger than size_threshold, largest first."""
+        return self._view("AND f.size > ? ORDER BY f.size DESC LIMIT ?",
+                          (size_threshold, -1 if limit is None else limit))
+
+    def old_files(self, age_threshold, limit=None):
+        """Returns a FileView of files older than age_threshold seconds, oldest first."""
+        return self._view("AND f.mtime < ? ORDER BY f.mtime ASC LIMIT ?",
+                          (time.time() - age_threshold, -1 if limit is None else limit))
+
+    def lead_token_groups(self):
+        """Returns a mapping of each leading inscription to a FileView of the files starting with it."""
+        return self._grouped_views("lead_token", "AND f.lead_token IS NOT NULL")
+
+    def token_matches(self, pattern):
+        """
+        Returns a FileView of the files whose name contains the inscription
+        pattern: `word` matches exactly, `word*` by prefix and `*word*` by substring.
+        """
+        if not pattern.endswith('*'):
+            return self._view("AND t.token = ?", (pattern,), join="JOIN tokens t ON t.file_id = f.id")
+
+        escaped = pattern.strip('*').replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        like = f"%{escaped}%" if pattern.startswith('*') else f"{escaped}%"
+        return self._view("AND t.token LIKE ? ESCAPE '\\' GROUP BY f.id", (like,), join="JOIN tokens t ON t.file_id = f.id")
+
+
+def enable_indexing(index_dir=None):
+    """Turns on the persistent index for every dig site excavated in this session."""
+    global _index_dir
+    _index_dir = Path(index_dir) if index_dir else DEFAULT_INDEX_DIR
+
+
+def indexing_enabled():
+    """Returns True if the persistent index is turned on for this session."""
+    return _index_dir is not None
+
+
+def index_directory():
+    """Returns the directory holding the persistent indexes, or None when indexing is disabled."""
+    return _index_dir
+
+
+def get_index(target_path):
+    """
+    Returns the refreshed DigSiteIndex for target_path, or None when indexing
+    is disabled, the index cannot be opened or target_path spans several roots.
+    """
+    if _index_dir is None or isinstance(target_path, DigSite):
+        return None
+
+    root = os.path.abspath(os.fspath(target_path))
+    index = _open_indexes.get(root)
+    if index is None:
+        try:
+            _index_dir.mkdir(parents=True, exist_ok=True)
+            db_name = hashlib.sha1(root.encode("utf-8", "surrogateescape")).hexdigest() + ".sqlite3"
+            index = DigSiteIndex(root, _index_dir / db_name)
+        except (OSError, sqlite3.Error):
+            return None
+        _open_indexes[root] = index
+
+    with phase("index.refresh"):
+        index.refresh()
+    return index
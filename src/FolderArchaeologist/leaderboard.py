@@ -0,0 +1,153 @@
+import heapq
+from datetime import datetime as dt
+from itertools import chain
+from operator import attrgetter
+from rich.text import Text
+from rich.table import Table
+from rich.progress import Progress, ProgressColumn, SpinnerColumn, TextColumn, TimeElapsedColumn
+from .utilities import format_size
+from .scanner import console
+
+# Rows a leaderboard shows while a scan is running.
+LEADERBOARD_ROWS = 10
+
+
+class ScanRateColumn(ProgressColumn):
+    """Renders the number of items scanned per second."""
+
+    def __init__(self, unit="artifacts"):
+        super().__init__()
+        self.unit = unit
+
+    def render(self, task):
+        speed = task.finished_speed or task.speed
+        if speed is None:
+            return Text(f"-- {self.unit}/s", style="progress.data.speed")
+        return Text(f"{speed:,.0f} {self.unit}/s", style="progress.data.speed")
+
+
+def scan_progress(unit="artifacts", disable=False):
+    """Returns an open-ended progress bar showing a running count and rate."""
+    return Progress(
+        SpinnerColumn(),
+        TextColumn("{task.description}"),
+        TextColumn("[cyan]{task.completed:,.0f} " + unit),
+        ScanRateColumn(unit),
+        TimeElapsedColumn(),
+        console=console.load(),
+        disable=disable,
+    )
+
+
+class Leaderboard:
+    """
+    The best results of a running scan, redrawn below its progress bar.
+
+    The scan engine hands every batch of FileRecords to update() before the
+    caller sees them, and renders the board a few times per second, so a
+    board only has to keep a small running summary, never the whole scan.
+    """
+
+    title = "Leaderboard"
+    columns = ["#"]
+
+    def __init__(self, limit=LEADERBOARD_ROWS):
+        self.limit = limit
+
+    def update(self, records):
+        """Adds a batch of FileRecords to the board."""
+
+    def rows(self):
+        """Returns the current rows of the board, best first, without the # column."""
+        return []
+
+    def __rich__(self):
+        rows = self.rows()
+        if not rows:
+            return Text("Waiting for the first artifacts...", style="dim")
+        table = Table(title=f"[bold cyan]{self.title} (so far)[/bold cyan]", show_header=True, header_style="bold magenta")
+        for column in self.columns:
+            table.add_column(column, justify="left", no_wrap=False)
+        for position, row in enumerate(rows, 1):
+            table.add_row(str(position), *row)
+        return table
+
+
+def _largest_groups(groups, limit):
+    return heapq.nlargest(limit, groups.items(), key=lambda item: len(item[1]))
+
+
+class MaterialLeaderboard(Leaderboard):
+    """
+    The most common material types of an extension -> rows mapping that is
+    being filled. It reads the mapping directly, so names are only split once.
+    """
+
+    title = "Top Material Types by Count"
+    columns = ["#", "Material", "Artifact Count"]
+
+    def __init__(self, groups, limit=LEADERBOARD_ROWS):
+        super().__init__(limit)
+        self.groups = groups
+
+    def rows(self):
+        return [[ext, str(len(rows))] for ext, rows in _largest_groups(self.groups, self.limit)]
+
+
+class LargestLeaderboard(Leaderboard):
+    """The largest files found so far, optionally only those accepted by `where`."""
+
+    title = "Largest Fossils"
+    columns = ["#", "Filename", "Size"]
+
+    def __init__(self, where=None, limit=LEADERBOARD_ROWS):
+        super().__init__(limit)
+        self.where = where
+        self.top = []
+
+    def update(self, records):
+        if self.where is not None:
+            records = filter(self.where, records)
+        self.top = heapq.nlargest(self.limit, chain(self.top, records), key=attrgetter("size"))
+
+    def rows(self):
+        return [[record.name, format_size(record.size)] for record in self.top]
+
+
+class OldestLeaderboard(Leaderboard):
+    """The least recently modified files found so far, optionally only those accepted by `where`."""
+
+    title = "Ancient Artifacts"
+    columns = ["#", "Artifact Name", "Age"]
+
+    def __init__(self, where=None, limit=LEADERBOARD_ROWS):
+        super().__init__(limit)
+        self.where = where
+        self.top = []
+
+    def update(self, records):
+        if self.where is not None:
+            records = filter(self.where, records)
+        self.top = heapq.nsmallest(self.limit, chain(self.top, records), key=attrgetter("mtime"))
+
+    def rows(self):
+        now = dt.now().timestamp()
+        return [[record.name, f"{((now - record.mtime) / 31557600):.1f} years"] for record in self.top]
+
+
+class ClusterLeaderboard(Leaderboard):
+    """
+    The largest pottery shard clusters of a TokenIndex that is being built.
+    It reads the index directly, so names are only tokenized once.
+    """
+
+    title = "Pottery Shard Clusters"
+    columns = ["#", "Inscription", "Artifact Count"]
+
+    def __init__(self, token_index, limit=LEADERBOARD_ROWS):
+        super().__init__(limit)
+        self.token_index = token_index
+
+    def rows(self):
+        leads = _largest_groups(self.token_index.leads, self.limit)
+        return [[token, str(len(rows))] for token, rows in leads if len(rows) > 1]
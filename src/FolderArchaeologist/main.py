@@ -3,37 +3,80 @@
 # ig this is it broo, it's done
 # Ts is fire ngl
 
-from rich.console import Console
-from .features import file_operations_menu
-from .categories import show_categories_menu
-from .utilities import parse_directory_path, clear_screen
+import sys
+from . import __version__
+from .terminal import LazyConsole
 
-console = Console()
+console = LazyConsole()
 
 def main():
+    # Subsystems are imported only once it is clear they are needed, so
+    # --version, batch runs and the menus each load just their own share.
+    if sys.argv[1:] == ["--version"]:
+        print(f"Folder Archaeologist {__version__}")
+        return
+
+    from .batch import COMMANDS, run_batch
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        sys.exit(run_batch(sys.argv[1:]))
+
+    from .utilities import parse_arguments, apply_rule_arguments, clear_screen
+    # Arguments come first so --help returns before the menus load.
+    args = parse_arguments()
+    target_path = args.path
+
+    from .metrics import enable_metrics, finish_metrics
+    from .scanner import DigSite, configure_scan
+    from .features import file_operations_menu
+    from .categories import show_categories_menu
+
     clear_screen()
     console.print("[bold cyan]Welcome to Folder Archaeologist![/bold cyan]")
     console.print("Ready your tools to excavate and analyze digital artifacts.\n")
+    if args.metrics or args.profile:
+        enable_metrics(args.metrics, args.profile)
+    configure_scan(workers=args.workers)
+    saved_ignore = apply_rule_arguments(args)
+    if saved_ignore:
+        console.print(f"[green]Exclusion rules saved to {saved_ignore}[/green]\n")
+    if isinstance(target_path, DigSite) and (args.index or args.index_dir or args.watch):
+        console.print("[yellow]The persistent index and live watch follow a single dig site root; "
+                      "the roots will be scanned together on every excavation instead.[/yellow]\n")
+    if args.index or args.index_dir:
+        from .index import enable_indexing
+        enable_indexing(args.index_dir)
+    watching = args.watch and not isinstance(target_path, DigSite)
+    if watching:
+        from .watch import start_watch
+        start_watch(target_path)
 
-    target_path = parse_directory_path()
-
-    while True:
-        file_list = show_categories_menu(target_path)
+    try:
+        while True:
+            file_list = show_categories_menu(target_path)
 
-        if file_list == "exit": # Handle the new exit signal
-             break
+            if file_list == "exit": # Handle the new exit signal
+                 break
 
-        if not file_list:
-            # The user cancelled or no files were found, loop back to the menu
-            continue
+            if not file_list:
+                # The user cancelled or no files were found, loop back to the menu
+                continue
 
-        continue_main_loop = file_operations_menu(file_list)
+            continue_main_loop = file_operations_menu(file_list)
 
-        if not continue_main_loop:
-            break
+            if not continue_main_loop:
+                break
+    except KeyboardInterrupt:
+        # Interrupting a slow scan is exactly when the numbers are wanted.
+        finish_metrics()
+        raise
+    finally:
+        if watching:
+            from .watch import stop_watches
+            stop_watches()
     
     clear_screen()
     console.print("[bold magenta]Thank you for using Folder Archaeologist. The dig site is now closed.[/bold magenta]\n[green]Made for the [/green][red]❤ [/red][green] of code by Koffandaff and Bond0707[/green]")
+    finish_metrics()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,350 @@
+import os
+import sqlite3
+from .metrics import count, metrics_enabled, phase
+from .index import index_directory
+from .scanner import progress_enabled
+from .terminal import LazyConsole
+
+console = LazyConsole()
+
+# Bytes read from the start of each file; enough for tar's magic at offset 257
+# and for the name of the first member of a zip archive.
+SNIFF_BYTES = 512
+# Reads block in the kernel with the GIL released, so threads overlap them.
+SNIFF_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+# Files submitted to the pool at a time, to bound queued futures.
+SNIFF_BATCH = 4096
+CACHE_FILE_NAME = "materials.sqlite3"
+
+# (offset, magic bytes, material), checked in order.
+SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpg"),
+    (0, b"GIF87a", "gif"),
+    (0, b"GIF89a", "gif"),
+    (0, b"II*\x00", "tiff"),
+    (0, b"MM\x00*", "tiff"),
+    (0, b"8BPS", "psd"),
+    (0, b"\x00\x00\x01\x00", "ico"),
+    (0, b"\x00\x00\x00\x0cjP  ", "jp2"),
+    (0, b"%PDF-", "pdf"),
+    (0, b"%!PS", "ps"),
+    (0, b"{\\rtf", "rtf"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "msoffice"),
+    (0, b"\x1f\x8b", "gz"),
+    (0, b"BZh", "bz2"),
+    (0, b"\xfd7zXZ\x00", "xz"),
+    (0, b"(\xb5/\xfd", "zst"),
+    (0, b"7z\xbc\xaf\x27\x1c", "7z"),
+    (0, b"Rar!\x1a\x07", "rar"),
+    (0, b"!<arch>\ndebian", "deb"),
+    (0, b"\xed\xab\xee\xdb", "rpm"),
+    (257, b"ustar", "tar"),
+    (0, b"OggS", "ogg"),
+    (0, b"fLaC", "flac"),
+    (0, b"ID3", "mp3"),
+    (0, b"MThd", "midi"),
+    (0, b"\x1aE\xdf\xa3", "mkv"),
+    (0, b"FLV\x01", "flv"),
+    (0, b"SQLite format 3\x00", "sqlite"),
+    (0, b"\x7fELF", "elf"),
+    (0, b"MZ", "exe"),
+    (0, b"\xcf\xfa\xed\xfe", "macho"),
+    (0, b"\xce\xfa\xed\xfe", "macho"),
+    (0, b"\xca\xfe\xba\xbe", "class"),
+    (0, b"\x00asm", "wasm"),
+    (0, b"wOFF", "woff"),
+    (0, b"wOF2", "woff2"),
+    (0, b"OTTO", "otf"),
+    (0, b"\x00\x01\x00\x00\x00", "ttf"),
+]
+
+# RIFF containers name their format at offset 8.
+_RIFF_FORMATS = {b"WAVE": "wav", b"AVI ": "avi", b"WEBP": "webp"}
+# ISO base media files name their major brand at offset 8.
+_FTYP_BRANDS = {b"qt  ": "mov", b"M4A ": "m4a", b"M4V ": "mp4", b"heic": "heic", b"heix": "heic",
+                b"mif1": "heic", b"avif": "avif", b"3gp4": "3gp", b"3gp5": "3gp", b"crx ": "cr3"}
+# Zip based formats, recognised by the name (and for OpenDocument the content) of their first member.
+_ZIP_MEMBERS = [(b"[Content_Types].xml", "office"), (b"META-INF/", "jar"), (b"AndroidManifest.xml", "apk")]
+_ZIP_MIMETYPES = {b"application/epub+zip": "epub", b"application/vnd.oasis.opendocument.text": "odt",
+                  b"application/vnd.oasis.opendocument.spreadsheet": "ods",
+                  b"application/vnd.oasis.opendocument.presentation": "odp"}
+
+# Extensions that honestly name each binary material; text materials accept any name.
+MATERIAL_EXTENSIONS = {
+    "jpg": {"jpg", "jpeg", "jpe", "jfif"}, "tiff": {"tif", "tiff", "dng", "nef", "cr2", "arw", "orf", "rw2"},
+    "mkv": {"mkv", "webm", "mka"}, "mp4": {"mp4", "m4v", "m4a", "m4b"}, "mp3": {"mp3"},
+    "office": {"docx", "xlsx", "pptx", "docm", "xlsm", "pptm"}, "msoffice": {"doc", "xls", "ppt", "msi", "msg"},
+    "exe": {"exe", "dll", "sys", "scr", "ocx", "cpl", "efi"}, "elf": {"so", "o", "ko", "elf", "bin", "axf"},
+    "macho": {"dylib", "bundle"}, "gz": {"gz", "tgz"}, "bz2": {"bz2", "tbz", "tbz2"}, "xz": {"xz", "txz"},
+    "zst": {"zst", "tzst"}, "tar": {"tar"}, "sqlite": {"sqlite", "sqlite3", "db"}, "class": {"class"},
+    "jar": {"jar", "war", "ear", "aar"}, "zip": {"zip"}, "ttf": {"ttf", "ttc"}, "heic": {"heic", "heif"},
+    "midi": {"mid", "midi"}, "mov": {"mov", "qt"}, "ogg": {"ogg", "oga", "ogv", "opus"},
+}
+TEXT_MATERIALS = {"txt", "html", "xml", "svg", "json", "script"}
+
+MIME_TYPES = {
+    "png": "image/png", "jpg": "image/jpeg", "gif": "image/gif", "tiff": "image/tiff", "webp": "image/webp",
+    "heic": "image/heic", "avif": "image/avif", "ico": "image/vnd.microsoft.icon", "psd": "image/vnd.adobe.photoshop",
+    "jp2": "image/jp2", "svg": "image/svg+xml", "pdf": "application/pdf", "ps": "application/postscript",
+    "rtf": "application/rtf", "zip": "application/zip", "gz": "application/gzip", "bz2": "application/x-bzip2",
+    "xz": "application/x-xz", "zst": "application/zstd", "7z": "application/x-7z-compressed",
+    "rar": "application/vnd.rar", "tar": "application/x-tar", "jar": "application/java-archive",
+    "epub": "application/epub+zip", "mp3": "audio/mpeg", "flac": "audio/flac", "ogg": "audio/ogg",
+    "wav": "audio/wav", "m4a": "audio/mp4", "midi": "audio/midi", "mp4": "video/mp4", "mov": "video/quicktime",
+    "mkv": "video/x-matroska", "avi": "video/x-msvideo", "flv": "video/x-flv", "3gp": "video/3gpp",
+    "sqlite": "application/vnd.sqlite3", "wasm": "application/wasm", "exe": "application/vnd.microsoft.portable-executable",
+    "elf": "application/x-executable", "html": "text/html", "xml": "application/xml", "json": "application/json",
+    "txt": "text/plain", "script": "text/x-script", "woff": "font/woff", "woff2": "font/woff2", "otf": "font/otf",
+    "ttf": "font/ttf",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS materials (
+    dev INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    material TEXT NOT NULL,
+    PRIMARY KEY (dev, inode, size, mtime)
+) WITHOUT ROWID;
+"""
+
+_caches = {}
+
+
+def _looks_like_text(header):
+    if b"\x00" in header:
+        return header.startswith((b"\xff\xfe", b"\xfe\xff"))
+    try:
+        header.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # The read may have cut a multi-byte character in half.
+        return e.start >= len(header) - 3 and len(header) == SNIFF_BYTES
+    return True
+
+
+def _text_material(header):
+    start = header.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if start.startswith(b"#!"):
+        return "script"
+    if start.startswith((b"<!doctype html", b"<html")):
+        return "html"
+    if start.startswith(b"<svg") or (start.startswith(b"<?xml") and b"<svg" in start):
+        return "svg"
+    if start.startswith(b"<?xml"):
+        return "xml"
+    if start.startswith((b"{", b"[")) and start.rstrip().endswith((b"}", b"]", b",", b"\"")):
+        return "json"
+    return "txt"
+
+
+def _zip_material(header):
+    name_length = int.from_bytes(header[26:28], "little")
+    extra_length = int.from_bytes(header[28:30], "little")
+    name = header[30:30 + name_length]
+    if name == b"mimetype":
+        content = header[30 + name_length + extra_length:]
+        for mimetype, material in _ZIP_MIMETYPES.items():
+            if content.startswith(mimetype):
+                return material
+    for prefix, material in _ZIP_MEMBERS:
+        if name.startswith(prefix):
+            return material
+    return "zip"
+
+
+def sniff(header):
+    """
+    Names the material of a file from its first bytes, regardless of its name.
+
+    Returns a short lowercase material such as 'png', 'pdf' or 'office'; 'txt'
+    (or a more specific text format) for readable text, 'empty' for empty
+    files and 'data' for binary contents without a known signature.
+    """
+    if not header:
+        return "empty"
+    if header.startswith(b"RIFF") and header[8:12] in _RIFF_FORMATS:
+        return _RIFF_FORMATS[header[8:12]]
+    if header[4:8] == b"ftyp":
+        return _FTYP_BRANDS.get(header[8:12], "mp4")
+    if header.startswith(b"PK\x03\x04"):
+        return _zip_material(header)
+    if header.startswith(b"BM") and header[6:10] == b"\x00\x00\x00\x00":
+        return "bmp"
+    for offset, magic, material in SIGNATURES:
+        if header.startswith(magic, offset):
+            return material
+    if _looks_like_text(header):
+        return _text_material(header)
+    if header[0] == 0xFF and header[1:2] and header[1] & 0xE0 == 0xE0:
+        return "mp3"
+    return "data"
+
+
+def read_header(path, size=SNIFF_BYTES):
+    """Reads the first bytes of a file unbuffered. Returns None if it cannot be read."""
+    try:
+        with open(path, "rb", buffering=0) as f:
+            return f.read(size)
+    except OSError:
+        return None
+
+
+def sniff_file(path):
+    """Returns the material of the file at path, or None if it cannot be read."""
+    header = read_header(path)
+    return None if header is None else sniff(header)
+
+
+def material_mime_type(material):
+    """
+    Returns the MIME type of a binary material, or None for text, unknown and
+    unread materials, where a file's name says more.
+    """
+    if material is None or material in TEXT_MATERIALS:
+        return None
+    return MIME_TYPES.get(material)
+
+
+def is_misnamed(material, name):
+    """Returns True if a file's name does not reveal its binary material."""
+    if material in TEXT_MATERIALS or material in ("empty", "data"):
+        return False
+    ext = os.path.splitext(name)[1][1:].lower()
+    return ext not in MATERIAL_EXTENSIONS.get(material, {material})
+
+
+class MaterialCache:
+    """
+    Sniffed materials keyed by (dev, inode, size, mtime), so a file is only
+    read again after it changed. Renamed or moved files keep their entry, and
+    equal inode numbers on different file systems do not share one.
+    """
+
+    def __init__(self, db_path=":memory:"):
+        self.conn = sqlite3.connect(str(db_path))
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(materials)")]
+        if columns and "dev" not in columns:
+            # Caches from before devices were part of the key; sniffing again is cheap.
+            with self.conn:
+                self.conn.execute("DROP TABLE materials")
+        self.conn.executescript(_SCHEMA)
+
+    def lookup(self, keys):
+        """Returns {position: material} for the (dev, inode, size, mtime) keys already known."""
+        conn = self.conn
+        with conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted "
+                         "(position INTEGER, dev INTEGER, inode INTEGER, size INTEGER, mtime REAL)")
+            conn.execute("DELETE FROM wanted")
+            conn.executemany("INSERT INTO wanted VALUES (?, ?, ?, ?, ?)",
+                             ((position, *key) for position, key in enumerate(keys)))
+            hits = dict(conn.execute("SELECT w.position, m.material FROM wanted w JOIN materials m "
+                                     "ON m.dev = w.dev AND m.inode = w.inode AND m.size = w.size AND m.mtime = w.mtime"))
+            conn.execute("DELETE FROM wanted")
+        return hits
+
+    def store(self, entries):
+        """Remembers (dev, inode, size, mtime, material) entries."""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO materials VALUES (?, ?, ?, ?, ?)", entries)
+
+
+def get_material_cache():
+    """
+    Returns the session's MaterialCache. With the persistent index enabled it
+    is kept next to the dig site indexes, so later sessions read nothing
+    that has not changed; otherwise it lasts for this session.
+    """
+    directory = index_directory()
+    cache = _caches.get(directory)
+    if cache is None:
+        try:
+            if directory is None:
+                raise OSError("no index directory")
+            directory.mkdir(parents=True, exist_ok=True)
+            cache = MaterialCache(directory / CACHE_FILE_NAME)
+        except (OSError, sqlite3.Error):
+            cache = _caches.get(None) or MaterialCache()
+        _caches[directory] = cache
+    return cache
+
+
+def _stat_key(path):
+    try:
+        stat_info = os.stat(path)
+    except OSError:
+        return None
+    return (stat_info.st_dev, stat_info.st_ino, stat_info.st_size, stat_info.st_mtime)
+
+
+def identify_materials(files, workers=None):
+    """
+    Sniffs the material of every file of a FileView and returns them as a
+    list in view order, with None for files that could not be read. The
+    materials are also kept in the view's FileTable, for FileView.material.
+
+    Only files the MaterialCache does not know are read, SNIFF_BYTES each, on
+    a thread pool so many reads are in flight at once. The cache is keyed by
+    the device and inode the view's table holds; files without a known inode
+    (e.g. from Windows scans or plain path lists) are stat-ed first, in the
+    same pool.
+
+    Parameters
+    ----------
+    files : FileView
+        The files to identify.
+    workers : int | None
+        Number of reading threads.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from rich.progress import Progress
+
+    workers = workers or SNIFF_WORKERS
+    positions = range(len(files))
+    keys = [(files.dev(position), files.inode(position), files.size(position), files.mtime(position))
+            for position in positions]
+    materials = [None] * len(files)
+
+    with Progress(console=console.load(), disable=not progress_enabled()) as progress, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        unknown = [position for position in positions if not keys[position][1]]
+        if unknown:
+            task = progress.add_task("[red]Measuring catalogued artifacts...", total=len(unknown))
+            for start in range(0, len(unknown), SNIFF_BATCH):
+                batch = unknown[start:start + SNIFF_BATCH]
+                for position, key in zip(batch, executor.map(lambda position: _stat_key(files[position]), batch)):
+                    if key is not None:
+                        keys[position] = key
+                progress.advance(task, len(batch))
+
+        cache = get_material_cache()
+        with phase("sniff.cache"):
+            known = cache.lookup(keys)
+        for position, material in known.items():
+            materials[position] = material
+        missing = [position for position in positions if position not in known and keys[position][1]]
+        if metrics_enabled():
+            count("material_cache_hits", len(known))
+
+        if missing:
+            task = progress.add_task("[red]Testing the true material of artifacts...", total=len(missing))
+        with phase("sniff.read"):
+            for start in range(0, len(missing), SNIFF_BATCH):
+                batch = missing[start:start + SNIFF_BATCH]
+                found = []
+                for position, header in zip(batch, executor.map(lambda position: read_header(files[position]), batch)):
+                    if header is None:
+                        continue
+                    materials[position] = sniff(header)
+                    found.append((*keys[position], materials[position]))
+                    if metrics_enabled():
+                        count("bytes_sniffed", len(header))
+                cache.store(found)
+                progress.advance(task, len(batch))
+    found_materials = files.table.materials
+    for position, material in enumerate(materials):
+        if material is not None:
+            found_materials[files.rows[position]] = material
+    return materials
@@ -0,0 +1,217 @@
+import time
+import functools
+from contextlib import nullcontext
+from collections import Counter, defaultdict
+from .terminal import LazyConsole
+
+console = LazyConsole()
+
+_state = {"enabled": False, "started": None, "json_path": None, "profile_path": None, "profiler": None}
+# Counters are only touched while metrics are enabled, so the real lock (and
+# threading) is only needed from enable_metrics on.
+_lock = nullcontext()
+
+counters = Counter()
+phases = defaultdict(lambda: [0.0, 0])  # name -> [seconds, calls]
+operations = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "items": 0, "files_scanned": 0})
+
+
+def enable_metrics(json_path=None, profile_path=None):
+    """
+    Turns on instrumentation for the rest of the session.
+
+    Parameters
+    ----------
+    json_path : str | None
+        Where finish_metrics writes the collected metrics as JSON.
+    profile_path : str | None
+        Where finish_metrics writes a cProfile dump of the main thread.
+    """
+    global _lock
+    import threading
+
+    _lock = threading.Lock()
+    _state.update(enabled=True, started=time.perf_counter(), json_path=json_path, profile_path=profile_path)
+    if profile_path:
+        import cProfile
+        _state["profiler"] = cProfile.Profile()
+        _state["profiler"].enable()
+
+
+def metrics_enabled():
+    """Returns True if --metrics or --profile was given."""
+    return _state["enabled"]
+
+
+def count(name, amount=1):
+    """Adds amount to a counter. Safe to call from worker threads."""
+    if _state["enabled"]:
+        with _lock:
+            counters[name] += amount
+
+
+def add_phase(name, seconds, calls=1):
+    """Adds time measured by the caller to a phase."""
+    if _state["enabled"]:
+        with _lock:
+            totals = phases[name]
+            totals[0] += seconds
+            totals[1] += calls
+
+
+class _Phase:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        add_phase(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _Operation:
+    """Times one categorizer or file operation. The caller sets `items` to the number of files handled."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.files_before = counters["files_found"]
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        with _lock:
+            totals = operations[self.name]
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            totals["items"] += self.items
+            totals["files_scanned"] += counters["files_found"] - self.files_before
+        return False
+
+
+class _Disabled:
+    items = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_DISABLED = _Disabled()
+
+
+def phase(name):
+    """Returns a context manager adding the time spent inside it to a phase."""
+    return _Phase(name) if _state["enabled"] else _DISABLED
+
+
+def operation(name):
+    """Returns a context manager recording the time and throughput of one operation."""
+    return _Operation(name) if _state["enabled"] else _Disabled()
+
+
+def _result_size(result):
+    """Counts the files in a categorizer result: a FileView, a dict of them or a list of (key, FileView) groups."""
+    if isinstance(result, dict):
+        return sum(len(files) for files in result.values())
+    if isinstance(result, list) and result and isinstance(result[0], tuple):
+        return sum(len(files) for _, files in result)
+    if isinstance(result, list) and result and not isinstance(result[0], str):
+        return sum(len(group) for group in result)
+    try:
+        return len(result)
+    except TypeError:
+        return 0
+
+
+def measured(name):
+    """Decorates a categorizer so each call is recorded as an operation."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _state["enabled"]:
+                return function(*args, **kwargs)
+            with _Operation(name) as record:
+                result = function(*args, **kwargs)
+                record.items = _result_size(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    """Returns the collected metrics as a JSON-serialisable dict."""
+    with _lock:
+        wall = time.perf_counter() - _state["started"] if _state["started"] else 0.0
+        return {
+            "wall_seconds": wall,
+            "counters": dict(counters),
+            "phases": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in phases.items()},
+            "operations": {
+                name: dict(totals, files_per_sec=_throughput(totals)) for name, totals in operations.items()
+            },
+        }
+
+
+def _throughput(totals):
+    handled = totals["files_scanned"] or totals["items"]
+    return handled / totals["seconds"] if totals["seconds"] else None
+
+
+def print_summary(output=None):
+    """Prints the collected metrics as tables."""
+    from rich.table import Table
+
+    output = output or console
+    data = snapshot()
+
+    operation_table = Table(title="Operations", header_style="bold magenta")
+    for column in ("Operation", "Calls", "Seconds", "Files", "Scanned", "Files/s"):
+        operation_table.add_column(column, justify="left" if column == "Operation" else "right")
+    for name, totals in sorted(data["operations"].items(), key=lambda item: -item[1]["seconds"]):
+        rate = totals["files_per_sec"]
+        operation_table.add_row(name, str(totals["calls"]), f"{totals['seconds']:.3f}", f"{totals['items']:,}",
+                                f"{totals['files_scanned']:,}", f"{rate:,.0f}" if rate is not None else "-")
+
+    phase_table = Table(title="Phases (summed over worker threads)", header_style="bold magenta")
+    for column in ("Phase", "Calls", "Seconds"):
+        phase_table.add_column(column, justify="left" if column == "Phase" else "right")
+    for name, totals in sorted(data["phases"].items(), key=lambda item: -item[1]["seconds"]):
+        phase_table.add_row(name, f"{totals['calls']:,}", f"{totals['seconds']:.3f}")
+
+    counter_table = Table(title="Counters", header_style="bold magenta")
+    counter_table.add_column("Counter")
+    counter_table.add_column("Value", justify="right")
+    for name, value in sorted(data["counters"].items()):
+        counter_table.add_row(name, f"{value:,}")
+
+    output.print(operation_table, phase_table, counter_table)
+    output.print(f"[cyan]Session wall time: {data['wall_seconds']:.2f}s[/cyan]")
+
+
+def finish_metrics(output=None):
+    """Stops profiling, writes the JSON and cProfile dumps and prints the summary."""
+    if not _state["enabled"]:
+        return
+    output = output or console
+    profiler = _state["profiler"]
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(_state["profile_path"])
+        output.print(f"[green]cProfile dump written to {_state['profile_path']}[/green]")
+    print_summary(output)
+    if _state["json_path"]:
+        import json
+
+        with open(_state["json_path"], "w") as f:
+            json.dump(snapshot(), f, indent=2)
+        output.print(f"[green]Metrics written to {_state['json_path']}[/green]")
+    _state["enabled"] = False
@@ -0,0 +1,220 @@
+import os
+import re
+import time
+import heapq
+import operator
+from itertools import islice
+from .scanner import scan_files
+from .filetable import FileTable
+from .metrics import measured
+from .rules import translate_glob
+from .tokens import NAME_DELIMITERS, name_tokens
+from .utilities import parse_size
+
+QUERY_HELP = """\
+Terms are combined with AND; commas inside a term mean OR. Prefix a term with - to negate it.
+  ext:mp4,mkv           material type          size>1G  size<=100M     file size
+  age>3y  age<30d       time since modified    created>2y              time since created
+  token:report*         inscription (word, word*, *word*)
+  path:**/Videos/**     gitignore-style glob on the path below the dig site
+  sort:size|age|created|name[:asc|:desc]       top:20   keep only the first N
+Durations take h, d, w, mo or y. Example: ext:mp4,mkv,avi size>1G age>3y sort:size top:50"""
+
+DURATION_UNITS = {"h": 3600, "d": 86400, "w": 604800, "mo": 2629800, "y": 31557600}
+
+_COMPARISONS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+                "=": operator.eq, ":": operator.eq}
+_TERM = re.compile(r"(?P<negated>-)?(?P<field>[a-z]+)(?P<op><=|>=|!=|<|>|=|:)(?P<value>.+)\Z", re.IGNORECASE)
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(h|d|w|mo|y)?\Z")
+
+# Sort fields with the record attribute and table column they use, and whether
+# the natural order is descending (largest first) or ascending (oldest first).
+SORT_FIELDS = {
+    "size": ("size", "sizes", True),
+    "age": ("mtime", "mtimes", False),
+    "created": ("ctime", "ctimes", False),
+    "name": ("name", "names", False),
+}
+
+# Cheap stat comparisons run before tokenizing names or matching paths.
+_FIELD_COST = {"ext": 0, "size": 0, "age": 0, "created": 0, "token": 1, "path": 2}
+
+
+def parse_duration(text):
+    """Parses '3y', '30d', '12h', '6mo' or '2w' into seconds; a bare number means days."""
+    match = _DURATION.match(text.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid duration: {text!r}")
+    number, unit = match.groups()
+    return float(number) * DURATION_UNITS[unit or "d"]
+
+
+class Query:
+    """
+    A parsed expedition query: a list of filter terms plus an optional sort and top-K.
+
+    Every term is checked against the FileRecord the scan engine produces, so
+    the whole query is answered in one traversal of the dig site.
+    """
+
+    def __init__(self, text):
+        self.text = text.strip()
+        self.terms = []
+        self.sort = None
+        self.descending = False
+        self.limit = None
+        for word in self.text.split():
+            self._parse_term(word)
+        self.terms.sort(key=lambda term: _FIELD_COST[term[0]])
+
+    def _parse_term(self, word):
+        match = _TERM.match(word)
+        if not match:
+            raise ValueError(f"Cannot read query term {word!r}.")
+        field, op, value = match.group("field").lower(), match.group("op"), match.group("value")
+        if field != "path":
+            value = value.lower()
+        negated = bool(match.group("negated"))
+        if op == "!=":
+            negated, op = not negated, "="
+
+        if field == "sort":
+            name, _, direction = value.partition(":")
+            if name not in SORT_FIELDS or direction not in ("", "asc", "desc"):
+                raise ValueError(f"Cannot sort by {value!r}; use size, age, created or name.")
+            self.sort = name
+            self.descending = SORT_FIELDS[name][2] if not direction else direction == "desc"
+        elif field in ("top", "limit"):
+            if not value.isdigit() or int(value) <= 0:
+                raise ValueError(f"top needs a positive number, not {value!r}.")
+            self.limit = int(value)
+        elif field in ("ext", "token", "path"):
+            if op not in (":", "="):
+                raise ValueError(f"{field} only supports ':' (e.g. {field}:value).")
+            self.terms.append((field, negated, [part for part in value.split(",") if part]))
+        elif field == "size":
+            self.terms.append((field, negated, (_COMPARISONS[op], parse_size(value))))
+        elif field in ("age", "created"):
+            self.terms.append((field, negated, (_COMPARISONS[op], parse_duration(value))))
+        else:
+            raise ValueError(f"Unknown query field {field!r}.")
+
+    def predicate(self, target_path, now=None):
+        """Compiles the filter terms into one function of a FileRecord."""
+        now = time.time() if now is None else now
+        root_length = len(os.path.normpath(os.fspath(target_path)))
+        tests = []
+        for field, negated, argument in self.terms:
+            test = _compile_term(field, argument, now, root_length)
+            tests.append((lambda record, test=test: not test(record)) if negated else test)
+
+        def matches(record):
+            for test in tests:
+                if not test(record):
+                    return False
+            return True
+        return matches
+
+    def __str__(self):
+        return self.text
+
+
+def _compile_term(field, argument, now, root_length):
+    if field == "ext":
+        extensions = {ext.lstrip('.') for ext in argument}
+        return lambda record: (os.path.splitext(record.name)[1][1:].lower() or "no_extension") in extensions
+    if field == "size":
+        compare, size = argument
+        return lambda record: compare(record.size, size)
+    if field == "age":
+        compare, seconds = argument
+        return lambda record: compare(now - record.mtime, seconds)
+    if field == "created":
+        compare, seconds = argument
+        return lambda record: compare(now - record.ctime, seconds)
+    if field == "token":
+        exact = {pattern for pattern in argument if not pattern.endswith('*')}
+        prefixes = tuple(pattern.rstrip('*') for pattern in argument if pattern.endswith('*') and not pattern.startswith('*'))
+        fragments = [pattern.strip('*') for pattern in argument if pattern.startswith('*') and pattern.endswith('*') and len(pattern) > 1]
+
+        def has_token(record):
+            for token in name_tokens(record.name, NAME_DELIMITERS):
+                if token in exact or (prefixes and token.startswith(prefixes)) \
+                        or any(fragment in token for fragment in fragments):
+                    return True
+            return False
+        return has_token
+
+    # path: patterns with a slash match the path below the dig site, others the name.
+    name_globs = [re.compile(translate_glob(pattern) + r"\Z") for pattern in argument if "/" not in pattern]
+    path_globs = [re.compile(translate_glob(pattern.lstrip("/")) + r"\Z") for pattern in argument if "/" in pattern]
+
+    def matches_glob(record):
+        if any(glob.match(record.name) for glob in name_globs):
+            return True
+        if path_globs:
+            relative = record.path[root_length:].lstrip(os.sep).replace(os.sep, "/")
+            return any(glob.match(relative) for glob in path_globs)
+        return False
+    return matches_glob
+
+
+def _matching_records(target_path, query, catalogue):
+    """Filters the scanned (or catalogued) records, keeping a bounded heap when `top` and a sort are given."""
+    predicate = query.predicate(catalogue.root if catalogue is not None else target_path)
+    if catalogue is not None:
+        files = catalogue.all_files()
+        records = (files.record(position) for position in range(len(files)))
+    else:
+        records = scan_files(target_path, "[red]Running expedition query...")
+
+    matches = filter(predicate, records)
+    if query.limit is not None:
+        if query.sort is None:
+            matches = islice(matches, query.limit)
+        else:
+            attribute = SORT_FIELDS[query.sort][0]
+            pick = heapq.nlargest if query.descending else heapq.nsmallest
+            key = (lambda record: record.name.lower()) if attribute == "name" else operator.attrgetter(attribute)
+            matches = pick(query.limit, matches, key=key)
+    return matches
+
+
+@measured("run_query")
+def run_query(target_path, query, catalogue=None):
+    """
+    Evaluates a Query over the dig site in a single traversal and returns a FileView.
+
+    The combined predicate runs on every scanned record. With `top`, a bounded
+    heap keeps only the best matches while scanning, and without a sort the
+    scan stops as soon as enough files matched. When a catalogue (persistent
+    index or live watch) is given, its files are filtered instead of scanning.
+    """
+    if isinstance(query, str):
+        query = Query(query)
+    table = FileTable()
+    for record in _matching_records(target_path, query, catalogue):
+        table.add_record(record)
+    if query.sort is None or query.limit is not None:
+        return table.view()
+
+    column = getattr(table, SORT_FIELDS[query.sort][1])
+    key = (lambda row: column[row].lower()) if query.sort == "name" else column.__getitem__
+    return table.view(sorted(range(len(table)), key=key, reverse=query.descending))
+
+
+def stream_query(target_path, query, catalogue=None):
+    """
+    Yields the FileRecords matching a Query as the scan finds them, so memory
+    stays constant however many files match. With `top` and a sort only the
+    bounded heap is held; a sort without `top` has to see every match first,
+    so it goes through run_query's compact table.
+    """
+    if isinstance(query, str):
+        query = Query(query)
+    if query.sort is not None and query.limit is None:
+        matches = run_query(target_path, query, catalogue)
+        for position in range(len(matches)):
+            yield matches.record(position)
+    else:
+        yield from _matching_records(target_path, query, catalogue)
@@ -0,0 +1,219 @@
+import os
+import re
+
+# Per dig site ignore file, read from the root of the site.
+IGNORE_FILE_NAME = ".excavationignore"
+
+# Version control and package trees: almost never what a cleanup is after but
+# often hold most of the inodes. Caches, virtualenvs and snapshot directories
+# can hold real disk space, so they are only skipped when the user says so.
+DEFAULT_EXCLUDES = [
+    ".git/", ".hg/", ".svn/", "node_modules/", "__pycache__/", f"/{IGNORE_FILE_NAME}",
+]
+
+_settings = {"excludes": [], "includes": [], "max_depth": None, "one_filesystem": False, "default_excludes": True,
+             "follow_symlinks": False}
+_site_rules = {}
+
+
+def translate_glob(pattern):
+    """Translates a gitignore-style glob into a regular expression source."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        else:
+            char = pattern[i]
+            if char == "*":
+                parts.append("[^/]*")
+            elif char == "?":
+                parts.append("[^/]")
+            elif char == "[" and "]" in pattern[i + 2:]:
+                end = pattern.index("]", i + 2)
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                i = end
+            elif char == "\\" and i + 1 < len(pattern):
+                i += 1
+                parts.append(re.escape(pattern[i]))
+            else:
+                parts.append(re.escape(char))
+            i += 1
+    return "".join(parts)
+
+
+class _Rule:
+    """One gitignore-style line: `!` negates, a trailing `/` matches directories only,
+    and a `/` anywhere else anchors the pattern to the dig site root."""
+
+    def __init__(self, line):
+        self.negated = line.startswith("!")
+        pattern = line[1:] if self.negated else line
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        self.anchored = "/" in pattern
+        self.regex = re.compile(translate_glob(pattern.lstrip("/")) + r"\Z")
+        self.source = line
+
+
+def _combine(rules):
+    sources = [f"(?:{rule.regex.pattern})" for rule in rules]
+    return re.compile("|".join(sources)) if sources else None
+
+
+class WalkRules:
+    """
+    Decides at walk time which entries below a dig site are skipped.
+
+    Exclusions follow gitignore: the last matching rule wins, `!pattern`
+    re-includes, and nothing below an excluded directory is ever listed, so
+    it cannot be re-included either. Directories deeper than max_depth are
+    not descended into, and with one_filesystem neither are mount points.
+    With follow_symlinks, symlinked files and directories are walked as if
+    they were in place.
+    """
+
+    def __init__(self, root, patterns=(), max_depth=None, one_filesystem=False, follow_symlinks=False):
+        self.root = os.path.normpath(os.fspath(root))
+        self.rules = [_Rule(line) for line in patterns]
+        self.max_depth = max_depth
+        self.device = os.stat(self.root).st_dev if one_filesystem else None
+        self.follow_symlinks = follow_symlinks
+        # Combined regexes reject most entries without trying every rule.
+        self._any_name = _combine(rule for rule in self.rules if not rule.anchored)
+        self._any_path = _combine(rule for rule in self.rules if rule.anchored)
+
+    @property
+    def active(self):
+        return bool(self.rules) or self.max_depth is not None or self.device is not None or self.follow_symlinks
+
+    def fingerprint(self):
+        """A string that changes whenever the rules would select different entries."""
+        return repr(([rule.source for rule in self.rules], self.max_depth, self.device, self.follow_symlinks))
+
+    def depth_of(self, directory):
+        """The number of directory levels between the root and directory."""
+        relative = os.path.relpath(directory, self.root)
+        return 0 if relative == os.curdir else relative.count(os.sep) + 1
+
+    def _relative(self, path):
+        relative = path[len(self.root):].lstrip(os.sep)
+        return relative if os.sep == "/" else relative.replace(os.sep, "/")
+
+    def excluded(self, path, name, is_dir):
+        """Returns True if the last rule matching the entry excludes it."""
+        relative = None
+        if self._any_name is None or not self._any_name.match(name):
+            if self._any_path is None:
+                return False
+            relative = self._relative(path)
+            if not self._any_path.match(relative):
+                return False
+
+        verdict = False
+        for rule in self.rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.anchored:
+                if relative is None:
+                    relative = self._relative(path)
+                matched = rule.regex.match(relative)
+            else:
+                matched = rule.regex.match(name)
+            if matched:
+                verdict = not rule.negated
+        return verdict
+
+    def descends(self, depth):
+        """Returns True if subdirectories of a directory at depth are walked."""
+        return self.max_depth is None or depth < self.max_depth
+
+    def skips_dir(self, entry):
+        """Returns True if a subdirectory DirEntry must not be walked."""
+        if self.device is not None and entry.stat(follow_symlinks=self.follow_symlinks).st_dev != self.device:
+            return True
+        return self.excluded(entry.path, entry.name, True)
+
+    def skips_file(self, entry):
+        return self.excluded(entry.path, entry.name, False)
+
+
+def read_ignore_file(target_path):
+    """Returns the rule lines of the dig site's ignore file, or [] if it has none."""
+    try:
+        with open(os.path.join(os.fspath(target_path), IGNORE_FILE_NAME), encoding="utf-8") as f:
+            lines = [line.rstrip("\n") for line in f]
+    except OSError:
+        return []
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+
+def save_ignore_patterns(target_path, patterns):
+    """Appends patterns the ignore file does not hold yet. Returns the ignore file path."""
+    ignore_path = os.path.join(os.fspath(target_path), IGNORE_FILE_NAME)
+    existing = set(read_ignore_file(target_path))
+    new_lines = [pattern for pattern in patterns if pattern not in existing]
+    if new_lines:
+        with open(ignore_path, "a", encoding="utf-8") as f:
+            f.writelines(f"{line}\n" for line in new_lines)
+    return ignore_path
+
+
+def configure_rules(excludes=None, includes=None, max_depth=None, one_filesystem=None, default_excludes=None,
+                    follow_symlinks=None):
+    """
+    Sets the session-wide walk rules that apply on top of each dig site's ignore file.
+
+    Parameters
+    ----------
+    excludes, includes : list[str] | None
+        Extra gitignore-style patterns to skip, and to re-include.
+    max_depth : int | None
+        Directory levels below the dig site root that are walked; None is unlimited.
+    one_filesystem : bool | None
+        Whether to stay on the file system of the dig site root.
+    default_excludes : bool | None
+        Whether DEFAULT_EXCLUDES apply.
+    follow_symlinks : bool | None
+        Whether symlinked files and directories are walked.
+    """
+    for key, value in (("excludes", excludes), ("includes", includes), ("max_depth", max_depth),
+                       ("one_filesystem", one_filesystem), ("default_excludes", default_excludes),
+                       ("follow_symlinks", follow_symlinks)):
+        if value is not None:
+            _settings[key] = value
+    _site_rules.clear()
+
+
+def session_patterns():
+    """The command-line patterns of this session, as ignore file lines."""
+    return list(_settings["excludes"]) + [f"!{pattern}" for pattern in _settings["includes"]]
+
+
+def rules_for(target_path):
+    """
+    Returns the WalkRules of a dig site: the defaults, then its ignore file,
+    then the session's own patterns, so later lines override earlier ones.
+    The ignore file is re-read whenever it changes.
+    """
+    root = os.path.normpath(os.fspath(target_path))
+    try:
+        ignore_mtime = os.stat(os.path.join(root, IGNORE_FILE_NAME)).st_mtime
+    except OSError:
+        ignore_mtime = None
+    cached = _site_rules.get(root)
+    if cached is not None and cached[0] == ignore_mtime:
+        return cached[1]
+
+    patterns = DEFAULT_EXCLUDES if _settings["default_excludes"] else []
+    patterns = patterns + read_ignore_file(root) + session_patterns()
+    rules = WalkRules(root, patterns, _settings["max_depth"], _settings["one_filesystem"], _settings["follow_symlinks"])
+    _site_rules[root] = (ignore_mtime, rules)
+    return rules
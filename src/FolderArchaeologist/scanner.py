@@ -0,0 +1,501 @@
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from .metrics import add_phase, count, metrics_enabled
+from .rules import rules_for
+from .terminal import LazyConsole
+
+console = LazyConsole()
+
+# How many records are scanned between progress bar refreshes.
+PROGRESS_BATCH = 512
+# Seconds between redraws of a running scan's progress and leaderboard.
+REFRESH_SECONDS = 0.25
+# Batches a background scan may run ahead of the code consuming its records.
+QUEUE_BATCHES = 64
+
+_settings = {"workers": 1, "progress": True}
+_last_scan = {"cancelled": False, "scanned": 0}
+
+# dev and inode are 0 where the source does not know them (catalogues, Windows
+# scans), allocated (the bytes actually taken on disk) is -1.
+FileRecord = namedtuple("FileRecord", ["path", "name", "size", "mtime", "ctime", "dev", "inode", "allocated"],
+                        defaults=(0, 0, -1))
+
+
+class DigSite(os.PathLike):
+    """
+    Several dig site roots excavated as one. Scans walk only the roots, but
+    used as a path the site stands for their closest common directory, which
+    is where chamber trees, query paths and snapshots are anchored. Roots
+    inside another root are dropped, since they would be walked twice.
+    """
+
+    def __init__(self, roots):
+        roots = sorted({os.path.normpath(os.path.abspath(os.fspath(root))) for root in roots})
+        self.roots = []
+        for root in roots:
+            if not any(root.startswith(kept.rstrip(os.sep) + os.sep) for kept in self.roots):
+                self.roots.append(root)
+        try:
+            self.base = os.path.commonpath(self.roots)
+        except ValueError:
+            # Roots on different Windows drives share no directory.
+            self.base = self.roots[0]
+
+    def __fspath__(self):
+        return self.base
+
+    def __str__(self):
+        return ", ".join(self.roots)
+
+    def __eq__(self, other):
+        return isinstance(other, DigSite) and self.roots == other.roots
+
+    def __hash__(self):
+        return hash(tuple(self.roots))
+
+
+def site_roots(target_path):
+    """Returns the roots of a dig site: those of a DigSite, or the single path given."""
+    if isinstance(target_path, DigSite):
+        return list(target_path.roots)
+    return [os.path.normpath(os.fspath(target_path))]
+
+
+def dig_site(paths):
+    """Returns the one path given, or a DigSite spanning several."""
+    if len(paths) == 1:
+        return paths[0]
+    site = DigSite(paths)
+    return site.roots[0] if len(site.roots) == 1 else site
+
+
+def configure_scan(workers=None, progress=None):
+    """
+    Sets the session-wide scan options.
+
+    Parameters
+    ----------
+    workers : int | None
+        Number of threads listing directories concurrently. 1 walks serially.
+    progress : bool | None
+        Whether scans draw a progress bar. Batch mode turns it off.
+    """
+    if workers is not None:
+        _settings["workers"] = max(1, int(workers))
+    if progress is not None:
+        _settings["progress"] = progress
+
+
+def progress_enabled():
+    """Returns True unless progress bars were turned off, e.g. for batch mode."""
+    return _settings["progress"]
+
+
+# Windows does not report allocated blocks; files count at their apparent size there.
+_HAS_BLOCKS = hasattr(os.stat_result, "st_blocks")
+
+
+def allocated_size(stat_info):
+    """The bytes a file takes on disk: fewer for sparse or compressed files, more for small ones."""
+    return stat_info.st_blocks * 512 if _HAS_BLOCKS else stat_info.st_size
+
+
+def _record(entry, identities=None, linked=None, follow=False):
+    """
+    Stats a DirEntry into a FileRecord. A file other paths may also lead to
+    is appended to `linked` instead, for the walk to resolve at its end, and
+    None is returned.
+    """
+    stat_info = entry.stat()
+    record = FileRecord(entry.path, entry.name, stat_info.st_size, stat_info.st_mtime, stat_info.st_ctime,
+                        stat_info.st_dev, stat_info.st_ino, allocated_size(stat_info))
+    # Most files have one link; only the rest need an identity check.
+    if (stat_info.st_nlink > 1 or follow) and identities is not None:
+        identity = identities.shared(entry, stat_info, follow)
+        if identity is not None:
+            linked.append((identity, entry.is_symlink(), record))
+            return None
+    return record
+
+
+class _Identities:
+    """
+    The (st_dev, st_ino) identities one walk has met, shared by its threads.
+
+    Files with several hard links, and files reached through a symlink, are
+    held back as `linked` until the walk ends; then each identity yields
+    only its smallest direct path, so results do not depend on which thread
+    got there first. Following symlinks, directories are claimed on entry
+    and every directly reached file is remembered, which is what stops
+    symlink loops and keeps symlinked copies from being counted again.
+    """
+
+    def __init__(self, follow_symlinks=False):
+        self.follow_symlinks = follow_symlinks
+        self.dirs = {}
+        self.files = set()
+
+    def first_visit(self, directory):
+        """Claims a directory; False if it was reached before, e.g. through a symlink loop."""
+        try:
+            stat_info = os.stat(directory)
+        except OSError:
+            return False
+        return not stat_info.st_ino or self.dirs.setdefault((stat_info.st_dev, stat_info.st_ino), directory) == directory
+
+    def shared(self, entry, stat_info, follow):
+        """Returns the identity of a file other paths may also lead to, or None after claiming it as unique."""
+        if stat_info.st_ino:
+            if stat_info.st_nlink > 1 or (follow and entry.is_symlink()):
+                return (stat_info.st_dev, stat_info.st_ino)
+            if self.follow_symlinks:
+                self.files.add((stat_info.st_dev, stat_info.st_ino))
+        return None
+
+    def resolve(self, linked, every_link=False):
+        """
+        Yields one record per identity of the held back (identity,
+        via_symlink, record) entries, or every one of them with every_link.
+        """
+        if every_link:
+            for _, _, record in linked:
+                yield record
+            return
+        best = {}
+        for identity, via_symlink, record in linked:
+            if via_symlink and identity in self.files:
+                continue
+            rank = (via_symlink, record.path)
+            if identity not in best or rank < best[identity][0]:
+                best[identity] = (rank, record)
+        for _, record in best.values():
+            yield record
+
+
+def walk_files(target_path, workers=None, rules=None, every_link=False):
+    """
+    Walks the tree below target_path (or below every root of a DigSite)
+    exactly once with os.scandir and yields a FileRecord for every regular
+    file found.
+
+    The file type comes from the DirEntry cache, so directories are never
+    stat-ed and each file is stat-ed only once. Symlinks are not followed
+    unless the walk rules say so; then symlink loops and trees reachable
+    twice are walked once. A file with several hard links is yielded once,
+    at the end of the walk, so sizes are never counted twice, unless
+    every_link asks for all of its paths, e.g. for a catalogue that picks
+    one itself and keeps the others in case that one goes away. Unreadable
+    entries are skipped. With more than one worker, or more than one root,
+    directories are listed concurrently and records arrive in no particular
+    order.
+
+    Entries excluded by each root's WalkRules (or the rules given, when
+    walking part of a site) are pruned while listing, so excluded
+    directories are never opened and excluded files never stat-ed.
+    """
+    workers = workers or _settings["workers"]
+    seeds = []
+    for root in site_roots(target_path):
+        root_rules = rules or rules_for(root)
+        depth = root_rules.depth_of(root)
+        seeds.append((root, depth, root_rules if root_rules.active else None))
+    if len(seeds) > 1:
+        workers = max(workers, len(seeds))
+    identities = _Identities(any(seed[2] is not None and seed[2].follow_symlinks for seed in seeds))
+    linked = []
+    if metrics_enabled():
+        list_directory = _list_directory_measured
+    else:
+        list_directory = _list_directory
+    if workers > 1:
+        yield from _walk_parallel(seeds, workers, identities, linked, list_directory)
+    else:
+        pending = list(reversed(seeds))
+        while pending:
+            directory, depth, directory_rules = pending.pop()
+            records, subdirs = list_directory(directory, depth, directory_rules, identities, linked)
+            pending.extend((subdir, depth + 1, directory_rules) for subdir in subdirs)
+            yield from records
+    yield from identities.resolve(linked, every_link)
+
+
+def _list_directory(directory, depth=0, rules=None, identities=None, linked=None):
+    """
+    Lists one directory, returning its file records and the subdirectory paths
+    to walk. Files other paths may lead to are appended to `linked` instead.
+    """
+    records, subdirs = [], []
+    follow = rules is not None and rules.follow_symlinks
+    if follow and not identities.first_visit(directory):
+        return records, subdirs
+    descend = rules is None or rules.descends(depth)
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=follow):
+                        if descend and (rules is None or not rules.skips_dir(entry)):
+                            subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=follow):
+                        if rules is None or not rules.skips_file(entry):
+                            record = _record(entry, identities, linked, follow)
+                            if record is not None:
+                                records.append(record)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return records, subdirs
+
+
+def _list_directory_measured(directory, depth=0, rules=None, identities=None, linked=None):
+    """
+    _list_directory with --metrics instrumentation: counts directories, entries,
+    stat calls, pruned entries, linked files and skipped errors, and splits the
+    time between readdir and stat.
+    """
+    started = time.perf_counter()
+    stat_seconds = 0.0
+    records, subdirs = [], []
+    follow = rules is not None and rules.follow_symlinks
+    if follow and not identities.first_visit(directory):
+        count("dirs_revisited")
+        return records, subdirs
+    descend = rules is None or rules.descends(depth)
+    seen = pruned = links = errors = 0
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                seen += 1
+                try:
+                    if entry.is_dir(follow_symlinks=follow):
+                        if descend and (rules is None or not rules.skips_dir(entry)):
+                            subdirs.append(entry.path)
+                        else:
+                            pruned += 1
+                    elif entry.is_file(follow_symlinks=follow):
+                        if rules is None or not rules.skips_file(entry):
+                            stat_started = time.perf_counter()
+                            record = _record(entry, identities, linked, follow)
+                            stat_seconds += time.perf_counter() - stat_started
+                            if record is not None:
+                                records.append(record)
+                            else:
+                                links += 1
+                        else:
+                            pruned += 1
+                except OSError:
+                    errors += 1
+    except OSError:
+        errors += 1
+    add_phase("scan.readdir", time.perf_counter() - started - stat_seconds)
+    add_phase("scan.stat", stat_seconds, calls=len(records) + links)
+    count("dirs_visited")
+    count("entries_seen", seen)
+    count("stat_calls", len(records) + links)
+    count("files_found", len(records))
+    if links:
+        count("linked_files", links)
+    if pruned:
+        count("entries_pruned", pruned)
+    if errors:
+        count("errors_skipped", errors)
+    return records, subdirs
+
+
+def _walk_parallel(seeds, workers, identities, linked, list_directory=_list_directory):
+    """
+    Spreads directory listings over a thread pool so that many readdir and
+    stat round-trips are in flight at once, which is what makes network
+    mounts and cold caches fast, and lets several roots be walked side by
+    side. Records are yielded from the calling thread.
+    """
+    # concurrent.futures pulls in logging; serial walks never need it.
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {executor.submit(list_directory, root, depth, rules, identities, linked): (depth, rules)
+                   for root, depth, rules in seeds}
+        try:
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth, rules = running.pop(future)
+                    records, subdirs = future.result()
+                    for subdir in subdirs:
+                        future = executor.submit(list_directory, subdir, depth + 1, rules, identities, linked)
+                        running[future] = (depth + 1, rules)
+                    yield from records
+        finally:
+            for future in running:
+                future.cancel()
+
+
+class BackgroundScan:
+    """
+    Walks a dig site on a worker thread and hands its records to the calling
+    thread in batches, so the caller stays free to redraw the screen and the
+    walk can be stopped between any two files.
+    """
+
+    def __init__(self, target_path, batch_size=PROGRESS_BATCH, every_link=False):
+        # Batch runs never draw progress, so they never need these.
+        import queue
+        import threading
+
+        self.batch_size = batch_size
+        self.stop = threading.Event()
+        self.error = None
+        self._batches = queue.Queue(maxsize=QUEUE_BATCHES)
+        self._thread = threading.Thread(target=self._run, args=(target_path, every_link), name="excavation-scan",
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self, target_path, every_link):
+        walker = walk_files(target_path, every_link=every_link)
+        batch = []
+        try:
+            for record in walker:
+                if self.stop.is_set():
+                    break
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    self._put(batch)
+                    batch = []
+            if batch:
+                self._put(batch)
+        except BaseException as e:
+            self.error = e
+        finally:
+            walker.close()
+            self._put(None)
+
+    def _put(self, item):
+        import queue
+
+        # Once stopped nobody reads the queue anymore, so the batch is dropped.
+        while not self.stop.is_set():
+            try:
+                self._batches.put(item, timeout=REFRESH_SECONDS)
+                return
+            except queue.Full:
+                pass
+
+    def batches(self, timeout=REFRESH_SECONDS):
+        """
+        Yields lists of FileRecords until the walk ends or is stopped. An empty
+        list is yielded whenever nothing arrived within timeout, so the caller
+        can still refresh its display.
+        """
+        import queue
+
+        while not self.stop.is_set():
+            try:
+                batch = self._batches.get(timeout=timeout)
+            except queue.Empty:
+                yield []
+                continue
+            if batch is None:
+                break
+            yield batch
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        """Stops the walk and waits briefly for the worker to let go of its directory."""
+        self.stop.set()
+        self._thread.join(timeout=REFRESH_SECONDS)
+
+
+@contextmanager
+def _stop_on_interrupt(stop):
+    """Turns the first Ctrl-C into setting stop; a second one interrupts as usual."""
+    import signal
+
+    def interrupt(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        stop.set()
+
+    previous = signal.signal(signal.SIGINT, interrupt)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
+def scan_was_cancelled():
+    """Returns True if the user stopped the most recent scan early, so its results are partial."""
+    return _last_scan["cancelled"]
+
+
+def scan_files(target_path, description="[red]Scanning files...", leaderboard=None, cancellable=True,
+               every_link=False):
+    """
+    Yields a FileRecord for every file below target_path while showing an
+    open-ended progress bar with the running count and scan rate.
+
+    The walk runs on a background thread. Below the progress bar, an optional
+    Leaderboard shows the best results so far. Pressing Ctrl-C stops the
+    scan instead of the program: the generator simply ends, the caller
+    builds its results from the files seen so far, and scan_was_cancelled()
+    reports that they are partial.
+
+    Parameters
+    ----------
+    target_path : str | Path | DigSite
+        The dig site to scan.
+    description : str
+        The label shown next to the progress bar.
+    leaderboard : Leaderboard | None
+        Fed every batch of records and drawn while the scan runs.
+    cancellable : bool
+        Whether Ctrl-C stops only the scan. Scans whose partial results
+        would be misleading keep the usual KeyboardInterrupt.
+    every_link : bool
+        Whether every path of a hard-linked file is yielded, as walk_files.
+    """
+    _last_scan.update(cancelled=False, scanned=0)
+    if not progress_enabled():
+        yield from walk_files(target_path, every_link=every_link)
+        return
+
+    import threading
+    from rich.live import Live
+    from rich.console import Group
+    from .leaderboard import scan_progress
+
+    # Signal handlers can only be installed from the main thread.
+    cancellable = cancellable and threading.current_thread() is threading.main_thread()
+    progress = scan_progress()
+    task = progress.add_task(description, total=None)
+    view = Group(progress, leaderboard) if leaderboard is not None else progress
+    scan = BackgroundScan(target_path, every_link=every_link).start()
+    scanned = 0
+    try:
+        with _stop_on_interrupt(scan.stop) if cancellable else nullcontext(), \
+                Live(view, console=console.load(), auto_refresh=False, transient=True) as live:
+            refreshed = time.monotonic()
+            for batch in scan.batches():
+                if leaderboard is not None:
+                    leaderboard.update(batch)
+                yield from batch
+                scanned += len(batch)
+                if time.monotonic() - refreshed >= REFRESH_SECONDS:
+                    progress.update(task, completed=scanned)
+                    live.refresh()
+                    refreshed = time.monotonic()
+            _last_scan.update(cancelled=scan.stop.is_set(), scanned=scanned)
+    finally:
+        scan.close()
+
+    progress.update(task, completed=scanned, total=scanned)
+    console.print(progress)
+    if _last_scan["cancelled"]:
+        console.print(f"[yellow]Excavation stopped early: results cover the {scanned:,} artifacts found so far.[/yellow]")
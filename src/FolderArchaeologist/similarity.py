@@ -0,0 +1,127 @@
+import random
+from array import array
+from collections import defaultdict
+from .filetable import FileView
+from .tokens import NAME_DELIMITERS, name_tokens
+
+# Character n-gram length used to compare names.
+SHINGLE_SIZE = 3
+# Number of MinHash values kept per name; more is more accurate and slower.
+NUM_PERMUTATIONS = 32
+DEFAULT_SIMILARITY = 0.6
+
+# Fixed so the same names always land in the same clusters within a session.
+_MASK_SEED = 0x5EED
+
+
+def normalized_stem(name, delimiters=NAME_DELIMITERS):
+    """Lowercases a filename stem and collapses every delimiter run to one space."""
+    return " ".join(name_tokens(name, delimiters))
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Returns the set of character n-grams of text, padded so short names still compare."""
+    padded = f" {text} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+def jaccard(first, second):
+    """Exact Jaccard similarity of two shingle sets."""
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+def lsh_parameters(threshold, num_permutations=NUM_PERMUTATIONS):
+    """
+    Picks (bands, rows per band) so that names at the threshold similarity
+    become candidates about half the time or more, with as few bands as possible.
+    The similarity where the LSH curve turns is about (1 / bands) ** (1 / rows).
+    """
+    best = (num_permutations, 1)
+    for rows in range(1, num_permutations + 1):
+        bands = num_permutations // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def _masks(num_permutations):
+    rng = random.Random(_MASK_SEED)
+    return [rng.getrandbits(64) for _ in range(num_permutations)]
+
+
+def fuzzy_clusters(table, threshold=DEFAULT_SIMILARITY, delimiters=NAME_DELIMITERS,
+                   num_permutations=NUM_PERMUTATIONS):
+    """
+    Groups the files of a FileTable whose names are near-duplicates.
+
+    Names are compared by the Jaccard similarity of their character n-grams.
+    Each distinct normalized name gets a MinHash signature, and LSH banding
+    puts similar signatures in a shared bucket, so only names that share a
+    bucket are ever compared. Each bucket keeps its first name as its
+    representative. Later names are checked against that representative
+    with the exact similarity and merged if they reach the threshold. The
+    cost is roughly linear in the number of distinct names.
+
+    Returns
+    -------
+    list[tuple[str, FileView]]
+        (example name, files) for every cluster of more than one file, largest first.
+    """
+    bands, rows_per_band = lsh_parameters(threshold, num_permutations)
+    masks = _masks(bands * rows_per_band)
+
+    # Files with the same normalized name are clustered together up front.
+    stem_ids = {}
+    stems = []
+    stem_rows = []
+    for row, name in enumerate(table.names):
+        stem = normalized_stem(name, delimiters)
+        stem_id = stem_ids.get(stem)
+        if stem_id is None:
+            stem_id = stem_ids[stem] = len(stems)
+            stems.append(stem)
+            stem_rows.append(array('I'))
+        stem_rows[stem_id].append(row)
+    del stem_ids
+
+    parents = array('i', range(len(stems)))
+
+    def find(node):
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    buckets = {}
+    for stem_id, stem in enumerate(stems):
+        grams = shingles(stem)
+        hashes = [hash(gram) for gram in grams]
+        signature = [min(map(mask.__xor__, hashes)) for mask in masks]
+        for band in range(bands):
+            start = band * rows_per_band
+            key = hash((band, *signature[start:start + rows_per_band]))
+            representative = buckets.setdefault(key, stem_id)
+            if representative == stem_id:
+                continue
+            root, other = find(representative), find(stem_id)
+            if root != other and jaccard(grams, shingles(stems[representative])) >= threshold:
+                parents[other] = root
+
+    clusters = defaultdict(list)
+    for stem_id in range(len(stems)):
+        clusters[find(stem_id)].append(stem_id)
+
+    similar_groups = []
+    for members in clusters.values():
+        rows = array('I')
+        for stem_id in members:
+            rows.extend(stem_rows[stem_id])
+        if len(rows) > 1:
+            label = stems[max(members, key=lambda stem_id: len(stem_rows[stem_id]))]
+            similar_groups.append((label, FileView(table, rows)))
+    similar_groups.sort(key=lambda x: len(x[1]), reverse=True)
+    return similar_groups
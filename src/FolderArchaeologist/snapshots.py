@@ -0,0 +1,376 @@
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import heapq
+import struct
+import hashlib
+import tempfile
+from array import array
+from pathlib import Path
+from collections import namedtuple
+from .metrics import measured, phase
+from .scanner import DigSite, scan_files, scan_was_cancelled, site_roots
+
+DEFAULT_SNAPSHOT_DIR = Path.home() / ".folder_archaeologist" / "snapshots"
+SNAPSHOT_SUFFIX = ".fasnap"
+SNAPSHOT_MAGIC = b"FASNAP1\n"
+# Entries per compressed block; a reader only ever holds one decoded block.
+BLOCK_ENTRIES = 16384
+# Entries sorted in memory before they are spilled to a temporary run.
+RUN_ENTRIES = 262144
+COMPRESSION_LEVEL = 6
+# Largest changes kept for display by compare_snapshots.
+DIFF_TOP = 10
+
+# Each section lists its entries sorted by path, with these numeric columns.
+FILE_COLUMNS = "qd"  # size, mtime
+DIR_COLUMNS = "qq"   # total size below, files below
+
+_TRAILER = struct.Struct("<Q8s")
+
+Change = namedtuple("Change", ["kind", "path", "old_size", "new_size"])
+
+
+def sort_key(path):
+    """
+    Orders relative paths component by component, so every directory's
+    subtree is contiguous and both sides of a diff agree on the order.
+    """
+    return path.replace("/", "\0")
+
+
+def _encode_block(paths, columns):
+    names = "\0".join(paths).encode("utf-8", "surrogateescape")
+    parts = [struct.pack("<II", len(paths), len(names)), names]
+    for column in columns:
+        if sys.byteorder == "big":
+            column.byteswap()
+        parts.append(column.tobytes())
+    return zlib.compress(b"".join(parts), COMPRESSION_LEVEL)
+
+
+def _decode_block(data, typecodes):
+    payload = zlib.decompress(data)
+    count, names_length = struct.unpack_from("<II", payload)
+    offset = 8 + names_length
+    paths = payload[8:offset].decode("utf-8", "surrogateescape").split("\0") if count else []
+    columns = []
+    for typecode in typecodes:
+        column = array(typecode)
+        end = offset + column.itemsize * count
+        column.frombytes(payload[offset:end])
+        if sys.byteorder == "big":
+            column.byteswap()
+        columns.append(column)
+        offset = end
+    return paths, columns
+
+
+class SnapshotWriter:
+    """
+    Writes a snapshot file: sections of path-sorted entries stored in
+    zlib-compressed columnar blocks, followed by a JSON footer that records
+    where every block starts. Entries must be given in sort_key order.
+    """
+
+    def __init__(self, path, **meta):
+        self.path = Path(path)
+        self.meta = dict(meta, version=1, sections={})
+        self._file = open(self.path, "wb")
+        self._file.write(SNAPSHOT_MAGIC)
+
+    def write_section(self, name, typecodes, entries):
+        """Writes (path, *values) entries as a section and returns their number."""
+        blocks = []
+        total = 0
+        paths, columns = [], [array(typecode) for typecode in typecodes]
+        for path, *values in entries:
+            paths.append(path)
+            for column, value in zip(columns, values):
+                column.append(value)
+            if len(paths) == BLOCK_ENTRIES:
+                blocks.append(self._write_block(paths, columns))
+                total += len(paths)
+                paths, columns = [], [array(typecode) for typecode in typecodes]
+        if paths:
+            blocks.append(self._write_block(paths, columns))
+            total += len(paths)
+        self.meta["sections"][name] = {"columns": typecodes, "entries": total, "blocks": blocks}
+        return total
+
+    def _write_block(self, paths, columns):
+        data = _encode_block(paths, columns)
+        offset = self._file.tell()
+        self._file.write(data)
+        return [offset, len(data), len(paths)]
+
+    def close(self):
+        footer = json.dumps(self.meta).encode("utf-8")
+        self._file.write(footer)
+        self._file.write(_TRAILER.pack(len(footer), SNAPSHOT_MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+class Snapshot:
+    """
+    A snapshot file opened for reading. The file is memory-mapped and blocks
+    are decompressed one at a time while iterating, so even snapshots of
+    millions of files are read in constant memory.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < len(SNAPSHOT_MAGIC) + _TRAILER.size:
+            # Cut short, e.g. by a snapshot run that was killed while writing.
+            self._map.close()
+            raise ValueError(f"{self.path} is not an excavation snapshot.")
+        footer_length, magic = _TRAILER.unpack_from(self._map, len(self._map) - _TRAILER.size)
+        if magic != SNAPSHOT_MAGIC or self._map[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            self._map.close()
+            raise ValueError(f"{self.path} is not an excavation snapshot.")
+        footer_end = len(self._map) - _TRAILER.size
+        self.meta = json.loads(self._map[footer_end - footer_length:footer_end])
+        self.root = self.meta.get("root", "")
+        self.created = self.meta.get("created", 0.0)
+        self.files = self.meta["sections"].get("files", {}).get("entries", 0)
+        self.total_size = self.meta.get("total_size", 0)
+
+    def entries(self, section="files"):
+        """Yields the (path, *values) entries of a section in sort_key order."""
+        info = self.meta["sections"].get(section)
+        if info is None:
+            return
+        for offset, length, _ in info["blocks"]:
+            paths, columns = _decode_block(self._map[offset:offset + length], info["columns"])
+            yield from zip(paths, *columns)
+
+    def absolute(self, path):
+        """Returns the absolute path of a relative snapshot path."""
+        return os.path.join(self.root, *path.split("/")) if path else self.root
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def snapshot_directory(target_path):
+    """Returns the directory holding the saved snapshots of a dig site."""
+    roots = "\n".join(os.path.abspath(root) for root in site_roots(target_path))
+    return DEFAULT_SNAPSHOT_DIR / hashlib.sha1(roots.encode("utf-8", "surrogateescape")).hexdigest()
+
+
+def list_snapshots(target_path):
+    """Returns the paths of the saved snapshots of a dig site, oldest first."""
+    directory = snapshot_directory(target_path)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob("*" + SNAPSHOT_SUFFIX))
+
+
+def _spill(run, directory, number):
+    run.sort(key=lambda entry: sort_key(entry[0]))
+    path = os.path.join(directory, f"run{number}{SNAPSHOT_SUFFIX}")
+    with SnapshotWriter(path) as writer:
+        writer.write_section("files", FILE_COLUMNS, run)
+    return Snapshot(path)
+
+
+def _directory_totals(own):
+    """Adds the (size, files) directly inside each directory to all of its ancestors."""
+    totals = {}
+    for directory, (size, files) in own.items():
+        while True:
+            total_size, total_files = totals.get(directory, (0, 0))
+            totals[directory] = (total_size + size, total_files + files)
+            if not directory:
+                break
+            directory = directory.rpartition("/")[0]
+    return totals
+
+
+@measured("save_snapshot")
+def save_snapshot(target_path, destination=None, records=None):
+    """
+    Excavates a dig site and saves it as a snapshot. Returns the snapshot
+    path, or None if the scan was stopped early, since a partial snapshot
+    would show every file it missed as removed in later diffs.
+
+    Files are sorted in runs of RUN_ENTRIES that are spilled to temporary
+    snapshots and merged while writing, so memory stays bounded however
+    large the dig site is. Directory totals are kept per directory only.
+
+    Parameters
+    ----------
+    target_path : str | Path | DigSite
+        The dig site.
+    destination : str | Path | None
+        Where to write the snapshot; by default a new file in the dig site's
+        snapshot_directory.
+    records : Iterable[FileRecord] | None
+        The files to record, e.g. from a catalogue, instead of a fresh scan.
+    """
+    root = os.path.normpath(os.path.abspath(os.fspath(target_path)))
+    prefix = root if root.endswith(os.sep) else root + os.sep
+    # Scan the absolute roots, so every record path starts with the prefix.
+    site = target_path if isinstance(target_path, DigSite) else root
+    created = time.time()
+    if destination is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(created)) + f".{int(created * 1000) % 1000:03d}"
+        destination = snapshot_directory(target_path) / (stamp + SNAPSHOT_SUFFIX)
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    scanning = records is None
+    if scanning:
+        records = scan_files(site, "[red]Recording excavation snapshot...")
+
+    # Every root is recorded, even one whose files were all found elsewhere.
+    own = {root[len(prefix):].replace(os.sep, "/"): (0, 0) for root in site_roots(site)}
+    own[""] = (0, 0)
+    total_size = 0
+    runs, run = [], []
+    partial = destination.with_name(destination.name + ".partial")
+    with tempfile.TemporaryDirectory(prefix="excavation-") as spill_dir:
+        try:
+            for record in records:
+                relative = record.path[len(prefix):]
+                if os.sep != "/":
+                    relative = relative.replace(os.sep, "/")
+                run.append((relative, record.size, record.mtime))
+                directory = relative.rpartition("/")[0]
+                size, files = own.get(directory, (0, 0))
+                own[directory] = (size + record.size, files + 1)
+                total_size += record.size
+                if len(run) == RUN_ENTRIES:
+                    runs.append(_spill(run, spill_dir, len(runs)))
+                    run = []
+            if scanning and scan_was_cancelled():
+                return None
+
+            run.sort(key=lambda entry: sort_key(entry[0]))
+            totals = _directory_totals(own)
+            with phase("snapshot.write"), SnapshotWriter(partial, root=root, roots=site_roots(site),
+                                                         created=created, total_size=total_size) as writer:
+                merged = heapq.merge(run, *(spilled.entries() for spilled in runs), key=lambda entry: sort_key(entry[0]))
+                writer.write_section("files", FILE_COLUMNS, merged)
+                writer.write_section("dirs", DIR_COLUMNS,
+                                     ((path, *totals[path]) for path in sorted(totals, key=sort_key)))
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        finally:
+            # Mapped runs must be closed before their directory can be removed on Windows.
+            for spilled in runs:
+                spilled.close()
+    os.replace(partial, destination)
+    return destination
+
+
+def merge_join(old_entries, new_entries):
+    """
+    Walks two sort_key ordered entry streams side by side and yields
+    (path, old_values, new_values), with None for the side a path is missing from.
+    """
+    old_entries, new_entries = iter(old_entries), iter(new_entries)
+    old = next(old_entries, None)
+    new = next(new_entries, None)
+    old_key = sort_key(old[0]) if old is not None else None
+    new_key = sort_key(new[0]) if new is not None else None
+    while old is not None or new is not None:
+        if new is None or (old is not None and old_key < new_key):
+            yield old[0], old[1:], None
+            old = next(old_entries, None)
+            old_key = sort_key(old[0]) if old is not None else None
+        elif old is None or new_key < old_key:
+            yield new[0], None, new[1:]
+            new = next(new_entries, None)
+            new_key = sort_key(new[0]) if new is not None else None
+        else:
+            yield old[0], old[1:], new[1:]
+            old = next(old_entries, None)
+            old_key = sort_key(old[0]) if old is not None else None
+            new = next(new_entries, None)
+            new_key = sort_key(new[0]) if new is not None else None
+
+
+def diff_snapshots(old, new, section="files"):
+    """
+    Yields a Change for every path of a section that was added, removed,
+    grew or shrank between two Snapshots. Both are streamed, never loaded.
+    """
+    for path, before, after in merge_join(old.entries(section), new.entries(section)):
+        if before is None:
+            yield Change("added", path, None, after[0])
+        elif after is None:
+            yield Change("removed", path, before[0], None)
+        elif after[0] > before[0]:
+            yield Change("grown", path, before[0], after[0])
+        elif after[0] < before[0]:
+            yield Change("shrunk", path, before[0], after[0])
+
+
+def size_delta(change):
+    """The number of bytes a Change added (positive) or freed (negative)."""
+    return (change.new_size or 0) - (change.old_size or 0)
+
+
+class ExcavationDiff:
+    """
+    The totals and the largest changes between two snapshots, for files
+    ('files') and directories ('dirs'), gathered in one streaming pass each.
+    Only the `top` largest changes per section are kept.
+    """
+
+    def __init__(self, old, new, top=DIFF_TOP):
+        self.old = old
+        self.new = new
+        self.totals = {}
+        self.largest = {}
+        for section in ("files", "dirs"):
+            heap = []
+            for position, change in enumerate(diff_snapshots(old, new, section)):
+                delta = size_delta(change)
+                count, total = self.totals.get((section, change.kind), (0, 0))
+                self.totals[(section, change.kind)] = (count + 1, total + delta)
+                item = (abs(delta), -position, change)
+                if len(heap) < top:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+            self.largest[section] = [change for _, _, change in sorted(heap, reverse=True)]
+
+    def count(self, section, kind):
+        return self.totals.get((section, kind), (0, 0))[0]
+
+    def bytes(self, section, kind):
+        return self.totals.get((section, kind), (0, 0))[1]
+
+    def absolute(self, change):
+        """The absolute path of a change, below the root of the side it exists in."""
+        snapshot = self.old if change.kind == "removed" else self.new
+        return snapshot.absolute(change.path)
+
+
+@measured("compare_snapshots")
+def compare_snapshots(old_path, new_path, top=DIFF_TOP):
+    """Opens two snapshot files and returns their ExcavationDiff."""
+    with Snapshot(old_path) as old, Snapshot(new_path) as new:
+        return ExcavationDiff(old, new, top)
@@ -0,0 +1,27 @@
+class LazyConsole:
+    """
+    Stands in for a rich Console and only imports rich the first time it is
+    used. Modules that batch runs and `--version` import use it, so those
+    never pay for loading rich when nothing is drawn.
+    """
+
+    def __init__(self, **options):
+        self._options = options
+        self._console = None
+
+    def load(self):
+        """Returns the real Console, creating it on first use."""
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console(**self._options)
+        return self._console
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    # Live displays hold the console as a context manager, which bypasses __getattr__.
+    def __enter__(self):
+        return self.load().__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.load().__exit__(*exc_info)
@@ -0,0 +1,150 @@
+import os
+import re
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from .scanner import scan_files, scan_was_cancelled
+from .filetable import FileTable, FileView
+from .metrics import add_phase, metrics_enabled, phase
+
+# Delimiters used to split artifact names into inscriptions (tokens).
+NAME_DELIMITERS = [' ', '-', '_', '.']
+
+_splitters = {}
+_token_indexes = {}
+
+
+def compile_splitter(delimiters):
+    """Returns a cached, precompiled regex splitting on any of the delimiters."""
+    key = tuple(delimiters)
+    splitter = _splitters.get(key)
+    if splitter is None:
+        splitter = _splitters[key] = re.compile('|'.join(map(re.escape, delimiters)))
+    return splitter
+
+
+def name_tokens(name, delimiters=NAME_DELIMITERS):
+    """Returns the lowercase inscriptions of a filename stem, in order."""
+    stem = os.path.splitext(name)[0]
+    return [token.lower() for token in compile_splitter(delimiters).split(stem) if token]
+
+
+class TokenIndex:
+    """
+    An inverted index from inscription to the files whose names contain it.
+
+    Names are tokenized once while the index is built. Exact, prefix and
+    substring lookups as well as cluster ranking are then answered from memory.
+    """
+
+    def __init__(self, table, delimiters=NAME_DELIMITERS):
+        self.table = table
+        self.delimiters = list(delimiters)
+        self.postings = defaultdict(lambda: array('I'))
+        self.leads = defaultdict(lambda: array('I'))
+        self._vocabulary = None
+
+    def add(self, row):
+        """Tokenizes the name of a table row and records it in the index."""
+        tokens = name_tokens(self.table.names[row], self.delimiters)
+        if not tokens:
+            return
+        self.leads[tokens[0]].append(row)
+        for token in dict.fromkeys(tokens):
+            self.postings[token].append(row)
+        self._vocabulary = None
+
+    @property
+    def vocabulary(self):
+        """The sorted list of every known inscription."""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        return self._vocabulary
+
+    def _union(self, tokens):
+        rows = set()
+        for token in tokens:
+            rows.update(self.postings[token])
+        return FileView(self.table, sorted(rows))
+
+    def lookup(self, token):
+        """Returns a FileView of the files containing exactly this inscription."""
+        return FileView(self.table, self.postings.get(token, array('I')))
+
+    def prefix(self, prefix):
+        """Returns a FileView of the files with an inscription starting with prefix."""
+        vocabulary = self.vocabulary
+        start = bisect_left(vocabulary, prefix)
+        matches = []
+        for token in vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+        return self._union(matches)
+
+    def substring(self, fragment):
+        """Returns a FileView of the files with an inscription containing fragment."""
+        return self._union(token for token in self.vocabulary if fragment in token)
+
+    def search(self, pattern):
+        """
+        Looks up an inscription pattern: `word` matches exactly, `word*` by
+        prefix and `*word*` by substring.
+        """
+        if pattern.startswith('*') and pattern.endswith('*') and len(pattern) > 1:
+            return self.substring(pattern.strip('*'))
+        if pattern.endswith('*'):
+            return self.prefix(pattern.rstrip('*'))
+        return self.lookup(pattern)
+
+    def clusters(self):
+        """Returns (inscription, FileView) for leading inscriptions shared by several files, largest first."""
+        similar_groups = [(token, FileView(self.table, rows)) for token, rows in self.leads.items() if len(rows) > 1]
+        with phase("sort"):
+            similar_groups.sort(key=lambda x: len(x[1]), reverse=True)
+        return similar_groups
+
+
+def build_token_index(target_path, delimiters=NAME_DELIMITERS):
+    """Scans target_path once and returns a TokenIndex over every file found."""
+    # Batch mode only tokenizes names, so the rich leaderboards load on demand.
+    from .leaderboard import ClusterLeaderboard
+
+    table = FileTable()
+    token_index = TokenIndex(table, delimiters)
+    leaderboard = ClusterLeaderboard(token_index)
+    if not metrics_enabled():
+        for record in scan_files(target_path, "[red]Cataloguing inscriptions...", leaderboard):
+            token_index.add(table.add_record(record))
+        return token_index
+
+    # Tokenizing is timed apart from the scan that feeds it.
+    tokenize_seconds = 0.0
+    for record in scan_files(target_path, "[red]Cataloguing inscriptions...", leaderboard):
+        row = table.add_record(record)
+        started = time.perf_counter()
+        token_index.add(row)
+        tokenize_seconds += time.perf_counter() - started
+    add_phase("tokenize", tokenize_seconds, calls=len(table))
+    return token_index
+
+
+def get_token_index(target_path, delimiters=NAME_DELIMITERS, rescan=False):
+    """
+    Returns the TokenIndex of target_path built earlier in this session,
+    scanning the dig site only the first time or when rescan is requested.
+    An index from a scan the user stopped early is returned but not kept.
+    """
+    key = (os.path.abspath(os.fspath(target_path)), tuple(delimiters))
+    if rescan or key not in _token_indexes:
+        token_index = build_token_index(target_path, delimiters)
+        if scan_was_cancelled():
+            return token_index
+        _token_indexes[key] = token_index
+    return _token_indexes[key]
+
+
+def has_token_index(target_path, delimiters=NAME_DELIMITERS):
+    """Returns True if a TokenIndex of target_path is already cached this session."""
+    return (os.path.abspath(os.fspath(target_path)), tuple(delimiters)) in _token_indexes
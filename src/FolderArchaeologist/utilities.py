@@ -1,15 +1,52 @@
+from __future__ import annotations
+
 import os
+import re
+import sys
 import argparse
-from typing import List
-from pathlib import Path
-from rich.table import Table
-from rich.console import Console
+from collections.abc import Callable, Sequence
+from . import __version__
+from .metrics import phase
+from .rules import IGNORE_FILE_NAME, configure_rules, save_ignore_patterns, session_patterns
+from .scanner import dig_site, site_roots
+from .terminal import LazyConsole
+
+console = LazyConsole()
+
+# ANSI sequences: cursor home, erase the screen, erase the scrollback.
+CLEAR_SEQUENCE = "\033[H\033[2J\033[3J"
+
+_terminal = {"ansi_ready": os.name != "nt"}
+
+# Rows shown per page by show_data and show_paged_data.
+PAGE_SIZE = 25
+
+class LazyRows(Sequence):
+    """
+    A read-only sequence of table rows that are only built when accessed,
+    so a table over millions of items only formats the rows it displays.
+    """
+
+    def __init__(self, row_count: int, row_at: Callable[[int], list[str]]):
+        self.row_count = row_count
+        self.row_at = row_at
 
-console = Console()
+    def __len__(self):
+        return self.row_count
 
-def show_data(title: str, column_list: List[str], data_rows: List[List[str]]):
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.row_at(index) for index in range(*position.indices(self.row_count))]
+        if position < 0:
+            position += self.row_count
+        if not 0 <= position < self.row_count:
+            raise IndexError(position)
+        return self.row_at(position)
+
+def show_data(title: str, column_list: list[str], data_rows: Sequence, page: int = 0, page_size: int = PAGE_SIZE):
     """
     This method prints a neat and clean table of the data provided.
+    Only one page of rows is formatted; larger tables note how many rows are hidden.
     
     Parameters
     ----------
@@ -17,8 +54,12 @@ def show_data(title: str, column_list: List[str], data_rows: List[List[str]]):
         The title of the table.
     column_list: list[str]
         List containing the names of all columns of the table.
-    data_rows: list[list[str]]
-        A list of rows, where each row is a list of strings for the columns.
+    data_rows: Sequence[list[str]]
+        A list of rows, or a LazyRows, where each row is a list of strings for the columns.
+    page: int
+        The zero-based page to show.
+    page_size: int
+        Rows per page.
     """
     if not data_rows and title == "Currently Excavated Artifacts":
         console.print("[yellow]There are no artifacts in the current selection.[/yellow]")
@@ -28,19 +69,127 @@ def show_data(title: str, column_list: List[str], data_rows: List[List[str]]):
         console.print(f"[yellow]No data to display for '{title}'.[/yellow]")
         return
 
-    table = Table(title=f"[bold cyan]{title}[/bold cyan]", show_header=True, header_style="bold magenta")
+    from rich.table import Table
 
-    for column in column_list:
-        table.add_column(column, justify="left", no_wrap=False)
-    
-    for row in data_rows:
-        table.add_row(*row)
+    with phase("render"):
+        table = Table(title=f"[bold cyan]{title}[/bold cyan]", show_header=True, header_style="bold magenta")
+
+        for column in column_list:
+            table.add_column(column, justify="left", no_wrap=False)
         
-    console.print(table)
+        start = page * page_size
+        for row in data_rows[start:start + page_size]:
+            table.add_row(*row)
+            
+        console.print(table)
+    if len(data_rows) > page_size:
+        shown_to = min(start + page_size, len(data_rows))
+        console.print(f"[dim]Showing rows {start + 1}-{shown_to} of {len(data_rows)}.[/dim]")
+
+def show_paged_data(title: str, column_list: list[str], data_rows: Sequence, page_size: int = PAGE_SIZE,
+                    actions: dict[str, tuple[str, Callable[[], None]]] | None = None,
+                    filter_text: Callable[[int], str] | None = None, prompt: str | None = None):
+    """
+    Shows a table page by page. Only the rows on the visible page are built,
+    so huge result sets cost no more to display than a single page.
+    
+    Besides next/prev, the user can jump to a page with `g N` and filter
+    rows with `/text` (a lone `/` clears the filter). Rows keep their own
+    numbering, so index-based selection works across the whole set.
+    
+    Parameters
+    ----------
+    title : str
+        The title of the table.
+    column_list: list[str]
+        List containing the names of all columns of the table.
+    data_rows: Sequence[list[str]]
+        The rows, ideally a LazyRows.
+    page_size: int
+        Rows per page.
+    actions: dict[str, tuple[str, Callable]] | None
+        Extra single-key commands, mapped to a label and a callback.
+    filter_text: Callable[[int], str] | None
+        Returns the text a row is filtered on. Defaults to all of its cells.
+    prompt: str | None
+        When given, any input that is not a pager command is returned to the
+        caller instead of being rejected.
+
+    Returns
+    -------
+    str | None
+        The non-command input when a prompt was given, otherwise None.
+    """
+    from rich.markup import escape
+
+    actions = actions or {}
+    filter_text = filter_text or (lambda position: " ".join(data_rows[position]))
+    visible = data_rows
+    query = ""
+    page = 0
+    while True:
+        pages = max(1, -(-len(visible) // page_size))
+        page = min(max(page, 0), pages - 1)
+
+        clear_screen()
+        heading = f"{title} (page {page + 1}/{pages})" + (f" matching '{query}'" if query else "")
+        show_data(heading, column_list, visible, page, page_size)
+        options = ["[n]ext", "[p]rev", "g N: go to page", "/text: filter"]
+        options += [f"[{key}] {label}" for key, (label, _) in actions.items()] + ["[q]uit"]
+        console.print(f"\n[dim]{escape(' | '.join(options))}[/dim]")
+        choice = input(f"{prompt}: " if prompt else "> ").strip()
+        command = choice.lower()
+
+        if command == "n" or (command == "" and not prompt):
+            if page == pages - 1 and command == "":
+                return None
+            page += 1
+        elif command == "p":
+            page -= 1
+        elif command == "q":
+            return None
+        elif command.startswith("g ") and command[2:].strip().isdigit():
+            page = int(command[2:]) - 1
+        elif command.startswith("/"):
+            query = choice[1:].strip()
+            needle = query.lower()
+            if needle:
+                matches = [position for position in range(len(data_rows)) if needle in filter_text(position).lower()]
+                visible = LazyRows(len(matches), lambda index, matches=matches: data_rows[matches[index]])
+            else:
+                visible = data_rows
+            page = 0
+        elif command in actions:
+            actions[command][1]()
+        elif prompt:
+            return choice
+
+def _enable_windows_ansi():
+    """Turns on escape sequence processing in the Windows console. Returns False if it cannot."""
+    import ctypes
+
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.GetStdHandle(-11)  # STD_OUTPUT_HANDLE
+    mode = ctypes.c_uint32()
+    if not kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+        return False
+    return bool(kernel32.SetConsoleMode(handle, mode.value | 0x0004))  # ENABLE_VIRTUAL_TERMINAL_PROCESSING
 
 def clear_screen():
-    """Clears the terminal screen."""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    """
+    Clears the terminal screen by writing ANSI control sequences, which is far
+    cheaper than spawning `clear` or `cls`. Output that is not a terminal is
+    left alone, so redirected output is not littered with escape codes.
+    """
+    if not sys.stdout.isatty():
+        return
+    if not _terminal["ansi_ready"]:
+        _terminal["ansi_ready"] = _enable_windows_ansi()
+        if not _terminal["ansi_ready"]:
+            os.system('cls')
+            return
+    sys.stdout.write(CLEAR_SEQUENCE)
+    sys.stdout.flush()
 
 def format_size(bytes_size):
     """Converts byte size to a human-readable format."""
@@ -52,8 +201,85 @@ def format_size(bytes_size):
         bytes_size /= 1024.0
     return f"{bytes_size:.2f} PB"
 
-def parse_directory_path(default_path=None):
-    """Parses directory path from command-line arguments, with a default."""
+def parse_size(size_text):
+    """Parses a human-readable size such as '100M', '1.5GB' or '2048' into bytes."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGTP]?)i?B?\s*", size_text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {size_text!r}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGTP".index(unit.upper() or " "))
+
+def add_rule_arguments(parser):
+    """Adds the walk pruning options shared by the interactive and batch entry points."""
+    parser.add_argument(
+        "--exclude",
+        metavar="PATTERN",
+        action="append",
+        default=[],
+        help="Skip entries matching a gitignore-style pattern (e.g. 'build/' or '*.iso'); repeatable."
+    )
+    parser.add_argument(
+        "--include",
+        metavar="PATTERN",
+        action="append",
+        default=[],
+        help="Re-include entries an earlier pattern excluded, like '!PATTERN' in a gitignore; repeatable."
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=None,
+        help="Only walk this many directory levels below the dig site."
+    )
+    parser.add_argument(
+        "--one-filesystem",
+        action="store_true",
+        help="Do not cross into other mounted file systems."
+    )
+    parser.add_argument(
+        "--follow-symlinks",
+        action="store_true",
+        help="Walk symlinked files and directories; loops and trees reachable twice are walked once."
+    )
+    parser.add_argument(
+        "--no-default-excludes",
+        action="store_true",
+        help="Also walk .git, .hg, .svn, node_modules and __pycache__ directories."
+    )
+    parser.add_argument(
+        "--save-ignore",
+        action="store_true",
+        help=f"Append the --exclude/--include patterns to the dig site's {IGNORE_FILE_NAME} for later sessions."
+    )
+
+def apply_rule_arguments(args):
+    """Configures the walk rules from parsed arguments. Returns the ignore file path if patterns were saved."""
+    configure_rules(args.exclude, args.include, args.max_depth, args.one_filesystem, not args.no_default_excludes,
+                    args.follow_symlinks)
+    if args.save_ignore and session_patterns():
+        saved = [save_ignore_patterns(root, session_patterns()) for root in site_roots(args.path)]
+        return ", ".join(saved)
+    return None
+
+def add_metrics_arguments(parser):
+    """Adds the --metrics and --profile options shared by the interactive and batch entry points."""
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        default=None,
+        help="Record per-phase timings, counters and throughput, print them on exit and write them to FILE as JSON."
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        default=None,
+        help="Also run the main thread under cProfile and write the stats to FILE (implies the metrics summary)."
+    )
+
+def parse_arguments(default_path=None):
+    """Parses the command-line arguments of the excavate entry point."""
+    from pathlib import Path
+
     if default_path is None:
         default_path = str(Path.home())
     
@@ -63,15 +289,49 @@ def parse_directory_path(default_path=None):
     )
     parser.add_argument(
         "path",
-        nargs="?",
-        default=default_path,
-        help="The target dig site to excavate."
+        nargs="*",
+        default=[default_path],
+        help="The target dig site to excavate. Several roots are excavated together as one dig site."
+    )
+    parser.add_argument(
+        "--version",
+        action="version",
+        version=f"Folder Archaeologist {__version__}"
+    )
+    parser.add_argument(
+        "--index",
+        action="store_true",
+        help="Keep a persistent index of the dig site so later scans only re-read changed directories."
+    )
+    parser.add_argument(
+        "--index-dir",
+        default=None,
+        help="Where to store the dig site indexes (defaults to ~/.folder_archaeologist/index)."
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of threads listing directories concurrently; raise it for network mounts and cold caches."
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep results current by following changes on disk (inotify on Linux, periodic rescans elsewhere)."
+    )
+    add_rule_arguments(parser)
+    add_metrics_arguments(parser)
     args = parser.parse_args()
     
-    path = Path(args.path)
-    if not path.is_dir():
-        print(f"Error: The path '{path}' is not a valid dig site. Exiting.")
-        exit(1)
-        
-    return path
+    paths = [Path(path) for path in args.path]
+    for path in paths:
+        if not path.is_dir():
+            print(f"Error: The path '{path}' is not a valid dig site. Exiting.")
+            exit(1)
+
+    args.path = dig_site(paths)
+    return args
+
+def parse_directory_path(default_path=None):
+    """Parses directory path from command-line arguments, with a default."""
+    return parse_arguments(default_path).path
@@ -0,0 +1,392 @@
+import os
+import sys
+import stat
+import time
+import errno
+import heapq
+import ctypes
+import ctypes.util
+import struct
+import select
+import threading
+from collections import defaultdict
+from operator import attrgetter
+from .scanner import FileRecord, allocated_size, scan_files, walk_files
+from .filetable import FileTable, FileView
+from .tokens import name_tokens
+from .rules import rules_for
+
+# inotify event masks, from <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Seconds between rescans when inotify is unavailable.
+POLL_INTERVAL = 30
+
+_live_excavations = {}
+
+
+class LiveExcavation:
+    """
+    The in-memory catalogue of one watched dig site.
+
+    Extension, token and leading-token groups are kept up to date one file at
+    a time as change events arrive, so queries never touch the filesystem.
+    All access is guarded by a lock because a watcher thread feeds it.
+
+    Like a walk, only one path per (device, inode) identity is catalogued:
+    the smallest direct one. Other hard links, and symlinks to a catalogued
+    file, are kept aside in `shadowed` and take over if that path goes away.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(os.fspath(root))
+        self.lock = threading.Lock()
+        self.records = {}
+        self.by_extension = defaultdict(set)
+        self.by_token = defaultdict(set)
+        self.by_lead_token = defaultdict(set)
+        self.owners = {}
+        self.shadowed = {}
+        self.watcher = None
+
+    # Updates, called by the watchers.
+
+    def _add(self, record):
+        self._remove(record.path)
+        if not record.inode:
+            self._index(record)
+            return
+        identity = (record.dev, record.inode)
+        owner = self.owners.get(identity)
+        if owner is not None and _rank(owner) < _rank(record.path):
+            self.shadowed[record.path] = record
+            return
+        if owner is not None:
+            self.shadowed[owner] = self._unindex(owner)
+        self.owners[identity] = record.path
+        self._index(record)
+
+    def _remove(self, path):
+        if self.shadowed.pop(path, None) is not None:
+            return
+        record = self._unindex(path)
+        if record is None or not record.inode:
+            return
+        identity = (record.dev, record.inode)
+        del self.owners[identity]
+        copies = [other for other in self.shadowed.values() if (other.dev, other.inode) == identity]
+        if copies:
+            heir = min(copies, key=lambda other: _rank(other.path))
+            del self.shadowed[heir.path]
+            self.owners[identity] = heir.path
+            self._index(heir)
+
+    def _index(self, record):
+        self.records[record.path] = record
+        ext = os.path.splitext(record.name)[1][1:] or "no_extension"
+        self.by_extension[ext].add(record.path)
+        tokens = name_tokens(record.name)
+        if tokens:
+            self.by_lead_token[tokens[0]].add(record.path)
+        for token in tokens:
+            self.by_token[token].add(record.path)
+
+    def _unindex(self, path):
+        record = self.records.pop(path, None)
+        if record is None:
+            return None
+        ext = os.path.splitext(record.name)[1][1:] or "no_extension"
+        _discard(self.by_extension, ext, path)
+        tokens = name_tokens(record.name)
+        if tokens:
+            _discard(self.by_lead_token, tokens[0], path)
+        for token in tokens:
+            _discard(self.by_token, token, path)
+        return record
+
+    def update_file(self, path):
+        """Re-stats one file and adds, updates or drops it."""
+        rules = rules_for(self.root)
+        try:
+            stat_info = os.stat(path, follow_symlinks=rules.follow_symlinks)
+            is_file = stat.S_ISREG(stat_info.st_mode)
+        except OSError:
+            is_file = False
+        if is_file and rules.excluded(path, os.path.basename(path), False):
+            is_file = False
+        with self.lock:
+            if is_file:
+                self._add(FileRecord(path, os.path.basename(path), stat_info.st_size, stat_info.st_mtime,
+                                     stat_info.st_ctime, stat_info.st_dev, stat_info.st_ino, allocated_size(stat_info)))
+            else:
+                self._remove(path)
+
+    def add_tree(self, directory):
+        """Adds every file below a directory that appeared in the dig site."""
+        for record in walk_files(directory, rules=rules_for(self.root), every_link=True):
+            with self.lock:
+                self._add(record)
+
+    def remove_tree(self, directory):
+        """Drops every file below a directory that left the dig site."""
+        prefix = directory.rstrip(os.sep) + os.sep
+        with self.lock:
+            for path in [path for path in self.shadowed if path.startswith(prefix)]:
+                self._remove(path)
+            for path in [path for path in self.records if path.startswith(prefix)]:
+                self._remove(path)
+
+    def replace_all(self, records):
+        """Swaps the whole catalogue for a fresh scan."""
+        with self.lock:
+            self.records.clear()
+            self.by_extension.clear()
+            self.by_token.clear()
+            self.by_lead_token.clear()
+            self.owners.clear()
+            self.shadowed.clear()
+            for record in records:
+                self._add(record)
+
+    # Queries, mirroring DigSiteIndex.
+
+    def _view(self, records):
+        table = FileTable()
+        for record in records:
+            table.add_record(record)
+        return table.view()
+
+    def _grouped_views(self, groups):
+        table = FileTable()
+        rows = {}
+        for key, paths in groups.items():
+            rows[key] = [table.add_record(self.records[path]) for path in paths]
+        return {key: FileView(table, group_rows) for key, group_rows in rows.items() if group_rows}
+
+    def all_files(self):
+        with self.lock:
+            return self._view(list(self.records.values()))
+
+    def extension_groups(self):
+        with self.lock:
+            return self._grouped_views(self.by_extension)
+
+    def large_files(self, size_threshold, limit=None):
+        with self.lock:
+            matches = [record for record in self.records.values() if record.size > size_threshold]
+        if limit is not None:
+            return self._view(heapq.nlargest(limit, matches, key=attrgetter("size")))
+        return self._view(sorted(matches, key=attrgetter("size"), reverse=True))
+
+    def old_files(self, age_threshold, limit=None):
+        cutoff = time.time() - age_threshold
+        with self.lock:
+            matches = [record for record in self.records.values() if record.mtime < cutoff]
+        if limit is not None:
+            return self._view(heapq.nsmallest(limit, matches, key=attrgetter("mtime")))
+        return self._view(sorted(matches, key=attrgetter("mtime")))
+
+    def lead_token_groups(self):
+        with self.lock:
+            return self._grouped_views(self.by_lead_token)
+
+    def token_matches(self, pattern):
+        """Looks up `word`, `word*` (prefix) or `*word*` (substring) inscriptions."""
+        with self.lock:
+            if not pattern.endswith('*'):
+                tokens = [pattern]
+            elif pattern.startswith('*'):
+                tokens = [token for token in self.by_token if pattern.strip('*') in token]
+            else:
+                tokens = [token for token in self.by_token if token.startswith(pattern.rstrip('*'))]
+            paths = set()
+            for token in tokens:
+                paths.update(self.by_token.get(token, ()))
+            return self._view(self.records[path] for path in sorted(paths))
+
+
+def _rank(path):
+    """Orders the paths of one file as scanner._Identities does: direct ones first, then by path."""
+    return os.path.islink(path), path
+
+
+def _discard(groups, key, path):
+    members = groups.get(key)
+    if members is not None:
+        members.discard(path)
+        if not members:
+            del groups[key]
+
+
+class InotifyWatcher(threading.Thread):
+    """Feeds a LiveExcavation from Linux inotify events on every directory of the dig site."""
+
+    def __init__(self, live):
+        super().__init__(daemon=True, name="excavation-watch")
+        self.live = live
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+        self.stopped = threading.Event()
+        try:
+            self.watch_tree(live.root)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def watch_tree(self, directory):
+        """Adds a watch on a directory and every directory below it that the walk rules keep."""
+        rules = rules_for(self.live.root)
+        pending = [(directory, rules.depth_of(directory))]
+        while pending:
+            current, depth = pending.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(current), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if current == directory or error == errno.ENOSPC:  # Out of inotify watches.
+                    raise OSError(error, f"Cannot watch {current}")
+                continue
+            self.directories[wd] = current
+            if not rules.descends(depth):
+                continue
+            try:
+                with os.scandir(current) as entries:
+                    pending.extend((entry.path, depth + 1) for entry in entries
+                                   if entry.is_dir(follow_symlinks=False) and not rules.skips_dir(entry))
+            except OSError:
+                pass
+
+    def unwatch_tree(self, directory):
+        prefix = directory.rstrip(os.sep) + os.sep
+        for wd, path in list(self.directories.items()):
+            if path == directory or path.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.directories[wd]
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                ready, _, _ = select.select([self.fd], [], [], 0.5)
+                if ready:
+                    self.handle(os.read(self.fd, 64 * 1024))
+        finally:
+            os.close(self.fd)
+
+    def handle(self, buffer):
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                self.live.replace_all(walk_files(self.live.root, every_link=True))
+                continue
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            directory = self.directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    rules = rules_for(self.live.root)
+                    if rules.excluded(path, name, True) or not rules.descends(rules.depth_of(directory)):
+                        continue
+                    try:
+                        self.watch_tree(path)
+                    except OSError:
+                        pass
+                    self.live.add_tree(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.unwatch_tree(path)
+                    self.live.remove_tree(path)
+            else:
+                self.live.update_file(path)
+
+
+class PollingWatcher(threading.Thread):
+    """Keeps a LiveExcavation current by rescanning on an interval, for systems without inotify."""
+
+    def __init__(self, live, interval=POLL_INTERVAL):
+        super().__init__(daemon=True, name="excavation-poll")
+        self.live = live
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            fresh = {record.path: record for record in walk_files(self.live.root, every_link=True)}
+            with self.live.lock:
+                known = self.live.shadowed.copy()
+                known.update(self.live.records)
+                for path in [path for path in known if path not in fresh]:
+                    self.live._remove(path)
+                for path, record in fresh.items():
+                    if known.get(path) != record:
+                        self.live._add(record)
+
+
+def start_watch(target_path, poll_interval=POLL_INTERVAL):
+    """
+    Scans target_path once and keeps the result current in the background,
+    through inotify on Linux or periodic rescans elsewhere.
+    Returns the LiveExcavation.
+    """
+    live = LiveExcavation(target_path)
+    watcher = None
+    if sys.platform.startswith("linux"):
+        try:
+            # Watches go in before the scan so no change slips between them.
+            watcher = InotifyWatcher(live)
+        except (OSError, AttributeError):
+            watcher = None
+    # A partial survey would silently miss files for the whole session.
+    # The absolute root, so records match the paths the watchers build from it.
+    live.replace_all(scan_files(live.root, "[red]Surveying the dig site for live watch...", cancellable=False,
+                                every_link=True))
+    if watcher is None:
+        watcher = PollingWatcher(live, poll_interval)
+    live.watcher = watcher
+    watcher.start()
+    _live_excavations[live.root] = live
+    return live
+
+
+def get_live_excavation(target_path):
+    """Returns the LiveExcavation watching target_path, or None."""
+    return _live_excavations.get(os.path.abspath(os.fspath(target_path)))
+
+
+def stop_watches():
+    """Stops every running watcher."""
+    for live in _live_excavations.values():
+        live.watcher.stop()
+    _live_excavations.clear()
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from FolderArchaeologist.scanner import configure_scan
+from FolderArchaeologist.snapshots import Snapshot, compare_snapshots, save_snapshot
+
+
+@pytest.fixture(autouse=True)
+def quiet_scans():
+    configure_scan(progress=False)
+    yield
+    configure_scan(progress=True)
+
+
+def _write(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+
+def test_snapshot_of_relative_dig_site(tmp_path, monkeypatch):
+    _write(tmp_path / "site" / "report_final_v2.txt", 10)
+    _write(tmp_path / "site" / "deep" / "copy.bin", 20)
+    monkeypatch.chdir(tmp_path)
+
+    before = save_snapshot("site", destination=tmp_path / "before.snapshot")
+    with Snapshot(before) as snapshot:
+        assert snapshot.root == str(tmp_path / "site")
+        assert sorted(entry[0] for entry in snapshot.entries()) == ["deep/copy.bin", "report_final_v2.txt"]
+
+    _write(tmp_path / "site" / "deep" / "copy.bin", 50)
+    _write(tmp_path / "site" / "new.txt", 5)
+    os.remove(tmp_path / "site" / "report_final_v2.txt")
+    after = save_snapshot(os.path.join(".", "site"), destination=tmp_path / "after.snapshot")
+
+    diff = compare_snapshots(before, after)
+    changes = {(change.kind, change.path) for change in diff.largest["files"]}
+    assert changes == {("added", "new.txt"), ("removed", "report_final_v2.txt"), ("grown", "deep/copy.bin")}
+    assert diff.absolute(next(change for change in diff.largest["files"] if change.kind == "added")) \
+        == str(tmp_path / "site" / "new.txt")
+
+
+@pytest.mark.parametrize("content", [b"", b"EXCAV", b"x" * 64])
+def test_truncated_snapshot_is_rejected(tmp_path, content):
+    path = tmp_path / "broken.snapshot"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        Snapshot(path)
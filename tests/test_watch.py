@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+import pytest
+
+from FolderArchaeologist.scanner import configure_scan
+from FolderArchaeologist.watch import start_watch, stop_watches
+
+
+@pytest.fixture(autouse=True)
+def quiet_scans():
+    configure_scan(progress=False)
+    yield
+    stop_watches()
+    configure_scan(progress=True)
+
+
+def _write(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+
+def _wait_for(live, expected, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        paths = sorted(live.all_files())
+        if paths == expected or time.monotonic() > deadline:
+            return paths
+        time.sleep(0.05)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="relies on inotify events")
+def test_watch_of_relative_dig_site(tmp_path, monkeypatch):
+    site = tmp_path / "site"
+    _write(site / "a" / "b" / "big.bin", 100)
+    _write(site / "c" / "notes.txt", 10)
+    os.link(site / "c" / "notes.txt", site / "c" / "notes_link.txt")
+    monkeypatch.chdir(tmp_path)
+
+    live = start_watch("site")
+    assert sorted(live.all_files()) == [str(site / "a" / "b" / "big.bin"), str(site / "c" / "notes.txt")]
+
+    os.remove(site / "a" / "b" / "big.bin")
+    assert _wait_for(live, [str(site / "c" / "notes.txt")]) == [str(site / "c" / "notes.txt")]
+
+    os.rename(site / "c", site / "c2")
+    expected = [str(site / "c2" / "notes.txt")]
+    assert _wait_for(live, expected) == expected
+    assert sorted(live.shadowed) == [str(site / "c2" / "notes_link.txt")]
+
+    os.remove(site / "c2" / "notes.txt")
+    expected = [str(site / "c2" / "notes_link.txt")]
+    assert _wait_for(live, expected) == expected
+    assert not live.shadowed